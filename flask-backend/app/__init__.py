@@ -3,14 +3,35 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from flask_socketio import SocketIO
-from redis import Redis
 from datetime import timedelta
+from .database import RoutingSession, load_database_config, init_database
 import os
+import threading
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 jwt = JWTManager()
 socketio = SocketIO()
-redis_client = Redis(host='redis', port=6379, db=0)
+_redis_clients = {}
+_redis_lock = threading.Lock()
+
+def get_redis(url):
+    """Shared Redis client for a URL, created on first use so redis is not imported at startup"""
+    with _redis_lock:
+        if url not in _redis_clients:
+            from redis import Redis
+            _redis_clients[url] = Redis.from_url(url)
+        return _redis_clients[url]
+
+def create_schema():
+    """Create missing tables, apply pending migrations and set up the search index"""
+    db.create_all()
+
+    from .migrations import upgrade
+    applied = upgrade(db.engine)
+
+    from .services.search_service import search_index
+    search_index.create_index()
+    return applied
 
 def configure_email(app):
     app.config.update(
@@ -25,19 +46,69 @@ def configure_email(app):
 
 
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
     
-    # Load environment variables
-    from dotenv import load_dotenv
-    load_dotenv()
+    # Lazy startup leaves schema creation to `flask init-db` and takes the environment
+    # as given (run.py and the flask CLI load .env themselves)
+    lazy = (config or {}).get('LAZY_STARTUP', os.getenv('LAZY_STARTUP', 'false').lower() == 'true')
+    if not lazy:
+        # Load environment variables
+        from dotenv import load_dotenv
+        load_dotenv()
+    app.config['LAZY_STARTUP'] = lazy
     
-    # Configure app with SQLite
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'
+    # Configure the database (SQLite by default)
+    load_database_config(app)
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'your-secret-key')
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
     app.config['JWT_ERROR_MESSAGE_KEY'] = 'error'
+    app.config['REDIS_URL'] = os.getenv('REDIS_URL', 'redis://redis:6379/0')
+    app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2')
+    app.config['PASSWORD_HASH_SALT_LENGTH'] = int(os.getenv('PASSWORD_HASH_SALT_LENGTH', 16))
+    app.config['PASSWORD_HASH_POOL'] = os.getenv('PASSWORD_HASH_POOL', 'thread')
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    app.config['MAIL_QUEUE_BATCH_SIZE'] = int(os.getenv('MAIL_QUEUE_BATCH_SIZE', 50))
+    app.config['MAIL_QUEUE_POLL_INTERVAL'] = float(os.getenv('MAIL_QUEUE_POLL_INTERVAL', 1.0))
+    app.config['MAIL_MAX_ATTEMPTS'] = int(os.getenv('MAIL_MAX_ATTEMPTS', 6))
+    app.config['MAIL_RETRY_BACKOFF'] = float(os.getenv('MAIL_RETRY_BACKOFF', 30.0))
+    app.config['JWT_CACHE_SIZE'] = int(os.getenv('JWT_CACHE_SIZE', 4096))
+    # Team roles in the token skip permission lookups, but stay valid until the token expires
+    app.config['JWT_ROLE_CLAIMS'] = os.getenv('JWT_ROLE_CLAIMS', 'false').lower() == 'true'
+    app.config['SCRAPE_QUEUE_BACKEND'] = os.getenv('SCRAPE_QUEUE_BACKEND', 'memory')
+    app.config['SCRAPE_WORKERS'] = int(os.getenv('SCRAPE_WORKERS', 2))
+    app.config['SCRAPE_CONCURRENCY'] = int(os.getenv('SCRAPE_CONCURRENCY', 8))
+    app.config['SCRAPE_PER_HOST_LIMIT'] = int(os.getenv('SCRAPE_PER_HOST_LIMIT', 4))
+    app.config['SCRAPE_MAX_PAGES'] = int(os.getenv('SCRAPE_MAX_PAGES', 500))
+    app.config['SCRAPER_PARSER'] = os.getenv('SCRAPER_PARSER', 'auto')
+    app.config['HISTORY_SNAPSHOT_INTERVAL'] = int(os.getenv('HISTORY_SNAPSHOT_INTERVAL', 20))
+    app.config['TREE_CACHE_SIZE'] = int(os.getenv('TREE_CACHE_SIZE', 256))
+    app.config['PERMISSION_CACHE_BACKEND'] = os.getenv('PERMISSION_CACHE_BACKEND', 'memory')
+    app.config['PERMISSION_CACHE_SIZE'] = int(os.getenv('PERMISSION_CACHE_SIZE', 4096))
+    app.config['PERMISSION_CACHE_TTL'] = int(os.getenv('PERMISSION_CACHE_TTL', 30))
+    app.config['DASHBOARD_CACHE_SIZE'] = int(os.getenv('DASHBOARD_CACHE_SIZE', 1024))
+    app.config['DASHBOARD_CACHE_TTL'] = int(os.getenv('DASHBOARD_CACHE_TTL', 60))
+    app.config['EDIT_COALESCE_WINDOW'] = float(os.getenv('EDIT_COALESCE_WINDOW', 2.0))
+    app.config['EDIT_COALESCE_MAX_DELAY'] = float(os.getenv('EDIT_COALESCE_MAX_DELAY', 30.0))
+    app.config['COLLAB_SNAPSHOT_INTERVAL'] = float(os.getenv('COLLAB_SNAPSHOT_INTERVAL', 5.0))
+    app.config['COLLAB_IDLE_TIMEOUT'] = float(os.getenv('COLLAB_IDLE_TIMEOUT', 600.0))
+    app.config['PRESENCE_TICK_RATE'] = float(os.getenv('PRESENCE_TICK_RATE', 20.0))
+    app.config['PRESENCE_IDLE_TIMEOUT'] = float(os.getenv('PRESENCE_IDLE_TIMEOUT', 30.0))
+    app.config['PRESENCE_TYPING_TIMEOUT'] = float(os.getenv('PRESENCE_TYPING_TIMEOUT', 3.0))
+    # With a queue (several workers) edits are written through and live OT editing is off,
+    # since both keep per-node state in one process
+    app.config['SOCKETIO_QUEUE_BACKEND'] = os.getenv('SOCKETIO_QUEUE_BACKEND', 'none')
+    app.config['SOCKETIO_QUEUE_URL'] = os.getenv('SOCKETIO_QUEUE_URL')
+    # The relay is unauthenticated; listen on another interface only behind a firewall
+    app.config['SOCKETIO_RELAY_HOST'] = os.getenv('SOCKETIO_RELAY_HOST', '127.0.0.1')
+    app.config['SOCKETIO_CHANNEL'] = os.getenv('SOCKETIO_CHANNEL', 'flask-socketio')
+    app.config['ACTIVE_DOCUMENT_CACHE_SIZE'] = int(os.getenv('ACTIVE_DOCUMENT_CACHE_SIZE', 64))
+    # Several workers each hold their own copy of open documents, so check them against the database
+    app.config['ACTIVE_DOCUMENT_VERIFY'] = os.getenv(
+        'ACTIVE_DOCUMENT_VERIFY', str(app.config['SOCKETIO_QUEUE_BACKEND'] != 'none')
+    ).lower() == 'true'
+    app.config.update(config or {})
 
     # Initialize CORS once
     CORS(app, 
@@ -53,32 +124,136 @@ def create_app():
     )
 
     # Initialize other extensions
-    db.init_app(app)
+    init_database(app, db)
     jwt.init_app(app)
+
+    from .services.auth_service import token_cache
+    token_cache.init_app(app)
+    
+    from .services.password_service import password_hasher
+    password_hasher.init_app(app, socketio)
     
-    # Initialize SocketIO once with proper mode
+    # Initialize SocketIO once with proper mode; a message queue fans emits out to every worker
+    from .services.socket_queue import queue_options
     socketio.init_app(app, 
         cors_allowed_origins="*",
         async_mode=None,  # Let it auto-detect
         ping_timeout=60,
-        ping_interval=25
+        ping_interval=25,
+        **queue_options(app)
     )
     
-    # Configure email
+    # Configure email; messages go out through the background mail queue
     from .services.email_service import configure_email
     configure_email(app)
+    from .services.mail_queue import mail_queue
+    mail_queue.init_app(app, socketio)
     
     # Register blueprints
     from .routes.auth import auth_bp
     from .routes.team import team_bp
-    from .routes.content import content_bp
+    from .routes.content import content_bp, handle_socket_events
     app.register_blueprint(auth_bp)
     app.register_blueprint(team_bp)
     app.register_blueprint(content_bp)
+    handle_socket_events(socketio)
+
+    # Background scrape workers
+    from .services.scrape_queue import scrape_queue
+    scrape_queue.init_app(app, socketio)
+
+    # Write-behind buffer for node edits
+    from .services.edit_buffer import edit_buffer
+    edit_buffer.init_app(app, socketio)
+
+    # Operational-transform editing sessions
+    from .services.collab_service import collab_service
+    collab_service.init_app(app, socketio)
+
+    # Throttled cursor/typing presence frames
+    from .services.presence_service import presence
+    presence.init_app(app, socketio)
+
+    from .services.history_service import history_store
+    history_store.init_app(app)
+
+    from .services.tree_service import content_tree
+    content_tree.init_app(app)
+
+    from .services.permission_service import permission_cache
+    permission_cache.init_app(app)
+
+    from .services.dashboard_service import dashboard_cache
+    dashboard_cache.init_app(app)
+
+    from .services.document_cache import active_documents
+    active_documents.init_app(app)
+
+    from .services.search_service import search_index
+    search_index.init_app(app)
     
     # Create database tables
-    with app.app_context():
-        db.create_all()
+    if not app.config['LAZY_STARTUP']:
+        with app.app_context():
+            create_schema()
+
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create the database schema and apply pending migrations"""
+        applied = create_schema()
+        print(f"Database ready ({len(applied)} schema migrations applied)")
+
+    @app.cli.command('migrate-schema')
+    def migrate_schema_command():
+        """Apply pending versioned schema migrations"""
+        from .migrations import upgrade
+        applied = upgrade(db.engine)
+        print(f"Applied {len(applied)} schema migrations")
+
+    @app.cli.command('migrate-sections')
+    def migrate_sections_command():
+        """Move section bodies out of legacy Content.current_content blobs"""
+        from .services.content_service import ContentManager
+        migrated = ContentManager().migrate_section_storage()
+        print(f"Migrated {migrated} content records to per-section storage")
+
+    @app.cli.command('migrate-history')
+    def migrate_history_command():
+        """Convert full-text edit history rows to snapshots plus deltas (schema migration 0003)"""
+        from .migrations import upgrade
+        applied = upgrade(db.engine)
+        print(f"Applied {len(applied)} schema migrations")
+
+    @app.cli.command('socket-relay')
+    def socket_relay_command():
+        """Run the local Socket.IO message relay used by SOCKETIO_QUEUE_BACKEND=local"""
+        from .services.socket_queue import LocalRelay, parse_address
+        _, port = parse_address(app.config.get('SOCKETIO_QUEUE_URL'))
+        address = (app.config['SOCKETIO_RELAY_HOST'], port)
+        print(f"Socket relay listening on {address[0]}:{address[1]}")
+        LocalRelay(address).serve_forever()
+
+    @app.cli.command('send-mail')
+    def send_mail_command():
+        """Deliver queued email that is due now"""
+        from .services.mail_queue import mail_queue
+        sent = mail_queue.deliver_pending()
+        print(f"Sent {sent} queued emails")
+
+    @app.cli.command('mail-sink')
+    def mail_sink_command():
+        """Run a local SMTP server that accepts and prints every message"""
+        from .services.smtp_sink import SMTPSink
+        sink = SMTPSink(('127.0.0.1', app.config['MAIL_PORT']), echo=True)
+        print(f"SMTP sink listening on 127.0.0.1:{app.config['MAIL_PORT']}")
+        sink.serve_forever()
+
+    @app.cli.command('reindex-search')
+    def reindex_search_command():
+        """Rebuild the section full-text search index"""
+        from .services.search_service import search_index
+        indexed = search_index.rebuild()
+        print(f"Indexed {indexed} content records")
     
     # JWT error handlers
     @jwt.expired_token_loader
@@ -0,0 +1,113 @@
+from flask import has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+import os
+
+READ_BIND = 'read'
+READ_METHODS = frozenset(['GET', 'HEAD'])
+
+
+class RoutingSession(Session):
+    """Sends the reads of GET requests to the read-only engine when one is configured.
+
+    Flushes, and every statement outside a GET request, use the primary engine.
+    """
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and has_request_context()
+            and request.method in READ_METHODS
+        ):
+            engine = self._db.engines.get(READ_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def load_database_config(app):
+    """Read the database URI and engine tuning settings from the environment"""
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///app.db')
+    app.config['DATABASE_READ_URL'] = os.getenv('DATABASE_READ_URL')
+    app.config['DATABASE_POOL_SIZE'] = int(os.getenv('DATABASE_POOL_SIZE', 10))
+    app.config['DATABASE_MAX_OVERFLOW'] = int(os.getenv('DATABASE_MAX_OVERFLOW', 20))
+    app.config['DATABASE_POOL_RECYCLE'] = int(os.getenv('DATABASE_POOL_RECYCLE', 1800))
+    app.config['DATABASE_POOL_TIMEOUT'] = int(os.getenv('DATABASE_POOL_TIMEOUT', 30))
+    app.config['SQLITE_WAL'] = os.getenv('SQLITE_WAL', 'true').lower() == 'true'
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    app.config['SQLITE_MMAP_SIZE'] = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    # Negative values are KiB, as in PRAGMA cache_size
+    app.config['SQLITE_CACHE_SIZE'] = int(os.getenv('SQLITE_CACHE_SIZE', -64000))
+
+
+def init_database(app, db):
+    """Apply pool settings and the optional read engine, then attach SQLite pragmas"""
+    config = app.config
+    config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    config['SQLALCHEMY_ENGINE_OPTIONS'].update(_engine_options(config, config['SQLALCHEMY_DATABASE_URI']))
+
+    if config.get('DATABASE_READ_URL'):
+        binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+        binds[READ_BIND] = {
+            'url': config['DATABASE_READ_URL'],
+            **_engine_options(config, config['DATABASE_READ_URL'])
+        }
+        config['SQLALCHEMY_BINDS'] = binds
+
+    db.init_app(app)
+
+    with app.app_context():
+        for key, engine in db.engines.items():
+            if engine.dialect.name == 'sqlite':
+                pragmas = _sqlite_pragmas(config, engine.url, read_only=key == READ_BIND)
+                event.listen(engine, 'connect', _pragma_setter(pragmas))
+
+
+def _is_memory(url):
+    url = make_url(url)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def _engine_options(config, url):
+    if _is_memory(url):
+        # In-memory SQLite uses a single static connection
+        return {}
+    options = {
+        'pool_size': config['DATABASE_POOL_SIZE'],
+        'max_overflow': config['DATABASE_MAX_OVERFLOW'],
+        'pool_recycle': config['DATABASE_POOL_RECYCLE'],
+        'pool_timeout': config['DATABASE_POOL_TIMEOUT'],
+        'pool_pre_ping': True
+    }
+    if make_url(url).get_backend_name() == 'sqlite':
+        # The driver's own lock wait, in seconds; busy_timeout below covers the same ground
+        options['connect_args'] = {'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}
+    return options
+
+
+def _sqlite_pragmas(config, url, read_only=False):
+    pragmas = [
+        ('busy_timeout', config['SQLITE_BUSY_TIMEOUT_MS']),
+        ('cache_size', config['SQLITE_CACHE_SIZE'])
+    ]
+    if _is_memory(url):
+        return pragmas
+    if config['SQLITE_WAL'] and not read_only:
+        pragmas.append(('journal_mode', 'WAL'))
+    if config['SQLITE_WAL']:
+        # Safe with WAL: a crash can lose the last commits but never corrupts the file
+        pragmas.append(('synchronous', 'NORMAL'))
+    pragmas.append(('mmap_size', config['SQLITE_MMAP_SIZE']))
+    return pragmas
+
+
+def _pragma_setter(pragmas):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+    return set_pragmas
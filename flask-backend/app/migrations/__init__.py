@@ -0,0 +1,53 @@
+"""Versioned schema migrations.
+
+Each migration module defines VERSION, DESCRIPTION and upgrade(connection).
+upgrade() applies the pending ones in version order, each in its own
+transaction, and records them in the schema_migration table. Tables created
+by db.create_all() already match the models, so migrations must be safe to
+run against them (e.g. skip indexes that exist).
+"""
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, select
+from . import (
+    m0001_hot_lookup_indexes, m0002_keyset_pagination_indexes, m0003_edit_history_deltas, m0004_edit_new_hash
+)
+
+MIGRATIONS = sorted([
+    m0001_hot_lookup_indexes,
+    m0002_keyset_pagination_indexes,
+    m0003_edit_history_deltas,
+    m0004_edit_new_hash,
+], key=lambda migration: migration.VERSION)
+
+metadata = MetaData()
+schema_migration = Table(
+    'schema_migration', metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+
+def applied_versions(engine):
+    metadata.create_all(engine)
+    with engine.connect() as connection:
+        return {row.version for row in connection.execute(select(schema_migration.c.version))}
+
+
+def upgrade(engine):
+    """Apply every pending migration and return the versions applied"""
+    done = applied_versions(engine)
+    applied = []
+    for migration in MIGRATIONS:
+        if migration.VERSION in done:
+            continue
+        with engine.begin() as connection:
+            migration.upgrade(connection)
+            connection.execute(schema_migration.insert().values(
+                version=migration.VERSION,
+                description=migration.DESCRIPTION,
+                applied_at=datetime.utcnow()
+            ))
+        print(f"Applied migration {migration.VERSION:04d}: {migration.DESCRIPTION}")
+        applied.append(migration.VERSION)
+    return applied
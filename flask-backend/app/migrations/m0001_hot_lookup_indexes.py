@@ -0,0 +1,29 @@
+from sqlalchemy import inspect, text
+
+VERSION = 1
+DESCRIPTION = 'Composite indexes for membership, tree, history, dashboard and invitation lookups'
+
+# (index name, table, columns)
+INDEXES = [
+    ('ix_team_member_team_user', 'team_member', ('team_id', 'user_id')),
+    ('ix_team_member_user', 'team_member', ('user_id',)),
+    ('ix_invitation_email_status', 'invitation', ('email', 'status')),
+    ('ix_content_team_updated', 'content', ('team_id', 'updated_at')),
+    ('ix_content_node_content_parent', 'content_node', ('content_id', 'parent_id')),
+    ('ix_node_content_content', 'node_content', ('content_id',)),
+    ('ix_content_edit_node_created', 'content_edit', ('node_id', 'created_at')),
+    ('ix_content_edit_user_created', 'content_edit', ('user_id', 'created_at')),
+]
+
+
+def upgrade(connection):
+    inspector = inspect(connection)
+    tables = set(inspector.get_table_names())
+    for name, table, columns in INDEXES:
+        if table not in tables:
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table)}
+        table_columns = {column['name'] for column in inspector.get_columns(table)}
+        if name in existing or not table_columns.issuperset(columns):
+            continue
+        connection.execute(text(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"))
@@ -0,0 +1,25 @@
+from sqlalchemy import inspect, text
+
+VERSION = 2
+DESCRIPTION = 'Extend the content list and edit history indexes with id for keyset pagination'
+
+# (index name, table, columns, index it replaces)
+INDEXES = [
+    ('ix_content_team_updated_id', 'content', ('team_id', 'updated_at', 'id'), 'ix_content_team_updated'),
+    ('ix_content_edit_node_created_id', 'content_edit', ('node_id', 'created_at', 'id'),
+     'ix_content_edit_node_created'),
+]
+
+
+def upgrade(connection):
+    inspector = inspect(connection)
+    tables = set(inspector.get_table_names())
+    for name, table, columns, replaced in INDEXES:
+        if table not in tables:
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table)}
+        table_columns = {column['name'] for column in inspector.get_columns(table)}
+        if name not in existing and table_columns.issuperset(columns):
+            connection.execute(text(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"))
+        if replaced in existing:
+            connection.execute(text(f"DROP INDEX {replaced}"))
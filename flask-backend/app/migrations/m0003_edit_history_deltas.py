@@ -0,0 +1,13 @@
+from sqlalchemy import inspect
+
+VERSION = 3
+DESCRIPTION = 'Convert full-text edit history rows to snapshots plus deltas'
+
+
+def upgrade(connection):
+    if 'content_edit' not in inspect(connection).get_table_names():
+        return
+    from ..services.history_service import history_store
+    converted = history_store.migrate_legacy_edits(connection)
+    if converted:
+        print(f"Converted {converted} edit history rows")
@@ -0,0 +1,14 @@
+from sqlalchemy import inspect, text
+
+VERSION = 4
+DESCRIPTION = 'Add content_edit.new_hash so edits after an out-of-band body change start a snapshot'
+
+
+def upgrade(connection):
+    inspector = inspect(connection)
+    if 'content_edit' not in inspector.get_table_names():
+        return
+    columns = {column['name'] for column in inspector.get_columns('content_edit')}
+    if 'new_hash' not in columns:
+        # Existing rows keep NULL; the next edit of their node compares against the materialized text
+        connection.execute(text('ALTER TABLE content_edit ADD COLUMN new_hash VARCHAR(64)'))
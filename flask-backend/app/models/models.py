@@ -1,5 +1,4 @@
 from .. import db
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 import uuid
 
@@ -11,10 +10,16 @@ class User(db.Model):
     status = db.Column(db.String(20), default='active')
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        from ..services.password_service import password_hasher
+        self.password_hash = password_hasher.hash_password(password)
         
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        from ..services.password_service import password_hasher
+        return password_hasher.check_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        from ..services.password_service import password_hasher
+        return password_hasher.needs_rehash(self.password_hash)
 
 class Team(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -23,6 +28,11 @@ class Team(db.Model):
     owner_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
 
 class TeamMember(db.Model):
+    __table_args__ = (
+        db.Index('ix_team_member_team_user', 'team_id', 'user_id'),
+        db.Index('ix_team_member_user', 'user_id'),
+    )
+
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     team_id = db.Column(db.String(36), db.ForeignKey('team.id'), nullable=False)
     user_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
@@ -31,6 +41,10 @@ class TeamMember(db.Model):
     joined_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Invitation(db.Model):
+    __table_args__ = (
+        db.Index('ix_invitation_email_status', 'email', 'status'),
+    )
+
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     team_id = db.Column(db.String(36), db.ForeignKey('team.id'), nullable=False)
     email = db.Column(db.String(120), nullable=False)
@@ -42,12 +56,17 @@ class Invitation(db.Model):
 
 class Content(db.Model):
     """Main content model"""
+    __table_args__ = (
+        db.Index('ix_content_team_updated_id', 'team_id', 'updated_at', 'id'),
+    )
+
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     team_id = db.Column(db.String(36), db.ForeignKey('team.id'), nullable=False)
     url = db.Column(db.String(500), nullable=False)
     title = db.Column(db.String(200), nullable=False)
-    original_content = db.Column(db.Text, nullable=False)  # Original scraped content
-    current_content = db.Column(db.Text, nullable=False)   # Current edited content
+    # Large text columns are deferred so list and tree queries never load them
+    original_content = db.deferred(db.Column(db.Text, nullable=False))  # Original scraped content
+    current_content = db.deferred(db.Column(db.Text, nullable=False))   # Legacy section blob; edits live in NodeContent
     meta = db.Column(db.JSON)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -57,6 +76,10 @@ class Content(db.Model):
 
 class ContentNode(db.Model):
     """File tree node"""
+    __table_args__ = (
+        db.Index('ix_content_node_content_parent', 'content_id', 'parent_id'),
+    )
+
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     content_id = db.Column(db.String(36), db.ForeignKey('content.id'), nullable=False)
     parent_id = db.Column(db.String(36), db.ForeignKey('content_node.id'))
@@ -68,10 +91,11 @@ class ContentNode(db.Model):
     children = db.relationship(
         'ContentNode',
         backref=db.backref('parent', remote_side=[id]),
-        lazy='joined',
+        lazy='select',
         order_by='ContentNode.order'
     )
     edits = db.relationship('ContentEdit', backref='node', lazy=True)
+    section = db.relationship('NodeContent', backref='node', uselist=False, lazy=True)
 
     def to_dict(self, include_content=False):
         """Convert node to dictionary"""
@@ -83,17 +107,45 @@ class ContentNode(db.Model):
             'children': [child.to_dict(include_content) for child in self.children]
         }
         if include_content:
-            data['content'] = self.content.current_content
+            data['content'] = self.section.body if self.section else ''
         return data
 
+class NodeContent(db.Model):
+    """Section body of a single file tree node"""
+    __table_args__ = (
+        db.Index('ix_node_content_content', 'content_id'),
+    )
+
+    node_id = db.Column(db.String(36), db.ForeignKey('content_node.id'), primary_key=True)
+    content_id = db.Column(db.String(36), db.ForeignKey('content.id'), nullable=False)
+    body = db.Column(db.Text, nullable=False, default='')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class SearchDocument(db.Model):
+    """Row of the section full-text index; its id is the FTS rowid"""
+    id = db.Column(db.Integer, primary_key=True)
+    node_id = db.Column(db.String(36), db.ForeignKey('content_node.id'), nullable=False, unique=True)
+    content_id = db.Column(db.String(36), db.ForeignKey('content.id'), nullable=False, index=True)
+    team_id = db.Column(db.String(36), db.ForeignKey('team.id'), nullable=False)
+
 class ContentEdit(db.Model):
-    """Content edit history"""
+    """Content edit history, stored as periodic snapshots plus deltas"""
+    __table_args__ = (
+        db.UniqueConstraint('node_id', 'version'),
+        db.Index('ix_content_edit_node_created_id', 'node_id', 'created_at', 'id'),
+        db.Index('ix_content_edit_user_created', 'user_id', 'created_at'),
+    )
+
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     content_id = db.Column(db.String(36), db.ForeignKey('content.id'), nullable=False)
     node_id = db.Column(db.String(36), db.ForeignKey('content_node.id'), nullable=False)
     user_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
-    previous_content = db.Column(db.Text, nullable=False)
-    new_content = db.Column(db.Text, nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    snapshot = db.Column(db.Text)                 # Full previous text, on snapshot rows only
+    delta = db.Column(db.Text, nullable=False)    # JSON ops from previous to new text
+    new_hash = db.Column(db.String(64))           # sha256 of the new text, to detect a broken chain
+    has_changes = db.Column(db.Boolean, nullable=False, default=True)
+    size_delta = db.Column(db.Integer, nullable=False, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def to_dict(self):
@@ -101,6 +153,27 @@ class ContentEdit(db.Model):
         return {
             'id': self.id,
             'user_id': self.user_id,
+            'version': self.version,
             'created_at': self.created_at.isoformat(),
-            'has_changes': self.previous_content != self.new_content
-        }
\ No newline at end of file
+            'has_changes': self.has_changes,
+            'size_delta': self.size_delta
+        }
+
+class OutboundEmail(db.Model):
+    """Mail waiting for the background sender; rows stay after delivery or after giving up"""
+    __table_args__ = (
+        db.Index('ix_outbound_email_status_due', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    html = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    # A sender claims a batch by moving next_attempt_at past its lease
+    claim = db.Column(db.String(36))
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
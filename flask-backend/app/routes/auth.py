@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from ..models import User, Team, TeamMember, Invitation, Content, ContentEdit, db
+from ..models import User, db
+from ..services.auth_service import auth_required, get_identity, issue_token
+from ..services.dashboard_service import dashboard_cache
 from datetime import timedelta
 
 auth_bp = Blueprint('auth', __name__)
@@ -38,9 +39,14 @@ def login():
         if not user.check_password(data['password']):
             print("Invalid password")
             return jsonify({'error': 'Invalid credentials'}), 401
+
+        # Upgrade hashes made with old parameters while the password is at hand
+        if user.password_needs_rehash():
+            user.set_password(data['password'])
+            db.session.commit()
         
         # Create token
-        access_token = create_access_token(identity=user.id)
+        access_token = issue_token(user.id)
         
         return jsonify({
             'token': access_token,
@@ -73,7 +79,7 @@ def register():
         db.session.add(user)
         db.session.commit()
         
-        access_token = create_access_token(identity=user.id)
+        access_token = issue_token(user.id)
         return jsonify({
             'token': access_token, 
             'user_id': user.id,
@@ -87,73 +93,16 @@ def register():
 
 
 @auth_bp.route('/user/info', methods=['GET'])
-@jwt_required()
+@auth_required
 def get_user_info():
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user_id = get_identity()
+        dashboard = dashboard_cache.get_dashboard(user_id)
 
-        if not user:
+        if not dashboard:
             return jsonify({'error': 'User not found'}), 404
 
-        # Get all teams where user is a member
-        team_memberships = TeamMember.query.filter_by(user_id=user_id).all()
-        
-        teams_info = []
-        for membership in team_memberships:
-            team = Team.query.get(membership.team_id)
-            if team:
-                # Get active content/work in this team
-                active_content = Content.query.filter_by(
-                    team_id=team.id
-                ).order_by(Content.updated_at.desc()).limit(5).all()
-
-                teams_info.append({
-                    'team_id': team.id,
-                    'team_name': team.name,
-                    'role': membership.role,
-                    'joined_at': membership.joined_at.isoformat(),
-                    'is_owner': team.owner_id == user_id,
-                    'recent_activity': [{
-                        'content_id': content.id,
-                        'title': content.title,
-                        'updated_at': content.updated_at.isoformat()
-                    } for content in active_content]
-                })
-
-        # Get pending invitations
-        pending_invites = Invitation.query.filter_by(
-            email=user.email,
-            status='pending'
-        ).all()
-
-        # Get user's recent edits
-        recent_edits = ContentEdit.query.filter_by(
-            user_id=user_id
-        ).order_by(ContentEdit.created_at.desc()).limit(10).all()
-
-        return jsonify({
-            'user': {
-                'id': user.id,
-                'email': user.email,
-                'created_at': user.created_at.isoformat(),
-                'status': user.status,
-                'teams_count': len(teams_info)
-            },
-            'teams': teams_info,
-            'pending_invitations': [{
-                'team_id': invite.team_id,
-                'role': invite.role,
-                'invite_code': invite.invite_code,
-                'expires_at': invite.expires_at.isoformat()
-            } for invite in pending_invites],
-            'recent_activity': [{
-                'content_id': edit.content_id,
-                'node_id': edit.node_id,
-                'created_at': edit.created_at.isoformat(),
-                'has_changes': edit.previous_content != edit.new_content
-            } for edit in recent_edits]
-        }), 200
+        return jsonify(dashboard), 200
 
     except Exception as e:
         print(f"Error fetching user info: {str(e)}")
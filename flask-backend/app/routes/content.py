@@ -1,104 +1,217 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from flask_socketio import emit, join_room, leave_room
+from flask import Blueprint, request, jsonify, current_app
+from flask_socketio import ConnectionRefusedError, emit, join_room, leave_room
+from sqlalchemy.orm import load_only
+from ..services.auth_service import auth_required, get_identity
 from ..services.content_service import ContentManager
+from ..services.scrape_queue import scrape_queue
+from ..services.history_service import history_store
+from ..services.search_service import search_index
+from ..services.tree_service import content_tree
+from ..services.permission_service import permission_cache
+from ..services.pagination import keyset_page, parse_page_args
+from ..services.edit_buffer import edit_buffer
+from ..services.collab_service import CollabUnavailable, collab_service
+from ..services.presence_service import presence
+from ..services.document_cache import active_documents
+from ..services.socket_auth import socket_sessions
 from ..models import Team, Content, ContentNode, ContentEdit, db
+from .. import socketio
 from ..routes.team import check_team_permissions
+from datetime import datetime
 
 content_bp = Blueprint('content', __name__)
 content_manager = ContentManager()
 
 @content_bp.route('/content/scrape', methods=['POST'])
-@jwt_required()
+@auth_required
 def scrape_content():
-    """Scrape and create content from URL"""
+    """Queue a scrape job for a URL"""
     try:
         data = request.get_json()
         if not data or 'url' not in data or 'team_id' not in data:
             return jsonify({'error': 'URL and team_id are required'}), 400
 
-        user_id = get_jwt_identity()
+        user_id = get_identity()
         print(f"User {user_id} attempting to scrape {data['url']}")
         
         if not check_team_permissions(user_id, data['team_id']):
             return jsonify({'error': 'Unauthorized'}), 403
 
-        content_id = content_manager.create_content(data['team_id'], data['url'])
-        if not content_id:
-            return jsonify({'error': 'Failed to scrape content'}), 500
-        
-        content = Content.query.get(content_id)
-        if not content:
-            return jsonify({'error': 'Content creation failed'}), 500
-            
-        print(f"Successfully created content with ID: {content_id}")
-        
+        job = scrape_queue.enqueue(data['team_id'], data['url'], user_id)
+        print(f"Queued scrape job {job['id']} for {data['url']}")
+
         return jsonify({
-            'message': 'Content scraped successfully',
-            'content_id': content_id,
-            'title': content.title,
-            'url': content.url
-        }), 201
+            'message': 'Scrape job queued',
+            'job_id': job['id'],
+            'status': job['status'],
+            'url': job['url']
+        }), 202
 
     except Exception as e:
         print(f"Error scraping content: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-@content_bp.route('/content/<content_id>', methods=['GET'])
-@jwt_required()
-def get_content(content_id):
-    """Get content and its structure"""
+@content_bp.route('/content/scrape/bulk', methods=['POST'])
+@auth_required
+def bulk_scrape_content():
+    """Queue a crawl job for a list of URLs or a seed URL"""
     try:
-        user_id = get_jwt_identity()
-        content = Content.query.get_or_404(content_id)
-        
-        if not check_team_permissions(user_id, content.team_id):
+        data = request.get_json()
+        if not data or 'team_id' not in data:
+            return jsonify({'error': 'team_id is required'}), 400
+
+        urls = data.get('urls')
+        seed_url = data.get('seed_url')
+        if not urls and not seed_url:
+            return jsonify({'error': 'urls or seed_url is required'}), 400
+        if urls is not None and not isinstance(urls, list):
+            return jsonify({'error': 'urls must be a list'}), 400
+
+        user_id = get_identity()
+        if not check_team_permissions(user_id, data['team_id']):
             return jsonify({'error': 'Unauthorized'}), 403
 
-        root_node = ContentNode.query.filter_by(
-            content_id=content_id,
-            parent_id=None
-        ).first()
+        page_limit = current_app.config['SCRAPE_MAX_PAGES']
+        job = scrape_queue.enqueue_crawl(
+            data['team_id'],
+            user_id,
+            urls=urls,
+            seed_url=seed_url,
+            max_depth=max(int(data.get('depth', 0)), 0),
+            same_host=bool(data.get('same_host', True)),
+            max_pages=min(int(data.get('max_pages', page_limit)), page_limit)
+        )
 
         return jsonify({
-            'content': {
+            'message': 'Crawl job queued',
+            'job_id': job['id'],
+            'status': job['status']
+        }), 202
+
+    except Exception as e:
+        print(f"Error queueing crawl: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@content_bp.route('/content/scrape/<job_id>', methods=['GET'])
+@auth_required
+def get_scrape_job(job_id):
+    """Get the status of a scrape job"""
+    try:
+        user_id = get_identity()
+        job = scrape_queue.get_job(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+
+        if not check_team_permissions(user_id, job['team_id']):
+            return jsonify({'error': 'Unauthorized'}), 403
+
+        return jsonify({
+            'job': {
+                'id': job['id'],
+                'type': job.get('type', 'scrape'),
+                'team_id': job['team_id'],
+                'url': job['url'],
+                'status': job['status'],
+                'content_id': job.get('content_id'),
+                'result': job.get('result'),
+                'error': job['error'],
+                'created_at': job['created_at'],
+                'finished_at': job['finished_at']
+            }
+        }), 200
+
+    except Exception as e:
+        print(f"Error fetching scrape job: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@content_bp.route('/content/<content_id>', methods=['GET'])
+@auth_required
+def get_content(content_id):
+    """Get content and its structure"""
+    try:
+        user_id = get_identity()
+        include_content = request.args.get('include_content', '').lower() == 'true'
+
+        # Documents open in a room are served from memory
+        content_data = active_documents.get_content(content_id, include_content)
+        if content_data is None:
+            content = Content.query.get_or_404(content_id)
+            content_data = {
                 'id': content.id,
                 'title': content.title,
                 'url': content.url,
                 'team_id': content.team_id,
                 'meta': content.meta,
-                'tree': root_node.to_dict() if root_node else None,
+                'tree': content_tree.get_tree(content, include_content),
                 'created_at': content.created_at.isoformat(),
                 'updated_at': content.updated_at.isoformat()
             }
-        }), 200
+
+        if not check_team_permissions(user_id, content_data['team_id']):
+            return jsonify({'error': 'Unauthorized'}), 403
+
+        return jsonify({'content': content_data}), 200
 
     except Exception as e:
         print(f"Error fetching content: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@content_bp.route('/content/<content_id>/refresh', methods=['POST'])
+@auth_required
+def refresh_content(content_id):
+    """Queue a conditional re-scrape of existing content"""
+    try:
+        user_id = get_identity()
+        content = Content.query.get_or_404(content_id)
+
+        if not check_team_permissions(user_id, content.team_id):
+            return jsonify({'error': 'Unauthorized'}), 403
+
+        job = scrape_queue.enqueue_refresh(content.id, content.team_id, content.url, user_id)
+
+        return jsonify({
+            'message': 'Refresh job queued',
+            'job_id': job['id'],
+            'status': job['status']
+        }), 202
+
+    except Exception as e:
+        print(f"Error queueing refresh: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @content_bp.route('/content/node/<node_id>', methods=['GET'])
-@jwt_required()
+@auth_required
 def get_node_content(node_id):
     """Get node content with optional history"""
     try:
-        user_id = get_jwt_identity()
-        node = ContentNode.query.get_or_404(node_id)
-        
-        if not check_team_permissions(user_id, node.content.team_id):
+        user_id = get_identity()
+        owner = permission_cache.resolve_node(node_id)
+        if not owner:
+            return jsonify({'error': 'Node not found'}), 404
+
+        content_id, team_id = owner
+        if not check_team_permissions(user_id, team_id):
             return jsonify({'error': 'Unauthorized'}), 403
 
         include_history = request.args.get('history', '').lower() == 'true'
-        node_data = content_manager.get_node_content(node_id, include_history)
+        limit, after = parse_page_args(request.args)
+        node_data = content_manager.get_node_content(node_id, include_history, limit, after)
+        # Unsaved text of a live document or of buffered edits is the newest
+        document = collab_service.peek(node_id)
+        pending = document.text if document else edit_buffer.pending_content(node_id)
+        if node_data and pending is not None:
+            node_data['content'] = pending
         
         return jsonify({'node': node_data}), 200
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error fetching node content: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @content_bp.route('/content/node/<node_id>', methods=['PUT'])
-@jwt_required()
+@auth_required
 def update_node_content(node_id):
     """Update node content and notify collaborators"""
     try:
@@ -106,24 +219,38 @@ def update_node_content(node_id):
         if not data or 'content' not in data:
             return jsonify({'error': 'Content is required'}), 400
 
-        user_id = get_jwt_identity()
-        node = ContentNode.query.get_or_404(node_id)
-        
-        if not check_team_permissions(user_id, node.content.team_id):
+        user_id = get_identity()
+        owner = permission_cache.resolve_node(node_id)
+        if not owner:
+            return jsonify({'error': 'Node not found'}), 404
+
+        content_id, team_id = owner
+        if not check_team_permissions(user_id, team_id):
             return jsonify({'error': 'Unauthorized'}), 403
 
-        # Update content
-        success = content_manager.update_content(
-            node.content_id,
-            node_id,
-            data['content'],
-            user_id
-        )
+        room = f"content_{content_id}"
+        if collab_service.peek(node_id):
+            # Someone is editing the node with ops; replace its live text through them
+            revision, ops = collab_service.replace(content_id, node_id, user_id, data['content'])
+            socketio.emit('ops_applied', {
+                'node_id': node_id,
+                'revision': revision,
+                'ops': ops,
+                'user_id': user_id
+            }, room=room)
+            success = True
+        else:
+            # Buffer the change; rapid edits by the same user become one history entry
+            success = edit_buffer.submit(
+                content_id,
+                node_id,
+                data['content'],
+                user_id
+            )
         
         if success:
             # Emit update event to all users in the room
-            room = f"content_{node.content_id}"
-            emit('content_updated', {
+            socketio.emit('content_updated', {
                 'node_id': node_id,
                 'content': data['content'],
                 'user_id': user_id,
@@ -142,16 +269,23 @@ def update_node_content(node_id):
         return jsonify({'error': str(e)}), 500
 
 @content_bp.route('/content/team/<team_id>', methods=['GET'])
-@jwt_required()
+@auth_required
 def list_team_content(team_id):
-    """List all team content"""
+    """List team content, most recently updated first, one page at a time"""
     try:
-        user_id = get_jwt_identity()
+        user_id = get_identity()
         
         if not check_team_permissions(user_id, team_id):
             return jsonify({'error': 'Unauthorized'}), 403
 
-        content_list = Content.query.filter_by(team_id=team_id).all()
+        limit, after = parse_page_args(request.args)
+
+        # The scraped text columns are never loaded for the list view
+        query = Content.query.filter_by(team_id=team_id).options(load_only(
+            Content.id, Content.title, Content.url,
+            Content.created_at, Content.updated_at, Content.meta
+        ))
+        content_list, next_cursor = keyset_page(query, Content.updated_at, Content.id, limit, after)
         
         return jsonify({
             'content': [{
@@ -161,42 +295,74 @@ def list_team_content(team_id):
                 'created_at': content.created_at.isoformat(),
                 'updated_at': content.updated_at.isoformat(),
                 'meta': content.meta
-            } for content in content_list]
+            } for content in content_list],
+            'next_cursor': next_cursor
         }), 200
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error listing content: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @content_bp.route('/content/history/<node_id>', methods=['GET'])
-@jwt_required()
+@auth_required
 def get_content_history(node_id):
     """Get node edit history"""
     try:
-        user_id = get_jwt_identity()
-        node = ContentNode.query.get_or_404(node_id)
-        
-        if not check_team_permissions(user_id, node.content.team_id):
+        user_id = get_identity()
+        owner = permission_cache.resolve_node(node_id)
+        if not owner:
+            return jsonify({'error': 'Node not found'}), 404
+
+        content_id, team_id = owner
+        if not check_team_permissions(user_id, team_id):
             return jsonify({'error': 'Unauthorized'}), 403
 
-        edits = ContentEdit.query.filter_by(node_id=node_id)\
-            .order_by(ContentEdit.created_at.desc())\
-            .all()
+        limit, after = parse_page_args(request.args)
+        edits, next_cursor = history_store.list_edits(node_id, limit, after)
             
         return jsonify({
-            'history': [edit.to_dict() for edit in edits]
+            'history': [edit.to_dict() for edit in edits],
+            'next_cursor': next_cursor
         }), 200
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error fetching content history: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@content_bp.route('/content/history/<node_id>/<int:version>', methods=['GET'])
+@auth_required
+def get_content_version(node_id, version):
+    """Get the full text of one version of a node"""
+    try:
+        user_id = get_identity()
+        owner = permission_cache.resolve_node(node_id)
+        if not owner:
+            return jsonify({'error': 'Node not found'}), 404
+
+        content_id, team_id = owner
+        if not check_team_permissions(user_id, team_id):
+            return jsonify({'error': 'Unauthorized'}), 403
+
+        edit = history_store.get_version(node_id, version)
+        if not edit:
+            return jsonify({'error': 'Version not found'}), 404
+
+        return jsonify({'version': edit}), 200
+
+    except Exception as e:
+        print(f"Error fetching content version: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @content_bp.route('/content/search/<team_id>', methods=['GET'])
-@jwt_required()
+@auth_required
 def search_content(team_id):
     """Search team content"""
     try:
-        user_id = get_jwt_identity()
+        user_id = get_identity()
         if not check_team_permissions(user_id, team_id):
             return jsonify({'error': 'Unauthorized'}), 403
 
@@ -204,20 +370,17 @@ def search_content(team_id):
         if not query:
             return jsonify({'error': 'Search query is required'}), 400
 
-        # Search in content titles and content
-        results = Content.query.filter(
-            Content.team_id == team_id,
-            (Content.title.ilike(f'%{query}%') | 
-             Content.current_content.ilike(f'%{query}%'))
-        ).all()
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+
+        # Section-level hits, best match first
+        results, has_more = search_index.search(team_id, query, page, per_page)
 
         return jsonify({
-            'results': [{
-                'id': content.id,
-                'title': content.title,
-                'url': content.url,
-                'updated_at': content.updated_at.isoformat()
-            } for content in results]
+            'results': results,
+            'page': page,
+            'per_page': per_page,
+            'has_more': has_more
         }), 200
 
     except Exception as e:
@@ -226,16 +389,37 @@ def search_content(team_id):
 
 # Socket.IO event handlers
 def handle_socket_events(socketio):
+    @socketio.on('connect')
+    def handle_connect(auth=None):
+        """Verify the JWT once per connection; events use the identity stored for the sid"""
+        token = auth.get('token') if isinstance(auth, dict) else None
+        if not token:
+            header = request.headers.get('Authorization', '')
+            token = header[len('Bearer '):] if header.startswith('Bearer ') else request.args.get('token')
+        if not token:
+            raise ConnectionRefusedError('Authorization token is missing')
+
+        try:
+            socket_sessions.connect(request.sid, token)
+        except Exception as e:
+            print(f"Error authenticating socket connection: {str(e)}")
+            raise ConnectionRefusedError('Invalid token')
+
     @socketio.on('join')
     def handle_join(data):
         """Handle user joining a content room"""
         content_id = data.get('content_id')
-        user_id = data.get('user_id')
         if not content_id:
             return
-            
-        room = f"content_{content_id}"
+
+        room = socket_sessions.content_room(request.sid, content_id)
+        if not room:
+            return {'error': 'Unauthorized'}
+
+        user_id = socket_sessions.user_id(request.sid)
         join_room(room)
+        active_documents.open(content_id, request.sid)
+        presence.join(room, user_id, request.sid)
         print(f"User {user_id} joined room: {room}")
         
         # Notify others in the room
@@ -243,17 +427,23 @@ def handle_socket_events(socketio):
             'user_id': user_id,
             'timestamp': datetime.utcnow().isoformat()
         }, room=room, include_self=False)
+        return {'presence': presence.snapshot(room)}
 
     @socketio.on('leave')
     def handle_leave(data):
         """Handle user leaving a content room"""
         content_id = data.get('content_id')
-        user_id = data.get('user_id')
-        if not content_id:
+        user_id = socket_sessions.user_id(request.sid)
+        if not content_id or not user_id:
             return
             
         room = f"content_{content_id}"
         leave_room(room)
+        socket_sessions.revoke_room(request.sid, room)
+        active_documents.close(content_id, request.sid)
+        presence.leave(room, user_id, request.sid)
+        edit_buffer.flush(user_id=user_id, content_id=content_id)
+        collab_service.flush(content_id=content_id, user_id=user_id)
         print(f"User {user_id} left room: {room}")
         
         # Notify others in the room
@@ -262,35 +452,97 @@ def handle_socket_events(socketio):
             'timestamp': datetime.utcnow().isoformat()
         }, room=room, include_self=False)
 
+    @socketio.on('disconnect')
+    def handle_disconnect():
+        """Write the buffered edits of a user whose connection dropped"""
+        active_documents.close_sid(request.sid)
+        session = socket_sessions.disconnect(request.sid)
+        if session:
+            user_id = session['user_id']
+            presence.disconnect(user_id, request.sid)
+            edit_buffer.flush(user_id=user_id)
+            collab_service.flush(user_id=user_id)
+
+    @socketio.on('open_node')
+    def handle_open_node(data):
+        """Return the live text and revision a client bases its edit ops on"""
+        node_id = data.get('node_id')
+        owner = permission_cache.resolve_node(node_id) if node_id else None
+        if not owner:
+            return {'error': 'Node not found'}
+        if not socket_sessions.allow_team(request.sid, owner[1]):
+            return {'error': 'Unauthorized'}
+
+        try:
+            document = collab_service.get_document(owner[0], node_id)
+        except CollabUnavailable as e:
+            return {'error': str(e), 'code': 'collab_disabled'}
+        return {'node_id': node_id, 'revision': document.revision, 'content': document.text}
+
+    @socketio.on('edit_op')
+    def handle_edit_op(data):
+        """Apply one insert/delete op and broadcast only the rebased ops"""
+        node_id = data.get('node_id')
+        owner = permission_cache.resolve_node(node_id) if node_id else None
+        if not owner:
+            return {'error': 'Node not found'}
+        if not socket_sessions.allow_team(request.sid, owner[1]):
+            return {'error': 'Unauthorized'}
+
+        content_id = owner[0]
+        user_id = socket_sessions.user_id(request.sid)
+        try:
+            revision, ops = collab_service.apply(content_id, node_id, user_id, data.get('revision'), data.get('op'))
+        except CollabUnavailable as e:
+            return {'error': str(e), 'code': 'collab_disabled'}
+        except ValueError as e:
+            return {'error': str(e), 'revision': collab_service.get_document(content_id, node_id).revision}
+
+        emit('ops_applied', {
+            'node_id': node_id,
+            'revision': revision,
+            'ops': ops,
+            'user_id': user_id
+        }, room=f"content_{content_id}", include_self=False)
+        return {'revision': revision, 'ops': ops}
+
+    @socketio.on('join_team')
+    def handle_join_team(data):
+        """Subscribe to team-wide notifications such as scrape_completed"""
+        team_id = data.get('team_id')
+        if not team_id:
+            return
+        if not socket_sessions.allow_team(request.sid, team_id):
+            return {'error': 'Unauthorized'}
+
+        join_room(f"team_{team_id}")
+
+    @socketio.on('leave_team')
+    def handle_leave_team(data):
+        """Unsubscribe from team-wide notifications"""
+        team_id = data.get('team_id')
+        if not team_id:
+            return
+
+        leave_room(f"team_{team_id}")
+
     @socketio.on('cursor_move')
     def handle_cursor_move(data):
-        """Handle user cursor movement"""
+        """Record a user's cursor; it reaches the room in the next presence frame"""
         content_id = data.get('content_id')
-        user_id = data.get('user_id')
-        if not content_id:
+        room = socket_sessions.content_room(request.sid, content_id) if content_id else None
+        if not room:
             return
-            
-        room = f"content_{content_id}"
-        emit('cursor_update', {
-            'user_id': user_id,
-            'position': data.get('position'),
-            'timestamp': datetime.utcnow().isoformat()
-        }, room=room, skip_sid=request.sid)  # Skip sender
+
+        presence.update_cursor(room, socket_sessions.user_id(request.sid), request.sid, data.get('position'))
 
     @socketio.on('typing')
     def handle_typing(data):
-        """Handle user typing indicator"""
+        """Record a user's typing indicator; it clears on its own after a few seconds"""
         content_id = data.get('content_id')
-        user_id = data.get('user_id')
         node_id = data.get('node_id')
-        if not all([content_id, user_id, node_id]):
+        room = socket_sessions.content_room(request.sid, content_id) if content_id and node_id else None
+        if not room:
             return
-            
-        room = f"content_{content_id}"
-        emit('user_typing', {
-            'user_id': user_id,
-            'node_id': node_id,
-            'timestamp': datetime.utcnow().isoformat()
-        }, room=room, skip_sid=request.sid)
-
 
+        presence.update_typing(room, socket_sessions.user_id(request.sid), request.sid, node_id)
@@ -1,6 +1,10 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models import Team, TeamMember, Invitation, User, db
+from ..services.auth_service import auth_required, claimed_role, get_identity
+from ..services.permission_service import permission_cache
+from ..services.dashboard_service import mark_invitations_changed
+from ..services.email_service import queue_team_invitation, queue_team_invitations
+from sqlalchemy import insert, literal, select, union_all
 from datetime import datetime, timedelta
 import uuid
 
@@ -8,25 +12,25 @@ team_bp = Blueprint('team', __name__)
 
 def check_team_permissions(user_id, team_id, required_roles=None):
     """Check if user has required permissions for team operations"""
-    member = TeamMember.query.filter_by(
-        team_id=team_id,
-        user_id=user_id
-    ).first()
+    # A role carried by the token can only grant access; anything it would deny is looked up
+    role = claimed_role(user_id, team_id)
+    if not role or (required_roles and role not in required_roles):
+        role = permission_cache.get_role(user_id, team_id)
     
-    if not member:
+    if not role:
         return False
         
-    if required_roles and member.role not in required_roles:
+    if required_roles and role not in required_roles:
         return False
         
     return True
 
 @team_bp.route('/team/create', methods=['POST'])
-@jwt_required()
+@auth_required
 def create_team():
     try:
         data = request.get_json()
-        user_id = get_jwt_identity()
+        user_id = get_identity()
         
         # First create and commit the team
         team = Team(
@@ -57,56 +61,127 @@ def create_team():
         print(f"Error creating team: {str(e)}")
         return jsonify({'error': 'Failed to create team'}), 500
 
+def _invite_url(invite_code):
+    return f"http://localhost:3000/invite/{invite_code}"
+
 @team_bp.route('/team/invite', methods=['POST'])
-@jwt_required()
+@auth_required
 def invite_member():
     data = request.get_json()
-    user_id = get_jwt_identity()
+    user_id = get_identity()
     
     # Verify user has permission to invite
-    team_member = TeamMember.query.filter_by(
-        team_id=data['team_id'],
-        user_id=user_id
-    ).first()
-    
-    if not team_member or team_member.role == 'member':
+    if not check_team_permissions(user_id, data['team_id'], ['owner', 'admin']):
         return jsonify({'error': 'Unauthorized'}), 403
     
     invitation = Invitation(
         team_id=data['team_id'],
         email=data['email'],
         role=data['role'],
+        invite_code=str(uuid.uuid4()),
         invited_by=user_id,
         expires_at=datetime.utcnow() + timedelta(days=7)
     )
-    
     db.session.add(invitation)
-    db.session.commit()
     
-    # Get team name and send invitation email
-    team = Team.query.get(data['team_id'])
-    invite_url = f"http://localhost:3000/invite/{invitation.invite_code}"
-    
-    from ..services.email_service import send_team_invitation
-    email_sent = send_team_invitation(
-        data['email'],
-        team.name,
-        data['role'],
-        invite_url
-    )
-    
-    if not email_sent:
-        return jsonify({'error': 'Failed to send invitation email'}), 500
+    # The email is queued in the same transaction and sent in the background
+    team_name = db.session.query(Team.name).filter_by(id=data['team_id']).scalar()
+    invite_url = _invite_url(invitation.invite_code)
+    queue_team_invitation(data['email'], team_name, data['role'], invite_url)
+    db.session.commit()
     
     return jsonify({
         'invite_code': invitation.invite_code,
-        'invite_url': invite_url
+        'invite_url': invite_url,
+        'email_status': 'queued'
     }), 201
 
+@team_bp.route('/team/invite/bulk', methods=['POST'])
+@auth_required
+def invite_members_bulk():
+    """Invite several people at once, skipping current members and addresses with a pending invitation.
+
+    Permissions are checked once, the invitations are inserted in one batch and
+    their emails are queued with them in the same transaction.
+    """
+    data = request.get_json()
+    invites = data.get('invitations') if data else None
+    if not data or not data.get('team_id') or not isinstance(invites, list):
+        return jsonify({'error': 'team_id and a list of invitations are required'}), 400
+    if any(not isinstance(invite, dict) or not isinstance(invite.get('email'), str) or not invite['email'].strip()
+           or not invite.get('role') for invite in invites):
+        return jsonify({'error': 'Every invitation needs an email and a role'}), 400
+
+    team_id = data['team_id']
+    user_id = get_identity()
+    if not check_team_permissions(user_id, team_id, ['owner', 'admin']):
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    team_name = db.session.query(Team.name).filter_by(id=team_id).scalar()
+    if team_name is None:
+        return jsonify({'error': 'Team not found'}), 404
+
+    # Repeated addresses keep their first role
+    requested = {}
+    skipped = []
+    for invite in invites:
+        email = invite['email'].strip()
+        if email in requested:
+            skipped.append({'email': email, 'reason': 'duplicate'})
+        else:
+            requested[email] = invite['role']
+
+    try:
+        # Members and pending invitations among the requested addresses, in one query
+        now = datetime.utcnow()
+        existing = dict(db.session.execute(union_all(
+            select(User.email, literal('member'))
+            .join(TeamMember, TeamMember.user_id == User.id)
+            .where(TeamMember.team_id == team_id, User.email.in_(requested)),
+            select(Invitation.email, literal('invited'))
+            .where(Invitation.email.in_(requested),
+                   Invitation.status == 'pending',
+                   Invitation.team_id == team_id,
+                   Invitation.expires_at > now)
+        )).all())
+        skipped.extend({'email': email, 'reason': existing[email]} for email in requested if email in existing)
+
+        expires_at = now + timedelta(days=7)
+        rows = [{
+            'id': str(uuid.uuid4()),
+            'team_id': team_id,
+            'email': email,
+            'role': role,
+            'invite_code': str(uuid.uuid4()),
+            'invited_by': user_id,
+            'expires_at': expires_at,
+            'status': 'pending'
+        } for email, role in requested.items() if email not in existing]
+
+        if rows:
+            db.session.execute(insert(Invitation), rows)
+            # The Core insert skips ORM events, so flag the invitees' dashboards directly
+            mark_invitations_changed(db.session(), [row['email'] for row in rows])
+            queue_team_invitations(team_name, [
+                (row['email'], row['role'], _invite_url(row['invite_code'])) for row in rows
+            ])
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error creating invitations: {str(e)}")
+        return jsonify({'error': 'Failed to create invitations'}), 500
+
+    created = [{
+        'email': row['email'],
+        'invite_code': row['invite_code'],
+        'invite_url': _invite_url(row['invite_code'])
+    } for row in rows]
+    return jsonify({'invitations': created, 'skipped': skipped, 'email_status': 'queued'}), 201
+
 @team_bp.route('/team/accept-invite/<invite_code>', methods=['POST'])
-@jwt_required()
+@auth_required
 def accept_invite(invite_code):
-    user_id = get_jwt_identity()
+    user_id = get_identity()
     invitation = Invitation.query.filter_by(
         invite_code=invite_code,
         status='pending'
@@ -129,12 +204,12 @@ def accept_invite(invite_code):
     return jsonify({'message': 'Invitation accepted successfully'}), 200
 
 @team_bp.route('/team/members/<team_id>', methods=['GET'])
-@jwt_required()
+@auth_required
 def get_team_members(team_id):
-    user_id = get_jwt_identity()
+    user_id = get_identity()
     
     # Check if user is part of the team
-    if not TeamMember.query.filter_by(team_id=team_id, user_id=user_id).first():
+    if not check_team_permissions(user_id, team_id):
         return jsonify({'error': 'Unauthorized'}), 403
     
     members = TeamMember.query.filter_by(team_id=team_id).all()
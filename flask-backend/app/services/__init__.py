@@ -1,3 +1,3 @@
-from .email_service import configure_email, send_team_invitation
+from .email_service import configure_email, queue_team_invitation, queue_team_invitations
 
-__all__ = ['configure_email', 'send_team_invitation']
+__all__ = ['configure_email', 'queue_team_invitation', 'queue_team_invitations']
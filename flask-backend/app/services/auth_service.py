@@ -0,0 +1,106 @@
+from collections import OrderedDict
+from functools import wraps
+import threading
+import time
+from flask import current_app, g, jsonify, request
+from flask_jwt_extended import create_access_token, decode_token
+from jwt import ExpiredSignatureError, InvalidTokenError
+from .. import db
+from ..models import TeamMember
+
+# Compact role codes of the team role claim
+ROLE_CODES = {'owner': 'o', 'admin': 'a', 'member': 'm'}
+ROLES_BY_CODE = {code: role for role, code in ROLE_CODES.items()}
+ROLE_CLAIM = 'tr'
+
+
+class TokenCache:
+    """LRU of verified access tokens -> claims.
+
+    A token is decoded and its signature checked once; later requests with
+    the same token are a dict lookup plus an expiry check against its exp
+    claim, so an expired token is rejected even while it is cached.
+    """
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self.leeway = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_entries = app.config.get('JWT_CACHE_SIZE', self.max_entries)
+        self.leeway = app.config.get('JWT_DECODE_LEEWAY', self.leeway)
+
+    def verify(self, token):
+        """Return the claims of a valid access token; raises ExpiredSignatureError or InvalidTokenError"""
+        with self._lock:
+            claims = self._entries.get(token)
+            if claims is not None:
+                self._entries.move_to_end(token)
+
+        if claims is None:
+            claims = decode_token(token)
+            if claims.get('type') != 'access':
+                raise InvalidTokenError('Only access tokens are accepted')
+            with self._lock:
+                self._entries[token] = claims
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        elif claims.get('exp') is not None and claims['exp'] + self.leeway <= time.time():
+            with self._lock:
+                self._entries.pop(token, None)
+            raise ExpiredSignatureError('Signature has expired')
+        return claims
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
+
+
+def issue_token(user_id):
+    """Create an access token; with JWT_ROLE_CLAIMS it also carries the user's team roles"""
+    claims = None
+    if current_app.config.get('JWT_ROLE_CLAIMS'):
+        claims = {ROLE_CLAIM: {
+            team_id: ROLE_CODES.get(role, role) for team_id, role in
+            db.session.query(TeamMember.team_id, TeamMember.role).filter_by(user_id=user_id)
+        }}
+    return create_access_token(identity=user_id, additional_claims=claims)
+
+
+def _auth_error(message, code):
+    return jsonify({'error': message, 'code': code}), 401
+
+
+def auth_required(fn):
+    """Require a valid bearer access token, verified through the token cache"""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        header = request.headers.get('Authorization', '')
+        if not header.startswith('Bearer '):
+            return _auth_error('Authorization token is missing', 'authorization_required')
+        try:
+            g.auth_claims = token_cache.verify(header[len('Bearer '):])
+        except ExpiredSignatureError:
+            return _auth_error('Token has expired', 'token_expired')
+        except Exception:
+            return _auth_error('Invalid token', 'invalid_token')
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+def get_identity():
+    """The user id of the request's token"""
+    return g.auth_claims['sub']
+
+
+def claimed_role(user_id, team_id):
+    """The user's role in a team according to the request's token, or None when it does not say"""
+    claims = g.get('auth_claims')
+    if not current_app.config.get('JWT_ROLE_CLAIMS') or not claims or claims.get('sub') != user_id:
+        return None
+    code = claims.get(ROLE_CLAIM, {}).get(team_id)
+    return ROLES_BY_CODE.get(code, code)
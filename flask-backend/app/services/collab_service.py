@@ -0,0 +1,256 @@
+import atexit
+import threading
+import time
+
+# Ops applied to a document that a client revision may still be based on
+HISTORY_LIMIT = 1000
+
+
+def _map_through_delete(position, start, end):
+    """Where a position ends up after the range [start, end) is deleted"""
+    if position <= start:
+        return position
+    if position <= end:
+        return start
+    return position - (end - start)
+
+
+def transform_op(op, applied, wins_ties=False):
+    """Rewrite op so it applies after `applied`, both originally based on the same text.
+
+    Returns a list of ops based on the same text, in descending position
+    order, so applying them one after another is also correct. Of two inserts
+    at the same position the applied one stays first, unless op wins_ties
+    (as a server op does when a client rebases it over its own pending op).
+    """
+    if applied['type'] == 'insert':
+        at, length = applied['pos'], len(applied['text'])
+        if op['type'] == 'insert':
+            if at < op['pos'] or (at == op['pos'] and not wins_ties):
+                return [dict(op, pos=op['pos'] + length)]
+            return [op]
+        start, end = op['pos'], op['pos'] + op['length']
+        if at <= start:
+            return [dict(op, pos=start + length)]
+        if at >= end:
+            return [op]
+        # Keep the text inserted inside the deleted range
+        return [
+            {'type': 'delete', 'pos': at + length, 'length': end - at},
+            {'type': 'delete', 'pos': start, 'length': at - start}
+        ]
+
+    start, end = applied['pos'], applied['pos'] + applied['length']
+    if op['type'] == 'insert':
+        return [dict(op, pos=_map_through_delete(op['pos'], start, end))]
+    new_start = _map_through_delete(op['pos'], start, end)
+    new_end = _map_through_delete(op['pos'] + op['length'], start, end)
+    if new_end <= new_start:
+        return []
+    return [{'type': 'delete', 'pos': new_start, 'length': new_end - new_start}]
+
+
+def apply_op(text, op):
+    if op['type'] == 'insert':
+        return text[:op['pos']] + op['text'] + text[op['pos']:]
+    return text[:op['pos']] + text[op['pos'] + op['length']:]
+
+
+def validate_op(op, length=None):
+    """Return a normalized copy of an op, or raise ValueError; bounds are checked when length is given"""
+    if not isinstance(op, dict) or op.get('type') not in ('insert', 'delete'):
+        raise ValueError('Unknown op type')
+    position = op.get('pos')
+    if not isinstance(position, int) or position < 0 or (length is not None and position > length):
+        raise ValueError('Op position out of range')
+    if op['type'] == 'insert':
+        if not isinstance(op.get('text'), str) or not op['text']:
+            raise ValueError('Insert needs text')
+        return {'type': 'insert', 'pos': position, 'text': op['text']}
+    count = op.get('length')
+    if not isinstance(count, int) or count <= 0 or (length is not None and position + count > length):
+        raise ValueError('Delete length out of range')
+    return {'type': 'delete', 'pos': position, 'length': count}
+
+
+class Document:
+    """In-memory text of one node with the ops that produced its recent revisions"""
+    def __init__(self, content_id, node_id, text):
+        self.content_id = content_id
+        self.node_id = node_id
+        self.text = text
+        self.revision = 0
+        # history[i] holds the ops that turned revision base + i into base + i + 1
+        self.history = []
+        self.base = 0
+        self.dirty = False
+        self.last_user = None
+        self.touched_at = time.monotonic()
+        self.lock = threading.Lock()
+
+
+class CollabUnavailable(Exception):
+    """Raised when live editing is disabled, e.g. because several workers share the rooms"""
+
+
+class CollabService:
+    """Operational-transform editing of node sections over Socket.IO.
+
+    Clients send one insert/delete op at a time together with the revision it
+    is based on, and wait for the ack before sending the next (transforming
+    their local ops against the ops broadcast meanwhile). The server rebases
+    each op over the ops applied since that revision, applies it to the node's
+    in-memory document and broadcasts only the resulting ops. Dirty documents
+    are persisted as a snapshot every `snapshot_interval` seconds, on
+    leave/disconnect and at shutdown.
+
+    Documents live in one process. With a Socket.IO message queue, clients
+    of one node may sit on different workers, each with its own revisions
+    and snapshots overwriting the others', so live editing is disabled
+    (`enabled` is False) and clients save full text with PUT instead.
+    """
+    def __init__(self, snapshot_interval=5.0, idle_timeout=600.0):
+        self.snapshot_interval = snapshot_interval
+        self.idle_timeout = idle_timeout
+        self.enabled = True
+        self.app = None
+        self.socketio = None
+        self.content_manager = None
+        self._documents = {}
+        self._lock = threading.Lock()
+        # Serializes snapshot writes so an older text never lands after a newer one
+        self._persist_lock = threading.Lock()
+        self._started = False
+
+    def init_app(self, app, socketio):
+        from .content_service import ContentManager
+
+        self.app = app
+        self.socketio = socketio
+        self.content_manager = ContentManager()
+        self.snapshot_interval = app.config.get('COLLAB_SNAPSHOT_INTERVAL', self.snapshot_interval)
+        self.idle_timeout = app.config.get('COLLAB_IDLE_TIMEOUT', self.idle_timeout)
+        self.enabled = app.config.get('SOCKETIO_QUEUE_BACKEND', 'none') == 'none'
+        atexit.register(self.flush)
+
+    def start(self):
+        """Spawn the background snapshot writer once per process"""
+        if self._started:
+            return
+        self._started = True
+        self.socketio.start_background_task(self._snapshot_loop)
+
+    def get_document(self, content_id, node_id):
+        """Return the live document of a node, loading it on first use"""
+        if not self.enabled:
+            raise CollabUnavailable('Live editing is not available on this deployment, save with PUT instead')
+        with self._lock:
+            document = self._documents.get(node_id)
+        if document is not None:
+            return document
+
+        from .edit_buffer import edit_buffer
+
+        # Buffered full-text edits land first so the document starts from the newest text
+        edit_buffer.flush(node_id=node_id)
+        node = self.content_manager.get_node_content(node_id)
+        document = Document(content_id, node_id, node['content'] if node else '')
+
+        with self._lock:
+            document = self._documents.setdefault(node_id, document)
+        self.start()
+        return document
+
+    def peek(self, node_id):
+        """The live document of a node if one is loaded, without loading it"""
+        with self._lock:
+            return self._documents.get(node_id)
+
+    def apply(self, content_id, node_id, user_id, revision, op):
+        """Rebase and apply a client op; returns (new revision, applied ops)"""
+        op = validate_op(op)
+        document = self.get_document(content_id, node_id)
+        with document.lock:
+            if not isinstance(revision, int) or not document.base <= revision <= document.revision:
+                raise ValueError('Revision is no longer available, reload the document')
+
+            ops = [op]
+            for applied in document.history[revision - document.base:]:
+                # Rebase onto the applied ops in their application order
+                for step in applied:
+                    ops = [part for current in ops for part in transform_op(current, step)]
+
+            # Validate against the current text after rebasing
+            ops = [validate_op(current, len(document.text)) for current in ops]
+            return self._commit(document, user_id, ops)
+
+    def replace(self, content_id, node_id, user_id, text):
+        """Replace a live document's text, e.g. after a full-text PUT; returns (revision, ops)"""
+        document = self.get_document(content_id, node_id)
+        with document.lock:
+            ops = []
+            if document.text:
+                ops.append({'type': 'delete', 'pos': 0, 'length': len(document.text)})
+            if text:
+                ops.append({'type': 'insert', 'pos': 0, 'text': text})
+            return self._commit(document, user_id, ops)
+
+    def _commit(self, document, user_id, ops):
+        for current in ops:
+            document.text = apply_op(document.text, current)
+        document.revision += 1
+        document.history.append(ops)
+        if len(document.history) > HISTORY_LIMIT:
+            dropped = len(document.history) - HISTORY_LIMIT
+            del document.history[:dropped]
+            document.base += dropped
+        document.dirty = True
+        document.last_user = user_id
+        document.touched_at = time.monotonic()
+        return document.revision, ops
+
+    def flush(self, content_id=None, user_id=None):
+        """Persist dirty documents now, optionally only of one content or last edited by one user"""
+        with self._lock:
+            documents = [
+                document for document in self._documents.values()
+                if (content_id is None or document.content_id == content_id)
+                and (user_id is None or document.last_user == user_id)
+            ]
+        with self._persist_lock:
+            return sum(self._persist(document) for document in documents)
+
+    def _persist(self, document):
+        with document.lock:
+            if not document.dirty:
+                return 0
+            text, user_id = document.text, document.last_user
+            document.dirty = False
+
+        try:
+            with self.app.app_context():
+                self.content_manager.update_content(document.content_id, document.node_id, text, user_id)
+        except Exception as e:
+            document.dirty = True
+            print(f"Error saving snapshot of node {document.node_id}: {str(e)}")
+            return 0
+        return 1
+
+    def _snapshot_loop(self):
+        while True:
+            self.socketio.sleep(self.snapshot_interval)
+            try:
+                self.flush()
+                self._evict_idle()
+            except Exception as e:
+                print(f"Error saving document snapshots: {str(e)}")
+
+    def _evict_idle(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            for node_id, document in list(self._documents.items()):
+                if not document.dirty and document.touched_at < cutoff:
+                    del self._documents[node_id]
+
+
+collab_service = CollabService()
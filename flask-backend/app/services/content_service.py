@@ -1,15 +1,23 @@
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
-import re
+from urllib.parse import urljoin, urldefrag, urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
+import threading
+import time
 from .. import db
-from ..models import Content, ContentNode, ContentEdit
+from ..models import Content, ContentNode, ContentEdit, NodeContent
+from .html_extractor import extract, select_parser
+from .history_service import history_store
+from .search_service import search_index
+from .tree_service import insert_tree, section_bodies, section_body, tree_order
+from .dashboard_service import mark_team_changed
+from .permission_service import permission_cache
+from .document_cache import active_documents
 from datetime import datetime
 import json
 
 class ContentManager:
-    def __init__(self):
-        self.scraper = WebScraper()
+    def __init__(self, scraper=None):
+        self.scraper = scraper or WebScraper()
 
         
     def create_content(self, team_id, url):
@@ -19,91 +27,156 @@ class ContentManager:
             if not scraped_data:
                 raise ValueError("Failed to scrape content")
 
-            # Create base content record
-            content = Content(
-                team_id=team_id,
-                url=url,
-                title=scraped_data['title'],
-                original_content=json.dumps(scraped_data['content']),
-                current_content=json.dumps(scraped_data['content']),
-                meta=scraped_data.get('meta', {}),
-                created_at=datetime.utcnow()
-            )
-            db.session.add(content)
-            db.session.flush()
-
-            # Create root node
-            root_node = ContentNode(
-                content_id=content.id,
-                title=scraped_data['title'],
-                node_type='root',
-                level=0,
-                order=0
-            )
-            db.session.add(root_node)
-            db.session.flush()
-
-            # Create structure nodes
-            self._create_file_tree(content.id, scraped_data['structure'], root_node.id)
-            
+            content_id = self._add_content(team_id, url, scraped_data)
             db.session.commit()
-            return content.id
+            return content_id
             
         except Exception as e:
             db.session.rollback()
             print(f"Error creating content: {str(e)}")
             raise
 
-    def _create_file_tree(self, content_id, structure, parent_id=None, order=0):
-        """Recursively create file tree nodes"""
-        for item in structure:
-            node = ContentNode(
-                content_id=content_id,
-                parent_id=parent_id,
-                title=item['title'],
-                node_type='section',
-                level=item['level'],
-                order=order
-            )
-            db.session.add(node)
-            db.session.flush()
-            
-            if item.get('children'):
-                self._create_file_tree(content_id, item['children'], node.id, 0)
-            order += 1
+    def crawl_content(self, team_id, urls=None, seed_url=None, max_depth=0,
+                      same_host=True, max_pages=100, batch_size=25):
+        """Crawl pages concurrently and store each one as Content in batched transactions"""
+        started = time.monotonic()
+        content_ids = []
+        failed = []
+        pending = 0
+
+        try:
+            for url, scraped_data in self.scraper.crawl(
+                urls=urls,
+                seed_url=seed_url,
+                max_depth=max_depth,
+                same_host=same_host,
+                max_pages=max_pages
+            ):
+                if not scraped_data:
+                    failed.append(url)
+                    continue
+
+                content_ids.append(self._add_content(team_id, url, scraped_data))
+                pending += 1
+                if pending >= batch_size:
+                    db.session.commit()
+                    pending = 0
+
+            db.session.commit()
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error crawling content: {str(e)}")
+            raise
+
+        elapsed = time.monotonic() - started
+        pages = len(content_ids) + len(failed)
+        pages_per_second = round(pages / elapsed, 2) if elapsed > 0 else float(pages)
+        print(f"Crawl finished: {pages} pages in {elapsed:.2f}s ({pages_per_second} pages/s)")
+
+        return {
+            'content_ids': content_ids,
+            'failed_urls': failed,
+            'pages': pages,
+            'elapsed_seconds': round(elapsed, 3),
+            'pages_per_second': pages_per_second
+        }
+
+    def _add_content(self, team_id, url, scraped_data):
+        """Add a Content record and its file tree to the session without committing"""
+        # Create base content record
+        content = Content(
+            team_id=team_id,
+            url=url,
+            title=scraped_data['title'],
+            original_content=json.dumps(scraped_data.get('sections', scraped_data['content'])),
+            current_content=json.dumps(scraped_data['content']),
+            meta=scraped_data.get('meta', {}),
+            created_at=datetime.utcnow()
+        )
+        db.session.add(content)
+        db.session.flush()
+
+        # Create root and structure nodes with their section bodies
+        insert_tree(content.id, scraped_data['title'], scraped_data['structure'],
+                    scraped_data.get('sections', scraped_data['content']))
+        search_index.index_content(content.id)
+        return content.id
+
+    def _add_section(self, node, body):
+        """Store a node's section body"""
+        section = NodeContent(node_id=node.id, content_id=node.content_id, body=body)
+        db.session.add(section)
+        return section
+
+    def _get_section(self, node):
+        """Load a node's section, migrating its content from the legacy blob if needed"""
+        section = NodeContent.query.get(node.id)
+        if section is None:
+            self._migrate_content(node.content_id)
+            section = NodeContent.query.get(node.id)
+        return section
+
+    def _migrate_content(self, content_id):
+        """Split one Content.current_content blob into NodeContent rows"""
+        content = Content.query.get(content_id)
+        sections = json.loads(content.current_content) if content else {}
+        existing = {
+            node_id for (node_id,) in
+            db.session.query(NodeContent.node_id).filter_by(content_id=content_id)
+        }
+        for node in ContentNode.query.filter_by(content_id=content_id):
+            if node.id not in existing:
+                self._add_section(node, sections.get(node.title, {}).get('content', ''))
+        db.session.flush()
+        search_index.index_content(content_id)
+
+    def migrate_section_storage(self, batch_size=100):
+        """Move section bodies of every legacy Content blob into NodeContent rows"""
+        migrated_ids = db.session.query(NodeContent.content_id).distinct()
+        pending = [
+            content_id for (content_id,) in
+            db.session.query(Content.id).filter(~Content.id.in_(migrated_ids))
+        ]
+
+        try:
+            for count, content_id in enumerate(pending, 1):
+                self._migrate_content(content_id)
+                if count % batch_size == 0:
+                    db.session.commit()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error migrating section storage: {str(e)}")
+            raise
+
+        return len(pending)
 
     def update_content(self, content_id, node_id, new_content, user_id):
         """Update content with version control"""
         try:
             node = ContentNode.query.get(node_id)
-            if not node:
+            if not node or node.content_id != content_id:
                 raise ValueError("Node not found")
 
-            content = Content.query.get(content_id)
-            if not content:
-                raise ValueError("Content not found")
+            section = self._get_section(node)
 
-            current_data = json.loads(content.current_content)
+            # Store the change for version control
+            history_store.record_edit(content_id, node_id, user_id, section.body, new_content)
 
-            # Store previous content for version control
-            edit = ContentEdit(
-                content_id=content_id,
-                node_id=node_id,
-                user_id=user_id,
-                previous_content=current_data.get(node.title, {}).get('content', ''),
-                new_content=new_content,
-                created_at=datetime.utcnow()
+            # Only the edited section is rewritten
+            section.body = new_content
+            search_index.index_node(node, new_content)
+            updated_at = datetime.utcnow()
+            Content.query.filter_by(id=content_id).update(
+                {'updated_at': updated_at}, synchronize_session=False
             )
-            db.session.add(edit)
-
-            # Update content
-            if node.title not in current_data:
-                current_data[node.title] = {}
-            current_data[node.title]['content'] = new_content
-            content.current_content = json.dumps(current_data)
-            content.updated_at = datetime.utcnow()
+            # The bulk update skips ORM events, so flag the team's dashboards directly
+            _, team_id = permission_cache.resolve_node(node_id)
+            mark_team_changed(db.session(), team_id)
             
             db.session.commit()
+            active_documents.write_through(content_id, node_id, new_content, updated_at)
             return True
             
         except Exception as e:
@@ -111,37 +184,160 @@ class ContentManager:
             print(f"Error updating content: {str(e)}")
             raise
 
-    def get_node_content(self, node_id, include_history=False):
-        """Get node content with optional history"""
-        try:
-            node = ContentNode.query.get(node_id)
-            if not node:
-                return None
+    def refresh_content(self, content_id, user_id):
+        """Re-scrape existing content, rewriting only the sections that changed upstream.
 
-            content = Content.query.get(node.content_id)
+        Every rewritten section gets an edit row attributed to user_id, the
+        user who asked for the refresh, so its history stays complete.
+        """
+        try:
+            content = Content.query.get(content_id)
             if not content:
-                return None
-
-            content_data = json.loads(content.current_content)
-            node_content = content_data.get(node.title, {}).get('content', '')
+                raise ValueError("Content not found")
 
-            result = {
-                'id': node.id,
-                'title': node.title,
-                'content': node_content,
-                'type': node.node_type,
-                'level': node.level
+            meta = dict(content.meta or {})
+            refreshed = self.scraper.refresh_url(content.url, meta.get('validators'))
+            meta['last_checked'] = datetime.utcnow().isoformat()
+
+            if not refreshed['changed']:
+                meta['validators'] = refreshed['validators']
+                content.meta = meta
+                db.session.commit()
+                return {'changed': False, 'updated_sections': [], 'kept_edits': []}
+
+            # Sections are matched by title and position among the sections with that title
+            previous = section_bodies(json.loads(content.original_content))
+            upstream_sections = refreshed.get('sections', refreshed['content'])
+            upstream = section_bodies(upstream_sections)
+            changed = {
+                title for title in set(previous) | set(upstream)
+                if previous.get(title) != upstream.get(title)
             }
+            updated, kept = set(), set()
+            nodes = self._numbered_nodes(content_id)
+
+            if changed:
+                if not db.session.query(NodeContent.node_id).filter_by(content_id=content_id).first():
+                    self._migrate_content(content_id)
+
+                targets = [(node, occurrence) for node, occurrence in nodes if node.title in changed]
+                sections = {
+                    section.node_id: section for section in
+                    NodeContent.query.filter(NodeContent.node_id.in_([node.id for node, _ in targets]))
+                }
+                for node, occurrence in targets:
+                    section = sections.get(node.id)
+                    previous_body = section_body(previous, node.title, occurrence)
+                    upstream_body = section_body(upstream, node.title, occurrence)
+                    if section is None or previous_body == upstream_body:
+                        continue
+                    # Sections the user has edited keep their edited body
+                    if section.body != previous_body:
+                        kept.add(node.title)
+                        continue
+                    history_store.record_edit(content_id, node.id, user_id, section.body, upstream_body)
+                    section.body = upstream_body
+                    updated.add(node.title)
+
+            updated |= self._add_missing_nodes(content, refreshed['structure'], upstream, nodes)
+
+            meta.update(refreshed['meta'])
+            content.meta = meta
+            content.original_content = json.dumps(upstream_sections)
+            if updated:
+                content.updated_at = datetime.utcnow()
+                search_index.index_content(content_id)
+
+            db.session.commit()
+            if updated:
+                active_documents.invalidate(content_id)
+            return {'changed': True, 'updated_sections': sorted(updated), 'kept_edits': sorted(kept)}
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error refreshing content: {str(e)}")
+            raise
+
+    def _numbered_nodes(self, content_id):
+        """(node, occurrence) for a content's nodes: the root first, then headings in document order.
+
+        occurrence counts the earlier headings with the same title, as
+        insert_tree does when it assigns section bodies.
+        """
+        ordered, root = tree_order(ContentNode.query.filter_by(content_id=content_id).all())
+        numbered = [(root, 0)] if root is not None else []
+        occurrences = {}
+        for node in ordered:
+            occurrence = occurrences.get(node.title, 0)
+            occurrences[node.title] = occurrence + 1
+            numbered.append((node, occurrence))
+        return numbered
+
+    def _add_missing_nodes(self, content, structure, bodies, nodes):
+        """Create tree nodes for headings that appeared since the last scrape"""
+        root = next((node for node, _ in nodes if node.node_type == 'root'), None)
+        existing = {(node.title, occurrence): node for node, occurrence in nodes if node is not root}
+        occurrences = {}
+        added = set()
+        if root is None:
+            return added
+
+        def walk(items, parent_id):
+            for order, item in enumerate(items):
+                title = item['title']
+                occurrence = occurrences.get(title, 0)
+                occurrences[title] = occurrence + 1
+                node = existing.get((title, occurrence))
+                if node is None:
+                    node = ContentNode(
+                        content_id=content.id,
+                        parent_id=parent_id,
+                        title=item['title'],
+                        node_type='section',
+                        level=item['level'],
+                        order=order
+                    )
+                    db.session.add(node)
+                    db.session.flush()
+                    self._add_section(node, section_body(bodies, title, occurrence))
+                    added.add(title)
+                walk(item.get('children', []), node.id)
+
+        walk(structure, root.id)
+        return added
+
+    def get_node_content(self, node_id, include_history=False, history_limit=50, history_after=None):
+        """Get node content with optional history, newest edits first, one page at a time"""
+        try:
+            # Documents open in a room are served from memory
+            result = active_documents.get_node(node_id)
+            if result is None:
+                node = ContentNode.query.get(node_id)
+                if not node:
+                    return None
+
+                section = NodeContent.query.get(node_id)
+                if section is None:
+                    section = self._get_section(node)
+                    db.session.commit()
+
+                result = {
+                    'id': node.id,
+                    'title': node.title,
+                    'content': section.body,
+                    'type': node.node_type,
+                    'level': node.level
+                }
 
             if include_history:
-                edits = ContentEdit.query.filter_by(node_id=node_id)\
-                    .order_by(ContentEdit.created_at.desc())\
-                    .all()
+                edits, next_cursor = history_store.list_edits(node_id, history_limit, history_after)
                 result['history'] = [edit.to_dict() for edit in edits]
+                result['history_next_cursor'] = next_cursor
 
             return result
 
         except Exception as e:
+            db.session.rollback()
             print(f"Error fetching node content: {str(e)}")
             return None
 
@@ -153,157 +349,160 @@ class ContentManager:
         return content_data.get(node.title, "")
 
 class WebScraper:
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (compatible; DocumentationBot/1.0)'
-        })
-
-    def scrape_url(self, url):
+    def __init__(self, max_workers=8, per_host_limit=4, parser='auto'):
+        self.preferred_parser = parser
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self._parser = None
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._host_slots = {}
+        self._host_lock = threading.Lock()
+
+    @property
+    def parser(self):
+        # Probing for lxml imports it, so wait until the first page is parsed
+        if self._parser is None:
+            self._parser = select_parser(self.preferred_parser)
+        return self._parser
+
+    @property
+    def session(self):
+        """The HTTP session, built on first use so requests is not imported at startup"""
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                # The session doubles as the connection pool shared by crawl workers
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers.update({
+                    'User-Agent': 'Mozilla/5.0 (compatible; DocumentationBot/1.0)'
+                })
+                self._session = session
+            return self._session
+
+    def scrape_url(self, url, collect_links=False):
         """Scrape content from URL"""
         try:
             print(f"Starting to scrape URL: {url}")
             response = self.session.get(url, timeout=10)
             response.raise_for_status()
-
-            soup = BeautifulSoup(response.text, 'html.parser')
             print("Successfully fetched page content")
 
-            # Clean up the HTML
-            self._remove_unwanted_elements(soup)
-
-            # Extract content
-            title = self._extract_title(soup)
-            content = self._extract_content(soup)
-            structure = self._extract_structure(soup)
-            meta = self._extract_meta(soup)
-
-            print(f"Extracted Title: {title}")
-            print(f"Found {len(structure)} main sections")
-
-            return {
-                'title': title,
-                'content': content,
-                'structure': structure,
-                'meta': meta
-            }
+            return self._parse_response(response, collect_links)
         except Exception as e:
             print(f"Error scraping {url}: {str(e)}")
             return None
 
-    def _remove_unwanted_elements(self, soup):
-        """Remove unwanted elements from HTML"""
-        unwanted = ['script', 'style', 'iframe', 'nav', 'footer', 'header', 'noscript']
-        for tag in unwanted:
-            for element in soup.find_all(tag):
-                element.decompose()
-        
-        # Remove hidden elements
-        for element in soup.find_all(style=re.compile(r'display:\s*none')):
-            element.decompose()
-
-    def _extract_title(self, soup):
-        """Extract page title"""
-        if h1 := soup.find('h1'):
-            return h1.get_text(strip=True)
-        if title := soup.find('title'):
-            return title.get_text(strip=True)
-        return "Untitled Document"
-
-    def _extract_content(self, soup):
-        """Extract main content"""
-        main_content = (
-            soup.find('main') or 
-            soup.find('article') or 
-            soup.find('div', class_=re.compile(r'content|main|docs|documentation', re.I))
-        )
-        
-        if not main_content:
+    def refresh_url(self, url, validators=None):
+        """Conditionally re-fetch a URL, parsing it only when the page changed"""
+        validators = validators or {}
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+        response = self.session.get(url, headers=headers, timeout=10)
+        if response.status_code == 304:
+            return {'changed': False, 'validators': validators}
+        response.raise_for_status()
+
+        new_validators = self._extract_validators(response)
+        if validators.get('content_hash') == new_validators['content_hash']:
+            return {'changed': False, 'validators': new_validators}
+
+        result = self._parse_response(response)
+        result['changed'] = True
+        return result
+
+    def _parse_response(self, response, collect_links=False):
+        """Parse a fetched page into title, content, structure and meta"""
+        extracted = extract(response.text, parser=self.parser)
+        if not extracted['content']:
             print("Warning: No main content found")
-            return {}
-
-        return self._structure_content(main_content)
 
-    def _structure_content(self, content):
-        """Convert HTML content to structured format"""
-        structured = {}
-        current_section = None
-        buffer = []
-        
-        for element in content.children:
-            if not element.name:  # Skip text nodes
-                continue
-                
-            if element.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
-                # Save previous section
-                if current_section and buffer:
-                    structured[current_section]['content'] = ''.join(str(b) for b in buffer)
-                    buffer = []
-                
-                current_section = element.get_text(strip=True)
-                structured[current_section] = {'content': '', 'type': 'section'}
-            elif current_section:
-                buffer.append(element)
-            
-        # Save last section
-        if current_section and buffer:
-            structured[current_section]['content'] = ''.join(str(b) for b in buffer)
-        
-        return structured
-
-    def _extract_structure(self, soup):
-        """Extract document structure"""
-        structure = []
-        headers = soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
-        current_path = [None] * 6
-        
-        for header in headers:
-            level = int(header.name[1]) - 1
-            title = header.get_text(strip=True)
-            
-            node = {
-                'title': title,
-                'level': level,
-                'children': []
-            }
-            
-            if level == 0:
-                structure.append(node)
-            else:
-                # Find appropriate parent
-                parent_level = level - 1
-                while parent_level >= 0:
-                    if current_path[parent_level]:
-                        current_path[parent_level]['children'].append(node)
-                        break
-                    parent_level -= 1
-                if parent_level < 0:
-                    structure.append(node)
-            
-            current_path[level] = node
-            # Reset deeper levels
-            for i in range(level + 1, 6):
-                current_path[i] = None
-        
-        return structure
-
-    def _extract_meta(self, soup):
-        """Extract meta information"""
-        meta = {}
-        
-        # Description
-        if desc := soup.find('meta', {'name': 'description'}):
-            meta['description'] = desc.get('content', '')
-        
-        # Keywords
-        if keywords := soup.find('meta', {'name': 'keywords'}):
-            meta['keywords'] = [k.strip() for k in keywords.get('content', '').split(',')]
-        
-        # Author
-        if author := soup.find('meta', {'name': 'author'}):
-            meta['author'] = author.get('content', '')
-        
-        # Add more metadata as needed
+        meta = extracted['meta']
         meta['last_scraped'] = datetime.utcnow().isoformat()
-        
-        return meta
\ No newline at end of file
+        meta['validators'] = self._extract_validators(response)
+
+        print(f"Extracted Title: {extracted['title']}")
+        print(f"Found {len(extracted['structure'])} main sections")
+
+        result = {
+            'title': extracted['title'],
+            'content': extracted['content'],
+            'sections': extracted['sections'],
+            'structure': extracted['structure'],
+            'meta': meta
+        }
+        if collect_links:
+            result['links'] = self._extract_links(extracted['links'], response.url)
+        return result
+
+    def _extract_validators(self, response):
+        """Extract cache validators used for conditional re-scrapes"""
+        return {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'content_hash': hashlib.sha256(response.content).hexdigest()
+        }
+
+    def crawl(self, urls=None, seed_url=None, max_depth=0, same_host=True, max_pages=100):
+        """Fetch pages concurrently, yielding (url, scraped_data) as each completes"""
+        frontier = list(dict.fromkeys(urls or ([seed_url] if seed_url else [])))
+        seen = set(frontier)
+        allowed_hosts = {urlparse(url).netloc for url in frontier}
+        fetched = 0
+        depth = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while frontier and fetched < max_pages:
+                batch = frontier[:max_pages - fetched]
+                fetched += len(batch)
+                follow_links = depth < max_depth
+                futures = {
+                    pool.submit(self._scrape_with_host_limit, url, follow_links): url
+                    for url in batch
+                }
+
+                frontier = []
+                for future in as_completed(futures):
+                    url = futures[future]
+                    scraped_data = future.result()
+                    yield url, scraped_data
+
+                    if not scraped_data or not follow_links:
+                        continue
+                    for link in scraped_data.get('links', []):
+                        if link in seen:
+                            continue
+                        if same_host and urlparse(link).netloc not in allowed_hosts:
+                            continue
+                        seen.add(link)
+                        frontier.append(link)
+
+                depth += 1
+
+    def _scrape_with_host_limit(self, url, collect_links):
+        """Scrape a URL while holding one of its host's concurrency slots"""
+        host = urlparse(url).netloc
+        with self._host_lock:
+            slot = self._host_slots.setdefault(
+                host, threading.BoundedSemaphore(self.per_host_limit)
+            )
+        with slot:
+            return self.scrape_url(url, collect_links=collect_links)
+
+    def _extract_links(self, hrefs, base_url):
+        """Resolve anchor hrefs to absolute http(s) links"""
+        links = []
+        for href in hrefs:
+            link, _ = urldefrag(urljoin(base_url, href))
+            if urlparse(link).scheme in ('http', 'https'):
+                links.append(link)
+        return list(dict.fromkeys(links))
@@ -0,0 +1,196 @@
+from collections import OrderedDict
+import threading
+import time
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session, object_session
+from .. import db
+from ..models import User, Team, TeamMember, Invitation, Content, ContentEdit
+
+
+class DashboardCache:
+    """Builds the GET /user/info payload in a constant number of queries and caches it per user.
+
+    A cached dashboard is dropped once a transaction that changes content in
+    one of the user's teams, their memberships or their invitations commits.
+    The TTL bounds how long other processes can serve a stale dashboard.
+    """
+    def __init__(self, max_entries=1024, ttl=60, recent_content=5, recent_edits=10):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.recent_content = recent_content
+        self.recent_edits = recent_edits
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_entries = app.config.get('DASHBOARD_CACHE_SIZE', self.max_entries)
+        self.ttl = app.config.get('DASHBOARD_CACHE_TTL', self.ttl)
+
+    def get_dashboard(self, user_id):
+        """Return the user's dashboard, or None when the user does not exist"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry['expires'] > now:
+                self._entries.move_to_end(user_id)
+                return entry['dashboard']
+
+        dashboard = self.load_dashboard(user_id)
+        if dashboard is None:
+            return None
+
+        with self._lock:
+            self._entries[user_id] = {
+                'expires': now + self.ttl,
+                'dashboard': dashboard,
+                'email': dashboard['user']['email'],
+                'team_ids': {team['team_id'] for team in dashboard['teams']}
+            }
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return dashboard
+
+    def invalidate(self, user_ids=(), team_ids=(), emails=()):
+        """Drop the dashboards of the given users and of everyone in the given teams"""
+        user_ids, team_ids, emails = set(user_ids), set(team_ids), set(emails)
+        with self._lock:
+            stale = [
+                user_id for user_id, entry in self._entries.items()
+                if user_id in user_ids
+                or entry['email'] in emails
+                or not entry['team_ids'].isdisjoint(team_ids)
+            ]
+            for user_id in stale:
+                del self._entries[user_id]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def load_dashboard(self, user_id):
+        """Load the dashboard with five queries, however many teams the user is in"""
+        user = User.query.get(user_id)
+        if not user:
+            return None
+
+        memberships = db.session.query(
+            TeamMember.role, TeamMember.joined_at, Team.id, Team.name, Team.owner_id
+        ).join(Team, Team.id == TeamMember.team_id)\
+            .filter(TeamMember.user_id == user_id)\
+            .all()
+
+        # Top-N most recently updated content of every team in one windowed query
+        recent = {}
+        team_ids = [membership.id for membership in memberships]
+        if team_ids:
+            ranked = db.session.query(
+                Content.id, Content.team_id, Content.title, Content.updated_at,
+                func.row_number().over(
+                    partition_by=Content.team_id,
+                    order_by=Content.updated_at.desc()
+                ).label('rank')
+            ).filter(Content.team_id.in_(team_ids)).subquery()
+            rows = db.session.query(ranked)\
+                .filter(ranked.c.rank <= self.recent_content)\
+                .order_by(ranked.c.team_id, ranked.c.rank)\
+                .all()
+            for row in rows:
+                recent.setdefault(row.team_id, []).append({
+                    'content_id': row.id,
+                    'title': row.title,
+                    'updated_at': row.updated_at.isoformat()
+                })
+
+        pending_invites = Invitation.query.filter_by(
+            email=user.email,
+            status='pending'
+        ).all()
+
+        recent_edits = db.session.query(
+            ContentEdit.content_id, ContentEdit.node_id, ContentEdit.created_at, ContentEdit.has_changes
+        ).filter(ContentEdit.user_id == user_id)\
+            .order_by(ContentEdit.created_at.desc())\
+            .limit(self.recent_edits)\
+            .all()
+
+        teams_info = [{
+            'team_id': membership.id,
+            'team_name': membership.name,
+            'role': membership.role,
+            'joined_at': membership.joined_at.isoformat(),
+            'is_owner': membership.owner_id == user_id,
+            'recent_activity': recent.get(membership.id, [])
+        } for membership in memberships]
+
+        return {
+            'user': {
+                'id': user.id,
+                'email': user.email,
+                'created_at': user.created_at.isoformat(),
+                'status': user.status,
+                'teams_count': len(teams_info)
+            },
+            'teams': teams_info,
+            'pending_invitations': [{
+                'team_id': invite.team_id,
+                'role': invite.role,
+                'invite_code': invite.invite_code,
+                'expires_at': invite.expires_at.isoformat()
+            } for invite in pending_invites],
+            'recent_activity': [{
+                'content_id': edit.content_id,
+                'node_id': edit.node_id,
+                'created_at': edit.created_at.isoformat(),
+                'has_changes': edit.has_changes
+            } for edit in recent_edits]
+        }
+
+
+dashboard_cache = DashboardCache()
+
+
+def mark_team_changed(session, team_id):
+    """Invalidate the dashboards of a team's members once the session commits"""
+    _pending(session)['team_ids'].add(team_id)
+
+
+def mark_invitations_changed(session, emails):
+    """Invalidate the dashboards of invitees once the session commits, for Core inserts that skip ORM events"""
+    _pending(session)['emails'].update(emails)
+
+
+def _pending(session):
+    return session.info.setdefault('dashboard_changes', {
+        'user_ids': set(), 'team_ids': set(), 'emails': set()
+    })
+
+
+def _content_changed(mapper, connection, content):
+    mark_team_changed(object_session(content), content.team_id)
+
+
+def _membership_changed(mapper, connection, member):
+    _pending(object_session(member))['user_ids'].add(member.user_id)
+
+
+def _invitation_changed(mapper, connection, invitation):
+    _pending(object_session(invitation))['emails'].add(invitation.email)
+
+
+for _event in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Content, _event, _content_changed)
+    event.listen(TeamMember, _event, _membership_changed)
+    event.listen(Invitation, _event, _invitation_changed)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_invalidations(session):
+    changes = session.info.pop('dashboard_changes', None)
+    if changes:
+        dashboard_cache.invalidate(**changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_invalidations(session):
+    session.info.pop('dashboard_changes', None)
@@ -0,0 +1,181 @@
+from collections import OrderedDict
+import threading
+from .. import db
+from ..models import Content, NodeContent
+from .tree_service import content_tree
+
+
+class ActiveDocumentCache:
+    """Holds the tree and section bodies of documents open in a content room.
+
+    A document is loaded when the first client joins its room and dropped when
+    the last one leaves; GET content/node requests for it are then answered
+    from memory and update_content writes through. At most `max_entries`
+    documents are held; a live document evicted by that bound is reloaded on
+    its next read. Membership is per process, so with several workers set
+    `verify` to check each read against Content.updated_at, which every edit
+    bumps, and reload documents changed by another worker.
+    """
+    def __init__(self, max_entries=64, verify=False):
+        self.max_entries = max_entries
+        self.verify = verify
+        # content_id -> document
+        self._documents = OrderedDict()
+        # node_id -> content_id of loaded documents
+        self._nodes = {}
+        # content_id -> sids of the clients in its room
+        self._members = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_entries = app.config.get('ACTIVE_DOCUMENT_CACHE_SIZE', self.max_entries)
+        self.verify = app.config.get('ACTIVE_DOCUMENT_VERIFY', self.verify)
+
+    def open(self, content_id, sid):
+        """Register a client in a content's room, loading the document for the first one"""
+        if self._get(content_id) is None:
+            return False
+        with self._lock:
+            self._members.setdefault(content_id, set()).add(sid)
+        return True
+
+    def close(self, content_id, sid):
+        """Unregister a client; the document is dropped once its room is empty"""
+        with self._lock:
+            members = self._members.get(content_id)
+            if members is None:
+                return
+            members.discard(sid)
+            if not members:
+                del self._members[content_id]
+                self._evict(content_id)
+
+    def close_sid(self, sid):
+        """Unregister a disconnected client from every room"""
+        with self._lock:
+            rooms = [content_id for content_id, members in self._members.items() if sid in members]
+        for content_id in rooms:
+            self.close(content_id, sid)
+
+    def get_content(self, content_id, include_content=False):
+        """The serialized content of an open document, or None when it is not open"""
+        document = self._get(content_id, live_only=True)
+        if document is None:
+            return None
+        tree = document['tree'] if include_content else document['outline']
+        return dict(document['content'], tree=tree)
+
+    def get_node(self, node_id):
+        """The fields of an open document's node, or None when it is not open"""
+        with self._lock:
+            content_id = self._nodes.get(node_id)
+        if content_id is None:
+            return None
+        document = self._get(content_id, live_only=True)
+        node = document['nodes'].get(node_id) if document else None
+        if node is None:
+            return None
+        return {
+            'id': node['id'],
+            'title': node['title'],
+            'content': node['content'],
+            'type': node['type'],
+            'level': node['level']
+        }
+
+    def write_through(self, content_id, node_id, body, updated_at):
+        """Apply a committed section edit to the open document"""
+        with self._lock:
+            document = self._documents.get(content_id)
+            if document is None or node_id not in document['nodes']:
+                return
+            document['nodes'][node_id]['content'] = body
+            document['stamp'] = updated_at
+            document['content']['updated_at'] = updated_at.isoformat()
+
+    def invalidate(self, content_id):
+        """Drop a loaded document, e.g. after its structure changed; it reloads on the next read"""
+        with self._lock:
+            self._evict(content_id)
+
+    def _get(self, content_id, live_only=False):
+        with self._lock:
+            if live_only and content_id not in self._members:
+                return None
+            document = self._documents.get(content_id)
+            if document is not None:
+                self._documents.move_to_end(content_id)
+
+        if document is not None and self.verify:
+            stamp = db.session.query(Content.updated_at).filter_by(id=content_id).scalar()
+            if stamp != document['stamp']:
+                document = None
+        if document is None:
+            document = self._load(content_id)
+            if document is None:
+                return None
+            with self._lock:
+                self._evict(content_id)
+                self._documents[content_id] = document
+                self._nodes.update((node_id, content_id) for node_id in document['nodes'])
+                while len(self._documents) > self.max_entries:
+                    self._evict(next(iter(self._documents)))
+        return document
+
+    def _evict(self, content_id):
+        document = self._documents.pop(content_id, None)
+        if document is not None:
+            for node_id in document['nodes']:
+                self._nodes.pop(node_id, None)
+
+    def _load(self, content_id):
+        from .content_service import ContentManager
+
+        content = db.session.get(Content, content_id)
+        if content is None:
+            return None
+        if not db.session.query(NodeContent.node_id).filter_by(content_id=content_id).first():
+            # Legacy blob storage is split into sections once, as get_node_content would
+            ContentManager()._migrate_content(content_id)
+            db.session.commit()
+
+        tree = content_tree.load_tree(content_id, include_content=True)
+        nodes = {}
+        pending = [tree] if tree else []
+        while pending:
+            node = pending.pop()
+            nodes[node['id']] = node
+            pending.extend(node['children'])
+
+        return {
+            'stamp': content.updated_at,
+            'content': {
+                'id': content.id,
+                'title': content.title,
+                'url': content.url,
+                'team_id': content.team_id,
+                'meta': content.meta,
+                'created_at': content.created_at.isoformat(),
+                'updated_at': content.updated_at.isoformat()
+            },
+            # Nodes of the full tree are shared with the index, so write-through updates both
+            'tree': tree,
+            'outline': _outline(tree),
+            'nodes': nodes
+        }
+
+
+def _outline(node):
+    """Copy of a tree without section bodies"""
+    if node is None:
+        return None
+    return {
+        'id': node['id'],
+        'title': node['title'],
+        'type': node['type'],
+        'level': node['level'],
+        'children': [_outline(child) for child in node['children']]
+    }
+
+
+active_documents = ActiveDocumentCache()
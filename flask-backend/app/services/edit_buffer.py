@@ -0,0 +1,134 @@
+import atexit
+import threading
+import time
+
+
+class EditBuffer:
+    """Write-behind buffer that coalesces rapid edits of a node into one history entry.
+
+    Successive edits by the same user to the same node are held in memory and
+    written with a single update_content call (one ContentEdit row, one
+    commit) once the user pauses for `window` seconds, after `max_delay`
+    seconds at most, when another user edits the node, or when flushed
+    explicitly on leave/disconnect and at shutdown. A window of 0 writes
+    every edit through immediately.
+
+    The buffer lives in one process, so with a Socket.IO message queue
+    (several workers) it is off: a user's edits may reach different workers,
+    whose flushes could land out of order, and pending_content would only
+    see this worker's edits.
+    """
+    def __init__(self, window=2.0, max_delay=30.0, poll_interval=0.5):
+        self.window = window
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.app = None
+        self.socketio = None
+        self.content_manager = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._started = False
+
+    def init_app(self, app, socketio):
+        from .content_service import ContentManager
+
+        self.app = app
+        self.socketio = socketio
+        self.content_manager = ContentManager()
+        self.window = app.config.get('EDIT_COALESCE_WINDOW', self.window)
+        self.max_delay = app.config.get('EDIT_COALESCE_MAX_DELAY', self.max_delay)
+        if app.config.get('SOCKETIO_QUEUE_BACKEND', 'none') != 'none':
+            self.window = 0
+        atexit.register(self.flush_all)
+
+    def start(self):
+        """Spawn the background flusher once per process"""
+        if self._started:
+            return
+        self._started = True
+        self.socketio.start_background_task(self._flush_loop)
+
+    def submit(self, content_id, node_id, new_content, user_id):
+        """Record an edit; it is written now or when its coalescing window closes"""
+        if not self.window:
+            return self.content_manager.update_content(content_id, node_id, new_content, user_id)
+
+        # Another user's pending edit of this node must land first
+        self._write_matching(lambda entry: entry['node_id'] == node_id and entry['user_id'] != user_id)
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._pending.get((user_id, node_id))
+            if entry is None:
+                entry = self._pending[(user_id, node_id)] = {
+                    'content_id': content_id,
+                    'node_id': node_id,
+                    'user_id': user_id,
+                    'first_at': now
+                }
+            entry['content'] = new_content
+            entry['last_at'] = now
+
+        self.start()
+        return True
+
+    def pending_content(self, node_id):
+        """The newest unwritten text of a node, or None when nothing is buffered"""
+        with self._lock:
+            entries = [entry for (_, pending_node), entry in self._pending.items() if pending_node == node_id]
+        if not entries:
+            return None
+        return max(entries, key=lambda entry: entry['last_at'])['content']
+
+    def flush(self, user_id=None, content_id=None, node_id=None):
+        """Write buffered edits now, optionally only those of one user, content and/or node"""
+        return self._write_matching(lambda entry: (
+            (user_id is None or entry['user_id'] == user_id)
+            and (content_id is None or entry['content_id'] == content_id)
+            and (node_id is None or entry['node_id'] == node_id)
+        ))
+
+    def flush_all(self):
+        return self.flush()
+
+    def _flush_due(self):
+        now = time.monotonic()
+        return self._write_matching(lambda entry: (
+            now - entry['last_at'] >= self.window or now - entry['first_at'] >= self.max_delay
+        ))
+
+    def _flush_loop(self):
+        while True:
+            self.socketio.sleep(self.poll_interval)
+            try:
+                self._flush_due()
+            except Exception as e:
+                print(f"Error flushing buffered edits: {str(e)}")
+
+    def _write_matching(self, predicate):
+        """Take the pending entries matching predicate out of the buffer and write them"""
+        with self._lock:
+            if not any(predicate(entry) for entry in self._pending.values()):
+                return 0
+
+        # Taking and writing under one lock keeps a node's history in submission order
+        with self._flush_lock:
+            with self._lock:
+                keys = [key for key, entry in self._pending.items() if predicate(entry)]
+                entries = [self._pending.pop(key) for key in keys]
+            if not entries:
+                return 0
+
+            with self.app.app_context():
+                for entry in entries:
+                    try:
+                        self.content_manager.update_content(
+                            entry['content_id'], entry['node_id'], entry['content'], entry['user_id']
+                        )
+                    except Exception as e:
+                        print(f"Error writing buffered edit of node {entry['node_id']}: {str(e)}")
+        return len(entries)
+
+
+edit_buffer = EditBuffer()
@@ -1,7 +1,7 @@
-from flask_mail import Mail, Message
-from flask import current_app, render_template_string
+from flask_mail import Mail
+from flask import current_app
 import os
-from ..models import Team
+from .mail_queue import mail_queue
 
 mail = Mail()
 
@@ -12,7 +12,7 @@ INVITE_TEMPLATE = """
 <body style="font-family: Arial, sans-serif; line-height: 1.6; max-width: 600px; margin: 0 auto; padding: 20px;">
     <h2>Team Invitation</h2>
     <p>Hello!</p>
-    <p>You've been invited to join a team as a {{ role }}.</p>
+    <p>You've been invited to join {{ team_name }} as a {{ role }}.</p>
     <p>Click the link below to accept the invitation:</p>
     <a href="{{ invite_url }}" style="display: inline-block; padding: 10px 20px; background-color: #007bff; color: white; text-decoration: none; border-radius: 5px;">
         Accept Invitation
@@ -24,58 +24,41 @@ INVITE_TEMPLATE = """
 """
 
 def configure_email(app):
-    """Configure email settings for the Flask app"""
-    try:
-        mail_username = os.getenv('MAIL_USERNAME')
-        mail_password = os.getenv('MAIL_APP_PASSWORD')
-        
-        if not mail_username or not mail_password:
-            print("Warning: Email credentials are not set in environment variables")
-            return
+    """Configure the SMTP server used by the background mail sender; no connection is made here"""
+    mail_username = os.getenv('MAIL_USERNAME')
+    mail_password = os.getenv('MAIL_APP_PASSWORD')
+    mail_server = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
 
-        app.config.update(
-            MAIL_SERVER='smtp.gmail.com',
-            MAIL_PORT=587,
-            MAIL_USE_TLS=True,
-            MAIL_USERNAME=mail_username,
-            MAIL_PASSWORD=mail_password,
-            MAIL_DEFAULT_SENDER=mail_username,
-            MAIL_USE_SSL=False,
-            MAIL_DEBUG=True  # This will help us see detailed SMTP interaction
-        )
-        mail.init_app(app)
-        
-        # Test the connection
-        with app.app_context():
-            try:
-                mail.connect()
-                print("Email configuration successful!")
-            except Exception as e:
-                print(f"Failed to connect to email server: {str(e)}")
-                
-    except Exception as e:
-        print(f"Error configuring email: {str(e)}")
+    if mail_server == 'smtp.gmail.com' and (not mail_username or not mail_password):
+        print("Warning: Email credentials are not set in environment variables")
 
+    app.config.update(
+        MAIL_SERVER=mail_server,
+        MAIL_PORT=int(os.getenv('MAIL_PORT', 587)),
+        MAIL_USE_TLS=os.getenv('MAIL_USE_TLS', 'true').lower() == 'true',
+        MAIL_USE_SSL=os.getenv('MAIL_USE_SSL', 'false').lower() == 'true',
+        MAIL_USERNAME=mail_username,
+        MAIL_PASSWORD=mail_password,
+        MAIL_DEFAULT_SENDER=mail_username or os.getenv('MAIL_DEFAULT_SENDER', 'noreply@localhost')
+    )
+    mail.init_app(app)
+    # Parsed and compiled once, instead of by render_template_string on every invitation
+    app.extensions['invite_template'] = app.jinja_env.from_string(INVITE_TEMPLATE)
 
-def send_team_invitation(email, team_id, role, invite_url):
-    """Send team invitation email"""
-    try:
-        msg = Message(
-            'Team Invitation',
-            sender=current_app.config['MAIL_DEFAULT_SENDER'],
-            recipients=[email]
-        )
-        
-        # Render HTML template
-        msg.html = render_template_string(
-            INVITE_TEMPLATE,
-            role=role,
-            invite_url=invite_url
-        )
-        
-        mail.send(msg)
-        return True
-    except Exception as e:
-        print(f"Error sending email: {str(e)}")
-        return False
 
+def render_team_invitation(team_name, role, invite_url):
+    template = current_app.extensions['invite_template']
+    return template.render(team_name=team_name, role=role, invite_url=invite_url)
+
+
+def queue_team_invitation(email, team_name, role, invite_url):
+    """Queue a team invitation email; it is sent after the caller commits"""
+    queue_team_invitations(team_name, [(email, role, invite_url)])
+
+
+def queue_team_invitations(team_name, invitations):
+    """Queue one email per (email, role, invite_url) invitation in a single batch"""
+    return mail_queue.enqueue_many([
+        (email, 'Team Invitation', render_team_invitation(team_name, role, invite_url))
+        for email, role, invite_url in invitations
+    ])
@@ -0,0 +1,213 @@
+from difflib import SequenceMatcher
+from datetime import datetime
+import hashlib
+import json
+from sqlalchemy import MetaData, Table, insert, inspect, select, text
+from sqlalchemy.orm import load_only
+from .. import db
+from ..models import ContentEdit
+from .pagination import keyset_page
+
+# Character-level matching is only attempted on small changed regions
+FINE_DIFF_LIMIT = 2000
+
+# Index migration 0001 put on content_edit that migration 0002 replaces
+LEGACY_INDEXES = ('ix_content_edit_node_created',)
+
+
+def compute_delta(old, new):
+    """Encode the change from old to new as a compact list of [start, end, replacement] ops"""
+    prefix = 0
+    limit = min(len(old), len(new))
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+
+    suffix = 0
+    limit -= prefix
+    while suffix < limit and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+
+    old_mid = old[prefix:len(old) - suffix]
+    new_mid = new[prefix:len(new) - suffix]
+    if not old_mid and not new_mid:
+        return []
+
+    if len(old_mid) > FINE_DIFF_LIMIT or len(new_mid) > FINE_DIFF_LIMIT:
+        return [[prefix, prefix + len(old_mid), new_mid]]
+
+    matcher = SequenceMatcher(None, old_mid, new_mid, autojunk=False)
+    return [
+        [prefix + i1, prefix + i2, new_mid[j1:j2]]
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != 'equal'
+    ]
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def apply_delta(old, delta):
+    """Rebuild the new text from old and a delta produced by compute_delta"""
+    pieces = []
+    position = 0
+    for start, end, replacement in delta:
+        pieces.append(old[position:start])
+        pieces.append(replacement)
+        position = end
+    pieces.append(old[position:])
+    return ''.join(pieces)
+
+
+class HistoryStore:
+    """Edit history kept as periodic full snapshots plus forward deltas.
+
+    Every edit row stores the delta from the previous version to its new
+    text. Every `snapshot_interval`-th row (and any row whose previous text
+    does not follow from the chain) also stores its full previous text, so
+    materializing a version applies at most `snapshot_interval` deltas.
+    Rows keep a hash of their new text to tell whether the next edit's
+    previous text follows from them, e.g. after the body changed without an
+    edit row.
+    """
+    def __init__(self, snapshot_interval=20):
+        self.snapshot_interval = snapshot_interval
+
+    def init_app(self, app):
+        self.snapshot_interval = app.config.get('HISTORY_SNAPSHOT_INTERVAL', self.snapshot_interval)
+
+    def record_edit(self, content_id, node_id, user_id, previous, new, created_at=None):
+        """Add an edit row for node_id to the session without committing"""
+        last = ContentEdit.query.filter_by(node_id=node_id)\
+            .options(load_only(ContentEdit.version, ContentEdit.new_hash))\
+            .order_by(ContentEdit.version.desc())\
+            .first()
+        version = last.version + 1 if last else 1
+
+        snapshot = version % self.snapshot_interval == 1 or not self._follows(node_id, last, previous)
+        edit = self._build_edit(version, previous, new, snapshot)
+        edit.content_id = content_id
+        edit.node_id = node_id
+        edit.user_id = user_id
+        edit.created_at = created_at or datetime.utcnow()
+        db.session.add(edit)
+        return edit
+
+    def _follows(self, node_id, last, previous):
+        """Whether previous is the new text of the node's last edit row"""
+        if last is None:
+            return True
+        if last.new_hash is not None:
+            return last.new_hash == text_hash(previous)
+        # Rows written before new_hash existed: materialize the tail once
+        materialized = self.get_version(node_id, last.version)
+        return materialized is not None and materialized['new_content'] == previous
+
+    def _build_edit(self, version, previous, new, snapshot):
+        return ContentEdit(version=version, **self._edit_values(previous, new, snapshot))
+
+    def _edit_values(self, previous, new, snapshot):
+        return {
+            'snapshot': previous if snapshot else None,
+            'delta': json.dumps(compute_delta(previous, new), separators=(',', ':')),
+            'has_changes': previous != new,
+            'size_delta': len(new) - len(previous),
+            'new_hash': text_hash(new)
+        }
+
+    def list_edits(self, node_id, limit, after=None):
+        """One page of a node's edits, newest first, without their snapshot and delta text"""
+        query = ContentEdit.query.filter_by(node_id=node_id).options(load_only(
+            ContentEdit.id, ContentEdit.user_id, ContentEdit.version,
+            ContentEdit.created_at, ContentEdit.has_changes, ContentEdit.size_delta
+        ))
+        return keyset_page(query, ContentEdit.created_at, ContentEdit.id, limit, after)
+
+    def get_version(self, node_id, version):
+        """Materialize the previous and new text of one version of a node"""
+        base = ContentEdit.query.filter(
+            ContentEdit.node_id == node_id,
+            ContentEdit.version <= version,
+            ContentEdit.snapshot.isnot(None)
+        ).order_by(ContentEdit.version.desc()).first()
+        if base is None:
+            return None
+
+        chain = ContentEdit.query.filter(
+            ContentEdit.node_id == node_id,
+            ContentEdit.version >= base.version,
+            ContentEdit.version <= version
+        ).order_by(ContentEdit.version).all()
+        if not chain or chain[-1].version != version:
+            return None
+
+        current = base.snapshot
+        previous = current
+        for edit in chain:
+            previous = current
+            current = apply_delta(current, json.loads(edit.delta))
+
+        edit = chain[-1]
+        return {
+            'id': edit.id,
+            'version': edit.version,
+            'user_id': edit.user_id,
+            'created_at': edit.created_at.isoformat(),
+            'previous_content': previous,
+            'new_content': current
+        }
+
+    def migrate_legacy_edits(self, connection):
+        """Convert a content_edit table with full previous/new text columns to deltas.
+
+        Runs on the connection of schema migration 0003; returns the number
+        of rows converted. Converted rows carry new_hash, so when a node's live
+        body differs from its last legacy text the next edit starts from a
+        snapshot of the live body.
+        """
+        inspector = inspect(connection)
+        tables = inspector.get_table_names()
+        if 'content_edit_legacy' not in tables:
+            columns = {column['name'] for column in inspector.get_columns('content_edit')}
+            if 'previous_content' not in columns:
+                return 0
+            connection.execute(text('ALTER TABLE content_edit RENAME TO content_edit_legacy'))
+            # Indexes follow the renamed table but their names must be free for the new one
+            for index in ContentEdit.__table__.indexes:
+                connection.execute(text(f'DROP INDEX IF EXISTS {index.name}'))
+            for name in LEGACY_INDEXES:
+                connection.execute(text(f'DROP INDEX IF EXISTS {name}'))
+            ContentEdit.__table__.create(connection)
+
+        legacy = Table('content_edit_legacy', MetaData(), autoload_with=connection)
+        legacy_rows = connection.execute(
+            select(legacy).order_by(legacy.c.node_id, legacy.c.created_at, legacy.c.id)
+        ).all()
+
+        edits = []
+        node_id, version, last_new = None, 0, None
+        for row in legacy_rows:
+            if row.node_id != node_id:
+                node_id, version, last_new = row.node_id, 0, None
+            version += 1
+
+            # A row whose previous text does not follow from the chain starts a new snapshot
+            snapshot = version % self.snapshot_interval == 1 or row.previous_content != last_new
+            edits.append(dict(
+                self._edit_values(row.previous_content, row.new_content, snapshot),
+                id=row.id,
+                content_id=row.content_id,
+                node_id=row.node_id,
+                user_id=row.user_id,
+                version=version,
+                created_at=row.created_at
+            ))
+            last_new = row.new_content
+
+        if edits:
+            connection.execute(insert(ContentEdit), edits)
+        connection.execute(text('DROP TABLE content_edit_legacy'))
+        return len(legacy_rows)
+
+
+history_store = HistoryStore()
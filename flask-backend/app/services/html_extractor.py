@@ -0,0 +1,565 @@
+from html.entities import html5
+from html.parser import HTMLParser
+import re
+
+HEADER_TAGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+UNWANTED_TAGS = frozenset(['script', 'style', 'iframe', 'nav', 'footer', 'header', 'noscript'])
+HIDDEN_STYLE = re.compile(r'display:\s*none')
+CONTENT_CLASS = re.compile(r'content|main|docs|documentation', re.I)
+
+# Tree-building rules of BeautifulSoup's html.parser builder, which the
+# extractor reproduces so its output matches the soup-based walk exactly
+VOID_TAGS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link',
+    'menuitem', 'meta', 'param', 'source', 'track', 'wbr', 'basefont', 'bgsound',
+    'command', 'frame', 'image', 'isindex', 'nextid', 'spacer'
+])
+STRING_CONTAINER_TAGS = frozenset(['rt', 'rp', 'style', 'script', 'template'])
+PRESERVE_WHITESPACE_TAGS = frozenset(['pre', 'textarea'])
+LIST_ATTRIBUTES = {
+    '*': ('class', 'accesskey', 'dropzone'),
+    'a': ('rel', 'rev'),
+    'link': ('rel', 'rev'),
+    'td': ('headers',),
+    'th': ('headers',),
+    'form': ('accept-charset',),
+    'object': ('archive',),
+    'area': ('rel',),
+    'icon': ('sizes',),
+    'iframe': ('sandbox',),
+    'output': ('for',),
+}
+ASCII_SPACES = frozenset('\x20\x0a\x09\x0c\x0d')
+NON_WHITESPACE = re.compile(r'\S+')
+CHARSET = re.compile(r'((^|;)\s*charset=)([^;]*)', re.M)
+
+ENTITIES = {}
+for _name, _character in sorted(html5.items()):
+    ENTITIES.setdefault(_name[:-1] if _name.endswith(';') else _name, _character)
+
+# String kinds, mirroring the soup's NavigableString subclasses
+TEXT, CONTAINED, COMMENT, CDATA, DECLARATION, DOCTYPE, PI = range(7)
+STRING_FORMATS = {
+    COMMENT: '<!--%s-->',
+    CDATA: '<![CDATA[%s]]>',
+    DECLARATION: '<?%s?>',
+    DOCTYPE: '<!DOCTYPE %s>\n',
+    PI: '<?%s>',
+}
+
+
+def escape_text(value):
+    return value.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def quote_attribute(value):
+    value = escape_text(value)
+    if '"' in value:
+        if "'" in value:
+            return '"%s"' % value.replace('"', '&quot;')
+        return "'%s'" % value
+    return '"%s"' % value
+
+
+class _Element:
+    __slots__ = ('name', 'attrs', 'removed', 'header', 'captures')
+
+    def __init__(self, name, attrs, removed):
+        self.name = name
+        self.attrs = attrs
+        self.removed = removed
+        self.header = None
+        self.captures = ()
+
+
+class _Header:
+    """Text of one heading, collected like Tag.get_text(strip=True)"""
+    __slots__ = ('name', 'parts')
+
+    def __init__(self, name):
+        self.name = name
+        self.parts = []
+
+    @property
+    def text(self):
+        return ''.join(self.parts)
+
+
+class _Capture:
+    """Serialized markup of one element subtree, like str(tag)"""
+    __slots__ = ('pieces', 'open_voids')
+
+    def __init__(self):
+        self.pieces = []
+        self.open_voids = {}
+
+
+class _Sections:
+    """Streaming equivalent of WebScraper._structure_content for one container.
+
+    `sections` maps each title to its last section, as the soup walk did;
+    `ordered` keeps every section in document order, so sections that share
+    a title keep their own bodies.
+    """
+    __slots__ = ('element', 'sections', 'ordered', 'current', 'buffer', 'child', 'child_header')
+
+    def __init__(self, element):
+        self.element = element
+        self.sections = {}
+        self.ordered = []
+        self.current = None
+        self.buffer = []
+        self.child = None
+        self.child_header = None
+
+    def child_started(self, element):
+        """Return a new capture when the child's markup belongs to a section"""
+        if element.name in HEADER_TAGS:
+            self.child_header = element.header
+        elif self.current:
+            self.child = _Capture()
+            return self.child
+        return None
+
+    def child_ended(self, element):
+        if element.name in HEADER_TAGS and element.header is self.child_header:
+            self._flush()
+            self.current = self.child_header.text
+            self.sections[self.current] = {'content': '', 'type': 'section'}
+            self.ordered.append({'title': self.current, 'content': ''})
+            self.child_header = None
+        elif self.child is not None and self.child in element.captures:
+            self.buffer.append(''.join(self.child.pieces))
+            self.child = None
+
+    def finish(self):
+        self._flush()
+        return self.sections
+
+    def _flush(self):
+        if self.current and self.buffer:
+            body = ''.join(self.buffer)
+            self.sections[self.current]['content'] = body
+            self.ordered[-1]['content'] = body
+            self.buffer = []
+
+
+class HTMLExtractor:
+    """Single-pass extraction of title, content sections, structure, meta and links.
+
+    Receives parser events (start, end, data, comment, ...) and produces the
+    same output as parsing with BeautifulSoup, stripping unwanted elements and
+    walking the tree, without building the tree.
+    """
+    def __init__(self):
+        self.stack = []
+        self.pending = []
+        self.container_depth = 0
+        self.preserve_depth = 0
+        self.open_counts = {}
+        self.headers = []
+        self.open_headers = []
+        self.title = None
+        self.first_h1 = None
+        self.meta = {}
+        self.links = []
+        self.candidates = {}
+
+    # Parser events
+
+    def start(self, name, attrs, auto_close=True):
+        self.flush()
+        parent = self.stack[-1] if self.stack else None
+        attrs = self._normalize_attrs(name, attrs)
+
+        if name == 'a' and 'href' in attrs:
+            self.links.append(attrs['href'])
+
+        removed = (
+            (parent is not None and parent.removed)
+            or name in UNWANTED_TAGS
+            or ('style' in attrs and HIDDEN_STYLE.search(attrs['style']) is not None)
+        )
+        element = _Element(name, attrs, removed)
+
+        if not removed:
+            self._element_started(element, parent)
+
+        self.stack.append(element)
+        self.open_counts[name] = self.open_counts.get(name, 0) + 1
+        if name in STRING_CONTAINER_TAGS:
+            self.container_depth += 1
+        if name in PRESERVE_WHITESPACE_TAGS:
+            self.preserve_depth += 1
+
+        if name in VOID_TAGS and auto_close:
+            self._pop()
+            return True
+        return False
+
+    def end(self, name):
+        self.flush()
+        if not self.open_counts.get(name):
+            return
+        while self.stack:
+            if self._pop().name == name:
+                break
+
+    def data(self, text):
+        self.pending.append(text)
+
+    def comment(self, text):
+        self.special(text, COMMENT)
+
+    def special(self, text, kind):
+        self.flush()
+        self.pending.append(text)
+        self.flush(kind)
+
+    def close(self):
+        self.flush()
+        while self.stack:
+            self._pop()
+        return self.result()
+
+    # Tree bookkeeping
+
+    def _normalize_attrs(self, name, attrs):
+        normalized = {}
+        for key, value in attrs:
+            normalized[key] = '' if value is None else value
+        list_attrs = LIST_ATTRIBUTES['*'] + LIST_ATTRIBUTES.get(name, ())
+        for key in list_attrs:
+            if key in normalized:
+                normalized[key] = ' '.join(NON_WHITESPACE.findall(normalized[key]))
+        return normalized
+
+    def _element_started(self, element, parent):
+        name = element.name
+        if name in HEADER_TAGS:
+            element.header = _Header(name)
+            self.headers.append(element.header)
+            self.open_headers.append(element.header)
+            if name == 'h1' and self.first_h1 is None:
+                self.first_h1 = element.header
+        elif name == 'title' and self.title is None:
+            element.header = self.title = _Header(name)
+            self.open_headers.append(element.header)
+        elif name == 'meta':
+            self._collect_meta(element.attrs)
+
+        # Markup is only serialized for the direct children of a content container
+        captures = parent.captures if parent is not None else ()
+        for sections in self.candidates.values():
+            if sections.element is parent:
+                capture = sections.child_started(element)
+                if capture is not None:
+                    captures += (capture,)
+
+        for capture in captures:
+            capture.pieces.append(self._start_tag(element, capture))
+        element.captures = captures
+
+        self._collect_candidate(element)
+
+    def _collect_candidate(self, element):
+        if element.name == 'main':
+            kind = 'main'
+        elif element.name == 'article':
+            kind = 'article'
+        elif element.name == 'div' and self._has_content_class(element.attrs):
+            kind = 'div'
+        else:
+            return
+
+        # Only the first candidate of the highest priority kind is ever used
+        if kind in self.candidates or 'main' in self.candidates:
+            return
+        if kind == 'div' and 'article' in self.candidates:
+            return
+        if kind == 'main':
+            self.candidates.pop('article', None)
+        if kind != 'div':
+            self.candidates.pop('div', None)
+        self.candidates[kind] = _Sections(element)
+
+    def _has_content_class(self, attrs):
+        return 'class' in attrs and CONTENT_CLASS.search(attrs['class']) is not None
+
+    def _collect_meta(self, attrs):
+        name = attrs.get('name')
+        if name == 'description' and 'description' not in self.meta:
+            self.meta['description'] = attrs.get('content', '')
+        elif name == 'keywords' and 'keywords' not in self.meta:
+            self.meta['keywords'] = [k.strip() for k in attrs.get('content', '').split(',')]
+        elif name == 'author' and 'author' not in self.meta:
+            self.meta['author'] = attrs.get('content', '')
+
+    def _pop(self):
+        element = self.stack.pop()
+        self.open_counts[element.name] -= 1
+        if element.name in STRING_CONTAINER_TAGS:
+            self.container_depth -= 1
+        if element.name in PRESERVE_WHITESPACE_TAGS:
+            self.preserve_depth -= 1
+
+        if not element.removed:
+            for capture in element.captures:
+                self._end_tag(element, capture)
+            if element.header is not None:
+                self.open_headers.remove(element.header)
+            parent = self.stack[-1] if self.stack else None
+            for sections in self.candidates.values():
+                if sections.element is parent:
+                    sections.child_ended(element)
+        return element
+
+    def _start_tag(self, element, capture):
+        attrs = self._output_attrs(element)
+        if attrs:
+            attrs = ' ' + ' '.join(
+                '%s=%s' % (key, quote_attribute(value)) for key, value in sorted(attrs.items())
+            )
+        else:
+            attrs = ''
+        if element.name in VOID_TAGS:
+            # Decided on close: a void element that gained children is written in full
+            capture.open_voids[id(element)] = (len(capture.pieces), attrs)
+            return '<%s%s/>' % (element.name, attrs)
+        return '<%s%s>' % (element.name, attrs)
+
+    def _end_tag(self, element, capture):
+        if element.name in VOID_TAGS:
+            index, attrs = capture.open_voids.pop(id(element))
+            if index == len(capture.pieces) - 1:
+                return
+            capture.pieces[index] = '<%s%s>' % (element.name, attrs)
+        capture.pieces.append('</%s>' % element.name)
+
+    def _output_attrs(self, element):
+        attrs = element.attrs
+        if element.name != 'meta':
+            return attrs
+        # Charset declarations are rewritten to the output encoding
+        attrs = dict(attrs)
+        if 'charset' in attrs:
+            attrs['charset'] = 'utf-8'
+        elif 'content' in attrs and attrs.get('http-equiv', '').lower() == 'content-type':
+            if CHARSET.search(attrs['content']):
+                attrs['content'] = CHARSET.sub(lambda m: m.group(1) + 'utf-8', attrs['content'])
+        return attrs
+
+    def flush(self, kind=TEXT):
+        if not self.pending:
+            return
+        text = ''.join(self.pending)
+        self.pending = []
+
+        if not self.preserve_depth and all(c in ASCII_SPACES for c in text):
+            text = '\n' if '\n' in text else ' '
+
+        if kind == TEXT and self.container_depth:
+            kind = CONTAINED
+
+        parent = self.stack[-1] if self.stack else None
+        if parent is not None and parent.removed:
+            return
+
+        if kind in (TEXT, CDATA) and self.open_headers:
+            stripped = text.strip()
+            if stripped:
+                for header in self.open_headers:
+                    header.parts.append(stripped)
+
+        if parent is not None and parent.captures:
+            if kind in (TEXT, CONTAINED):
+                piece = escape_text(text)
+            else:
+                piece = STRING_FORMATS[kind] % text
+            for capture in parent.captures:
+                capture.pieces.append(piece)
+
+    # Output
+
+    def result(self):
+        if self.first_h1 is not None:
+            title = self.first_h1.text
+        elif self.title is not None:
+            title = self.title.text
+        else:
+            title = "Untitled Document"
+
+        content = {}
+        sections = []
+        for kind in ('main', 'article', 'div'):
+            if kind in self.candidates:
+                content = self.candidates[kind].finish()
+                sections = self.candidates[kind].ordered
+                break
+
+        meta = {key: self.meta[key] for key in ('description', 'keywords', 'author') if key in self.meta}
+
+        return {
+            'title': title,
+            'content': content,
+            'sections': sections,
+            'structure': self._structure(),
+            'meta': meta,
+            'links': self.links
+        }
+
+    def _structure(self):
+        structure = []
+        current_path = [None] * 6
+
+        for header in self.headers:
+            level = int(header.name[1]) - 1
+            node = {
+                'title': header.text,
+                'level': level,
+                'children': []
+            }
+
+            if level == 0:
+                structure.append(node)
+            else:
+                parent_level = level - 1
+                while parent_level >= 0:
+                    if current_path[parent_level]:
+                        current_path[parent_level]['children'].append(node)
+                        break
+                    parent_level -= 1
+                if parent_level < 0:
+                    structure.append(node)
+
+            current_path[level] = node
+            for i in range(level + 1, 6):
+                current_path[i] = None
+
+        return structure
+
+
+class _StdlibParser(HTMLParser):
+    """Feeds html.parser tokens into an extractor, the way BeautifulSoup does"""
+    def __init__(self, target):
+        super().__init__(convert_charrefs=False)
+        self.target = target
+        self.already_closed_void = []
+
+    def handle_starttag(self, name, attrs):
+        if self.target.start(name, attrs):
+            self.already_closed_void.append(name)
+
+    def handle_startendtag(self, name, attrs):
+        self.target.start(name, attrs, auto_close=False)
+        self.handle_endtag(name)
+
+    def handle_endtag(self, name):
+        if name in self.already_closed_void:
+            self.already_closed_void.remove(name)
+        else:
+            self.target.end(name)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+    def handle_charref(self, name):
+        if name.startswith(('x', 'X')):
+            codepoint = int(name.lstrip('xX'), 16)
+        else:
+            codepoint = int(name)
+
+        data = None
+        if codepoint < 256:
+            try:
+                data = bytearray([codepoint]).decode('windows-1252')
+            except UnicodeDecodeError:
+                pass
+        if not data:
+            try:
+                data = chr(codepoint)
+            except (ValueError, OverflowError):
+                pass
+        self.target.data(data or "\N{REPLACEMENT CHARACTER}")
+
+    def handle_entityref(self, name):
+        self.target.data(ENTITIES.get(name, '&%s' % name))
+
+    def handle_comment(self, data):
+        self.target.comment(data)
+
+    def handle_decl(self, data):
+        self.target.special(data[len('DOCTYPE '):], DOCTYPE)
+
+    def unknown_decl(self, data):
+        if data.upper().startswith('CDATA['):
+            self.target.special(data[len('CDATA['):], CDATA)
+        else:
+            self.target.special(data, DECLARATION)
+
+    def handle_pi(self, data):
+        self.target.special(data, PI)
+
+
+class _LxmlTarget:
+    """Adapts lxml's parser-target callbacks to an extractor"""
+    def __init__(self, target):
+        self.target = target
+        self.closed_voids = []
+
+    def start(self, name, attrib):
+        if self.target.start(name, list(attrib.items())):
+            self.closed_voids.append(name)
+
+    def end(self, name):
+        if name in self.closed_voids:
+            self.closed_voids.remove(name)
+        else:
+            self.target.end(name)
+
+    def data(self, data):
+        self.target.data(data)
+
+    def comment(self, text):
+        self.target.comment(text)
+
+    def pi(self, target, data=None):
+        self.target.special(f"{target} {data}" if data else target, PI)
+
+    def close(self):
+        return self.target.close()
+
+
+def _lxml_available():
+    try:
+        import lxml.etree  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def select_parser(preferred='auto'):
+    """Pick the fastest available tokenizer ('lxml' or 'html.parser')"""
+    if preferred == 'html.parser':
+        return 'html.parser'
+    if _lxml_available():
+        return 'lxml'
+    if preferred == 'lxml':
+        print("Warning: lxml is not installed, falling back to html.parser")
+    return 'html.parser'
+
+
+def extract(html, parser='html.parser'):
+    """Extract title, content, structure, meta and links from an HTML document"""
+    extractor = HTMLExtractor()
+
+    if parser == 'lxml':
+        from lxml import etree
+        lxml_parser = etree.HTMLParser(target=_LxmlTarget(extractor))
+        lxml_parser.feed(html)
+        return lxml_parser.close()
+
+    tokenizer = _StdlibParser(extractor)
+    tokenizer.feed(html)
+    tokenizer.close()
+    return extractor.close()
@@ -0,0 +1,162 @@
+from datetime import datetime, timedelta
+import uuid
+from flask_mail import Message
+from sqlalchemy import insert, update
+from .. import db
+from ..models import OutboundEmail
+
+
+class MailQueue:
+    """Outbound mail persisted in the database and delivered by a background sender.
+
+    enqueue() only adds a row to the caller's session, so a message is queued
+    in the same transaction as whatever it announces and requests never wait
+    on SMTP. The sender claims due rows in batches, delivers each batch over
+    a single SMTP connection and retries failures with exponential backoff
+    until `max_attempts`. Undelivered mail survives restarts; a claim that
+    was never completed (e.g. the process died) expires after `lease`
+    seconds and the mail is picked up again.
+    """
+    def __init__(self, batch_size=50, poll_interval=1.0, max_attempts=6, backoff=30.0,
+                 max_backoff=3600.0, lease=300.0):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lease = lease
+        self.app = None
+        self.socketio = None
+        self._started = False
+        self._checked_backlog = False
+
+    def init_app(self, app, socketio):
+        self.app = app
+        self.socketio = socketio
+        self.batch_size = app.config.get('MAIL_QUEUE_BATCH_SIZE', self.batch_size)
+        self.poll_interval = app.config.get('MAIL_QUEUE_POLL_INTERVAL', self.poll_interval)
+        self.max_attempts = app.config.get('MAIL_MAX_ATTEMPTS', self.max_attempts)
+        self.backoff = app.config.get('MAIL_RETRY_BACKOFF', self.backoff)
+        self._checked_backlog = False
+        app.before_request(self._resume_backlog)
+
+    def _resume_backlog(self):
+        """On the first request, start sending mail left undelivered by an earlier run"""
+        if self._checked_backlog:
+            return
+        self._checked_backlog = True
+        if not self._started and db.session.query(OutboundEmail.id).filter_by(status='pending').first():
+            self.start()
+
+    def start(self):
+        """Spawn the background sender once per process"""
+        if self._started:
+            return
+        self._started = True
+        self.socketio.start_background_task(self._sender_loop)
+
+    def enqueue(self, recipient, subject, html):
+        """Queue a message in the current session; it is sent once the caller commits"""
+        return self.enqueue_many([(recipient, subject, html)])
+
+    def enqueue_many(self, messages):
+        """Queue (recipient, subject, html) messages in the current session with one INSERT"""
+        if not messages:
+            return 0
+        now = datetime.utcnow()
+        db.session.execute(insert(OutboundEmail), [
+            {'id': str(uuid.uuid4()), 'recipient': recipient, 'subject': subject, 'html': html,
+             'next_attempt_at': now, 'created_at': now}
+            for recipient, subject, html in messages
+        ])
+        self.start()
+        return len(messages)
+
+    def deliver_pending(self):
+        """Deliver every due message now; returns the number sent"""
+        sent = 0
+        while True:
+            batch_sent, claimed = self._deliver_batch()
+            sent += batch_sent
+            if claimed < self.batch_size:
+                return sent
+
+    def _deliver_batch(self):
+        from .email_service import mail
+
+        with self.app.app_context():
+            rows = self._claim()
+            if not rows:
+                return 0, 0
+
+            sent = 0
+            try:
+                with mail.connect() as connection:
+                    for row in rows:
+                        try:
+                            connection.send(Message(
+                                row.subject,
+                                sender=self.app.config.get('MAIL_DEFAULT_SENDER'),
+                                recipients=[row.recipient],
+                                html=row.html
+                            ))
+                        except Exception as e:
+                            self._retry_later(row, e)
+                            continue
+                        row.status = 'sent'
+                        row.sent_at = datetime.utcnow()
+                        row.claim = None
+                        sent += 1
+            except Exception as e:
+                # The connection failed; everything not sent yet waits for the next attempt
+                for row in rows:
+                    if row.status == 'pending' and row.claim is not None:
+                        self._retry_later(row, e)
+
+            db.session.commit()
+            return sent, len(rows)
+
+    def _claim(self):
+        """Take up to batch_size due messages for this sender by leasing them"""
+        now = datetime.utcnow()
+        due = db.session.query(OutboundEmail.id)\
+            .filter(OutboundEmail.status == 'pending', OutboundEmail.next_attempt_at <= now)\
+            .order_by(OutboundEmail.next_attempt_at)\
+            .limit(self.batch_size)\
+            .all()
+        if not due:
+            return []
+
+        token = str(uuid.uuid4())
+        db.session.execute(
+            update(OutboundEmail)
+            .where(OutboundEmail.id.in_([row.id for row in due]),
+                   OutboundEmail.status == 'pending',
+                   OutboundEmail.next_attempt_at <= now)
+            .values(claim=token, next_attempt_at=now + timedelta(seconds=self.lease))
+        )
+        db.session.commit()
+        return OutboundEmail.query.filter_by(claim=token).all()
+
+    def _retry_later(self, row, error):
+        row.attempts += 1
+        row.last_error = str(error)
+        row.claim = None
+        if row.attempts >= self.max_attempts:
+            row.status = 'failed'
+            print(f"Error sending email to {row.recipient}, giving up: {str(error)}")
+            return
+        delay = min(self.backoff * 2 ** (row.attempts - 1), self.max_backoff)
+        row.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+        print(f"Error sending email to {row.recipient}, retrying in {delay:.0f}s: {str(error)}")
+
+    def _sender_loop(self):
+        while True:
+            self.socketio.sleep(self.poll_interval)
+            try:
+                self.deliver_pending()
+            except Exception as e:
+                print(f"Error delivering queued email: {str(e)}")
+
+
+mail_queue = MailQueue()
@@ -0,0 +1,48 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import literal, tuple_
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def encode_cursor(timestamp, row_id):
+    """Opaque cursor pointing just past the (timestamp, id) of the last row of a page"""
+    raw = json.dumps([timestamp.isoformat(), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the (timestamp, id) a cursor points past; raises ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), str(row_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def parse_page_args(args, default_limit=DEFAULT_LIMIT):
+    """Read limit and cursor request arguments; raises ValueError on a bad cursor"""
+    limit = min(max(args.get('limit', default_limit, type=int), 1), MAX_LIMIT)
+    cursor = args.get('cursor')
+    return limit, decode_cursor(cursor) if cursor else None
+
+
+def keyset_page(query, time_column, id_column, limit, after=None):
+    """Fetch one page ordered newest first by (time_column, id_column).
+
+    Returns the rows and the cursor of the next page, or None on the last page.
+    """
+    if after is not None:
+        timestamp, row_id = after
+        query = query.filter(tuple_(time_column, id_column) < tuple_(
+            literal(timestamp, time_column.type), literal(row_id, id_column.type)
+        ))
+    rows = query.order_by(time_column.desc(), id_column.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, time_column.key), getattr(last, id_column.key))
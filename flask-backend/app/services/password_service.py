@@ -0,0 +1,80 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import threading
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHasher:
+    """Runs werkzeug password hashing off the request's event loop.
+
+    Hashing is CPU-bound and deliberately slow; run inline under eventlet it
+    stalls every socket of the process. With pool='thread' it runs on native
+    threads (eventlet's tpool under eventlet, sized by EVENTLET_THREADPOOL_SIZE,
+    otherwise `workers` threads; hashlib releases the GIL), with
+    pool='process' on `workers` processes, and with pool='inline' on the
+    caller as before. Callers simply block on hash_password/check_password
+    while the hub keeps serving other greenlets. method and salt_length are
+    werkzeug's; needs_rehash reports hashes made with other parameters so
+    login can upgrade them.
+    """
+    def __init__(self, method='pbkdf2', salt_length=16, pool='thread', workers=2):
+        self.method = method
+        self.salt_length = salt_length
+        self.pool = pool
+        self.workers = workers
+        self.socketio = None
+        self._executor = None
+        self._canonical_method = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app, socketio):
+        self.socketio = socketio
+        self.method = app.config.get('PASSWORD_HASH_METHOD', self.method)
+        self.salt_length = app.config.get('PASSWORD_HASH_SALT_LENGTH', self.salt_length)
+        self.pool = app.config.get('PASSWORD_HASH_POOL', self.pool)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', self.workers)
+        self._canonical_method = None
+
+    def hash_password(self, password):
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def check_password(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Whether a stored hash was made with other parameters than the configured ones"""
+        method, _, rest = password_hash.partition('$')
+        salt = rest.partition('$')[0]
+        return method != self.canonical_method() or len(salt) != self.salt_length
+
+    def canonical_method(self):
+        """The configured method with werkzeug's defaults filled in, e.g. pbkdf2:sha256:600000"""
+        if self._canonical_method is None:
+            # werkzeug only reveals its defaults in a hash it made
+            self._canonical_method = self.hash_password('').partition('$')[0]
+        return self._canonical_method
+
+    def _run(self, fn, *args):
+        if self.pool == 'inline':
+            return fn(*args)
+
+        eventlet = self.socketio is not None and self.socketio.async_mode == 'eventlet'
+        if self.pool == 'thread' and eventlet:
+            from eventlet import tpool
+            return tpool.execute(fn, *args)
+
+        future = self._get_executor().submit(fn, *args)
+        if eventlet:
+            # Yield to the hub until the worker process answers
+            while not future.done():
+                self.socketio.sleep(0.005)
+        return future.result()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                executor_class = ProcessPoolExecutor if self.pool == 'process' else ThreadPoolExecutor
+                self._executor = executor_class(max_workers=self.workers)
+            return self._executor
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,160 @@
+from collections import OrderedDict
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from .. import db
+from ..models import Content, ContentNode, TeamMember
+
+# Cached role of users who are not members of a team
+NO_ROLE = ''
+
+
+class PermissionCache:
+    """Caches (user_id, team_id) -> role lookups used by every team-scoped route.
+
+    Roles live in an in-process LRU with a short TTL, optionally backed by a
+    Redis tier shared between processes. Inserting, updating or deleting a
+    TeamMember invalidates its entry once the transaction commits.
+    """
+    def __init__(self, max_entries=4096, ttl=30, redis_ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.redis_ttl = redis_ttl
+        self.redis = None
+        # Exceptions of the Redis tier; redis is only imported when that tier is configured
+        self._redis_errors = ()
+        self._entries = OrderedDict()
+        self._nodes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_entries = app.config.get('PERMISSION_CACHE_SIZE', self.max_entries)
+        self.ttl = app.config.get('PERMISSION_CACHE_TTL', self.ttl)
+        if app.config.get('PERMISSION_CACHE_BACKEND') == 'redis':
+            from redis.exceptions import RedisError
+            from .. import get_redis
+            self.redis = get_redis(app.config['REDIS_URL'])
+            self._redis_errors = (RedisError,)
+
+    def get_role(self, user_id, team_id):
+        """Return the user's role in the team, or None when they are not a member"""
+        key = (user_id, team_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1] or None
+
+        role = self._get_shared(key)
+        if role is None:
+            member_role = db.session.query(TeamMember.role)\
+                .filter_by(team_id=team_id, user_id=user_id)\
+                .scalar()
+            role = member_role or NO_ROLE
+            self._set_shared(key, role)
+
+        self._store(self._entries, key, (now + self.ttl, role))
+        return role or None
+
+    def invalidate(self, user_id, team_id):
+        key = (user_id, team_id)
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.redis is not None:
+            try:
+                self.redis.delete(self._redis_key(key))
+            except self._redis_errors as e:
+                print(f"Warning: failed to invalidate cached permission ({str(e)})")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nodes.clear()
+
+    def resolve_node(self, node_id):
+        """Return (content_id, team_id) of a node with one query, or None if it does not exist.
+
+        A node never moves between contents or teams, so resolved nodes are
+        cached without a TTL.
+        """
+        with self._lock:
+            owner = self._nodes.get(node_id)
+            if owner is not None:
+                self._nodes.move_to_end(node_id)
+                return owner
+
+        row = db.session.query(ContentNode.content_id, Content.team_id)\
+            .join(Content, Content.id == ContentNode.content_id)\
+            .filter(ContentNode.id == node_id)\
+            .first()
+        if row is None:
+            return None
+
+        owner = (row.content_id, row.team_id)
+        self._store(self._nodes, node_id, owner)
+        return owner
+
+    def _store(self, entries, key, value):
+        with self._lock:
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def _redis_key(self, key):
+        user_id, team_id = key
+        return f"perm:{team_id}:{user_id}"
+
+    def _get_shared(self, key):
+        if self.redis is None:
+            return None
+        try:
+            role = self.redis.get(self._redis_key(key))
+        except self._redis_errors as e:
+            print(f"Warning: permission cache unavailable ({str(e)})")
+            return None
+        if role is None:
+            return None
+        return role.decode() if isinstance(role, bytes) else role
+
+    def _set_shared(self, key, role):
+        if self.redis is None:
+            return
+        try:
+            self.redis.set(self._redis_key(key), role, ex=self.redis_ttl)
+        except self._redis_errors as e:
+            print(f"Warning: permission cache unavailable ({str(e)})")
+
+
+permission_cache = PermissionCache()
+
+
+def _queue_invalidation(mapper, connection, member, removed=False):
+    """Remember a changed membership, and whether it was removed, until its transaction commits"""
+    session = object_session(member)
+    session.info.setdefault('permission_changes', {})[(member.user_id, member.team_id)] = removed
+
+
+def _queue_removal(mapper, connection, member):
+    _queue_invalidation(mapper, connection, member, removed=True)
+
+
+for _event in ('after_insert', 'after_update'):
+    event.listen(TeamMember, _event, _queue_invalidation)
+event.listen(TeamMember, 'after_delete', _queue_removal)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_invalidations(session):
+    from .socket_auth import socket_sessions
+
+    for (user_id, team_id), removed in session.info.pop('permission_changes', {}).items():
+        permission_cache.invalidate(user_id, team_id)
+        socket_sessions.forget_team(user_id, team_id, removed=removed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_invalidations(session):
+    session.info.pop('permission_changes', None)
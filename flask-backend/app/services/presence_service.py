@@ -0,0 +1,155 @@
+import threading
+import time
+from datetime import datetime
+
+
+class PresenceService:
+    """Latest cursor and typing state per user per room, broadcast in aggregated frames.
+
+    cursor_move and typing events only overwrite the sender's state; a
+    background ticker emits one `presence_update` frame per changed room
+    `tick_rate` times a second, carrying the users whose state changed since
+    the previous frame and those who left. Superseded updates between ticks
+    are never sent, so a room receives O(users x ticks) messages instead of
+    O(users^2 x events). Typing flags clear after `typing_timeout` seconds
+    and users silent for `idle_timeout` seconds are dropped.
+
+    A user may be in a room from several connections (tabs); their presence
+    is dropped only when the last of those sids leaves or disconnects.
+    """
+    def __init__(self, tick_rate=20.0, idle_timeout=30.0, typing_timeout=3.0):
+        self.tick_rate = tick_rate
+        self.idle_timeout = idle_timeout
+        self.typing_timeout = typing_timeout
+        self.socketio = None
+        # room -> user_id -> state
+        self._rooms = {}
+        # room -> user_id -> sids connected to the room
+        self._sids = {}
+        # room -> (changed user ids, departed user ids) awaiting the next frame
+        self._changes = {}
+        self._lock = threading.Lock()
+        self._started = False
+
+    def init_app(self, app, socketio):
+        self.socketio = socketio
+        self.tick_rate = app.config.get('PRESENCE_TICK_RATE', self.tick_rate)
+        self.idle_timeout = app.config.get('PRESENCE_IDLE_TIMEOUT', self.idle_timeout)
+        self.typing_timeout = app.config.get('PRESENCE_TYPING_TIMEOUT', self.typing_timeout)
+
+    def start(self):
+        """Spawn the background ticker once per process"""
+        if self._started:
+            return
+        self._started = True
+        self.socketio.start_background_task(self._tick_loop)
+
+    def join(self, room, user_id, sid):
+        """Record that one of the user's connections joined a room"""
+        with self._lock:
+            self._sids.setdefault(room, {}).setdefault(user_id, set()).add(sid)
+
+    def update_cursor(self, room, user_id, sid, position):
+        self._update(room, user_id, sid, position=position)
+
+    def update_typing(self, room, user_id, sid, node_id):
+        self._update(room, user_id, sid, typing=node_id, typing_until=time.monotonic() + self.typing_timeout)
+
+    def _update(self, room, user_id, sid, **fields):
+        now = time.monotonic()
+        with self._lock:
+            self._sids.setdefault(room, {}).setdefault(user_id, set()).add(sid)
+            users = self._rooms.setdefault(room, {})
+            state = users.setdefault(user_id, {'position': None, 'typing': None, 'typing_until': 0})
+            state.update(fields)
+            state['seen_at'] = now
+            changed, departed = self._changes.setdefault(room, (set(), set()))
+            changed.add(user_id)
+            departed.discard(user_id)
+        self.start()
+
+    def leave(self, room, user_id, sid):
+        """A connection left a room; the user's presence goes with their last sid there"""
+        with self._lock:
+            self._leave(room, user_id, sid)
+
+    def disconnect(self, user_id, sid):
+        """A connection dropped; leave every room it was in"""
+        with self._lock:
+            for room in [room for room, users in self._sids.items() if sid in users.get(user_id, ())]:
+                self._leave(room, user_id, sid)
+
+    def _leave(self, room, user_id, sid):
+        users = self._sids.get(room, {})
+        sids = users.get(user_id)
+        if sids is not None:
+            sids.discard(sid)
+            if sids:
+                return
+            del users[user_id]
+            if not users:
+                del self._sids[room]
+        self._remove(room, user_id)
+
+    def _remove(self, room, user_id):
+        users = self._rooms.get(room)
+        if not users or users.pop(user_id, None) is None:
+            return
+        if not users:
+            del self._rooms[room]
+        changed, departed = self._changes.setdefault(room, (set(), set()))
+        changed.discard(user_id)
+        departed.add(user_id)
+
+    def snapshot(self, room):
+        """Current presence of every user in a room, e.g. for a client that just joined"""
+        with self._lock:
+            return [self._public_state(user_id, state) for user_id, state in self._rooms.get(room, {}).items()]
+
+    def collect(self):
+        """Expire stale state and return the pending frames as {room: frame}"""
+        now = time.monotonic()
+        with self._lock:
+            for room, users in list(self._rooms.items()):
+                for user_id, state in list(users.items()):
+                    if now - state['seen_at'] >= self.idle_timeout:
+                        self._remove(room, user_id)
+                    elif state['typing'] is not None and now >= state['typing_until']:
+                        state['typing'] = None
+                        self._changes.setdefault(room, (set(), set()))[0].add(user_id)
+
+            changes, self._changes = self._changes, {}
+            frames = {}
+            for room, (changed, departed) in changes.items():
+                users = self._rooms.get(room, {})
+                frames[room] = {
+                    'users': [self._public_state(user_id, users[user_id]) for user_id in changed if user_id in users],
+                    'left': list(departed)
+                }
+        return frames
+
+    def tick(self):
+        """Emit one presence_update frame to every room whose presence changed"""
+        frames = self.collect()
+        if not frames:
+            return 0
+        timestamp = datetime.utcnow().isoformat()
+        for room, frame in frames.items():
+            frame['timestamp'] = timestamp
+            self.socketio.emit('presence_update', frame, room=room)
+        return len(frames)
+
+    @staticmethod
+    def _public_state(user_id, state):
+        return {'user_id': user_id, 'position': state['position'], 'typing': state['typing']}
+
+    def _tick_loop(self):
+        while True:
+            self.socketio.sleep(1.0 / self.tick_rate)
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Error broadcasting presence: {str(e)}")
+
+
+presence = PresenceService()
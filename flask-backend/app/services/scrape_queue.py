@@ -0,0 +1,219 @@
+from collections import deque
+from datetime import datetime
+import json
+import threading
+import uuid
+
+
+class MemoryBroker:
+    """In-process job broker, used for tests and single-process deployments"""
+    def __init__(self):
+        self._pending = deque()
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def push(self, job):
+        with self._lock:
+            self._jobs[job['id']] = dict(job)
+            self._pending.append(job['id'])
+
+    def pop(self):
+        """Return the next queued job id, or None when the queue is empty"""
+        with self._lock:
+            return self._pending.popleft() if self._pending else None
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+
+class RedisBroker:
+    """Redis-backed job broker shared by every worker process"""
+    def __init__(self, client, prefix='scrape', ttl=86400):
+        self.client = client
+        self.queue_key = f"{prefix}:queue"
+        self.job_prefix = f"{prefix}:job:"
+        self.ttl = ttl
+
+    def push(self, job):
+        pipe = self.client.pipeline()
+        pipe.set(self.job_prefix + job['id'], json.dumps(job), ex=self.ttl)
+        pipe.rpush(self.queue_key, job['id'])
+        pipe.execute()
+
+    def pop(self):
+        job_id = self.client.lpop(self.queue_key)
+        if job_id is None:
+            return None
+        return job_id.decode() if isinstance(job_id, bytes) else job_id
+
+    def get(self, job_id):
+        raw = self.client.get(self.job_prefix + job_id)
+        return json.loads(raw) if raw else None
+
+    def update(self, job_id, **fields):
+        job = self.get(job_id)
+        if job is None:
+            return
+        job.update(fields)
+        self.client.set(self.job_prefix + job_id, json.dumps(job), ex=self.ttl)
+
+
+class ScrapeJobQueue:
+    """Runs scrape jobs (fetch, parse, persist) on a background worker pool"""
+    def __init__(self, broker=None, workers=2, poll_interval=0.5):
+        self.broker = broker
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.app = None
+        self.socketio = None
+        self.content_manager = None
+        self._started = False
+
+    def init_app(self, app, socketio):
+        from .content_service import ContentManager, WebScraper
+
+        self.app = app
+        self.socketio = socketio
+        self.content_manager = ContentManager(WebScraper(
+            max_workers=app.config.get('SCRAPE_CONCURRENCY', 8),
+            per_host_limit=app.config.get('SCRAPE_PER_HOST_LIMIT', 4),
+            parser=app.config.get('SCRAPER_PARSER', 'auto')
+        ))
+        self.workers = app.config.get('SCRAPE_WORKERS', self.workers)
+
+        if self.broker is None:
+            if app.config.get('SCRAPE_QUEUE_BACKEND') == 'redis':
+                from .. import get_redis
+                self.broker = RedisBroker(get_redis(app.config['REDIS_URL']))
+            else:
+                self.broker = MemoryBroker()
+
+    def start(self):
+        """Spawn the worker pool once per process"""
+        if self._started:
+            return
+        self._started = True
+        for _ in range(self.workers):
+            self.socketio.start_background_task(self._worker_loop)
+
+    def enqueue(self, team_id, url, user_id):
+        """Queue a scrape job and return its initial state"""
+        return self._push({
+            'type': 'scrape',
+            'team_id': team_id,
+            'url': url,
+            'user_id': user_id,
+            'content_id': None
+        })
+
+    def enqueue_crawl(self, team_id, user_id, urls=None, seed_url=None,
+                      max_depth=0, same_host=True, max_pages=100):
+        """Queue a bulk/crawl job and return its initial state"""
+        return self._push({
+            'type': 'crawl',
+            'team_id': team_id,
+            'url': seed_url,
+            'user_id': user_id,
+            'options': {
+                'urls': urls,
+                'seed_url': seed_url,
+                'max_depth': max_depth,
+                'same_host': same_host,
+                'max_pages': max_pages
+            },
+            'result': None
+        })
+
+    def enqueue_refresh(self, content_id, team_id, url, user_id):
+        """Queue a conditional re-scrape of existing content"""
+        return self._push({
+            'type': 'refresh',
+            'team_id': team_id,
+            'url': url,
+            'user_id': user_id,
+            'content_id': content_id,
+            'result': None
+        })
+
+    def _push(self, job):
+        job.update({
+            'id': str(uuid.uuid4()),
+            'status': 'queued',
+            'error': None,
+            'created_at': datetime.utcnow().isoformat(),
+            'finished_at': None
+        })
+        self.broker.push(job)
+        self.start()
+        return job
+
+    def get_job(self, job_id):
+        return self.broker.get(job_id)
+
+    def run_pending(self):
+        """Process every queued job inline (useful without a worker pool)"""
+        while (job_id := self.broker.pop()) is not None:
+            self._run_job(job_id)
+
+    def _worker_loop(self):
+        while True:
+            job_id = self.broker.pop()
+            if job_id is None:
+                self.socketio.sleep(self.poll_interval)
+                continue
+            self._run_job(job_id)
+
+    def _run_job(self, job_id):
+        job = self.broker.get(job_id)
+        if not job:
+            return
+
+        self.broker.update(job_id, status='running')
+        with self.app.app_context():
+            try:
+                if job.get('type') == 'crawl':
+                    result = self.content_manager.crawl_content(job['team_id'], **job['options'])
+                    fields = {'status': 'completed', 'result': result}
+                elif job.get('type') == 'refresh':
+                    result = self.content_manager.refresh_content(job['content_id'], job['user_id'])
+                    fields = {'status': 'completed', 'result': result}
+                else:
+                    content_id = self.content_manager.create_content(job['team_id'], job['url'])
+                    fields = {'status': 'completed', 'content_id': content_id}
+            except Exception as e:
+                print(f"Error running scrape job {job_id}: {str(e)}")
+                fields = {'status': 'failed', 'error': str(e)}
+
+        fields['finished_at'] = datetime.utcnow().isoformat()
+        self.broker.update(job_id, **fields)
+        job.update(fields)
+
+        payload = {
+            'job_id': job_id,
+            'type': job.get('type', 'scrape'),
+            'status': job['status'],
+            'url': job['url'],
+            'error': job['error'],
+            'timestamp': fields['finished_at']
+        }
+        if payload['type'] == 'crawl':
+            result = job.get('result') or {}
+            payload['pages'] = result.get('pages', 0)
+            payload['pages_per_second'] = result.get('pages_per_second', 0)
+        elif payload['type'] == 'refresh':
+            payload['content_id'] = job['content_id']
+            payload['changed'] = (job.get('result') or {}).get('changed', False)
+        else:
+            payload['content_id'] = job['content_id']
+
+        self.socketio.emit('scrape_completed', payload, room=f"team_{job['team_id']}")
+
+
+scrape_queue = ScrapeJobQueue()
@@ -2,7 +2,8 @@ import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 import re
-from ..models import db, Content, ContentNode
+from ..models import db, Content
+from .tree_service import insert_tree
 from datetime import datetime
 
 class WebScraper:
@@ -108,39 +109,16 @@ def create_content_nodes(team_id, url, parsed_content):
             team_id=team_id,
             url=url,
             title=parsed_content['title'],
-            content=parsed_content['content'],
+            original_content=parsed_content['content'],
+            current_content=parsed_content['content'],
             meta=parsed_content['meta'],
             created_at=datetime.utcnow()
         )
         db.session.add(root_content)
         db.session.flush()  # Get the ID without committing
 
-        # Create the root node
-        root_node = ContentNode(
-            content_id=root_content.id,
-            title=parsed_content['title'],
-            node_type='root',
-            level=0
-        )
-        db.session.add(root_node)
-
-        # Create child nodes from structure
-        def create_child_nodes(parent_node, children, level):
-            for child in children:
-                child_node = ContentNode(
-                    content_id=root_content.id,
-                    parent_id=parent_node.id,
-                    title=child['title'],
-                    node_type='section',
-                    level=level
-                )
-                db.session.add(child_node)
-                db.session.flush()
-                
-                if child.get('children'):
-                    create_child_nodes(child_node, child['children'], level + 1)
-
-        create_child_nodes(root_node, parsed_content['structure'], 1)
+        # Create the root node and child nodes from structure
+        insert_tree(root_content.id, parsed_content['title'], parsed_content['structure'], depth_levels=True)
         db.session.commit()
         
         return root_content.id
@@ -0,0 +1,281 @@
+from html import escape
+from html.parser import HTMLParser
+import re
+import time
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from .. import db
+from ..models import Content, ContentNode, NodeContent, SearchDocument
+
+WORD = re.compile(r'\w+', re.UNICODE)
+# Snippet highlight markers, swapped for <mark> tags once the text is escaped
+MARK_START, MARK_END = '\x02', '\x03'
+SKIPPED_TAGS = frozenset(['script', 'style'])
+
+
+class _TextExtractor(HTMLParser):
+    """Collects the visible text of a section's HTML"""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skipping += 1
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS and self.skipping:
+            self.skipping -= 1
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.parts.append(data)
+
+
+def html_to_text(html):
+    """Strip markup from a section body, keeping only its text"""
+    if not html or '<' not in html:
+        return html or ''
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return ' '.join(' '.join(extractor.parts).split())
+
+
+class SearchIndex:
+    """Section-level full-text index backed by an SQLite FTS5 table.
+
+    Each NodeContent row is indexed as (team, title, body) text, keyed by a
+    SearchDocument row whose id is the FTS rowid. Databases without FTS5 fall
+    back to substring matching on section bodies.
+    """
+    TABLE = 'section_search'
+    # How long a missing FTS table is assumed to stay missing before looking again
+    RECHECK_INTERVAL = 30.0
+
+    def __init__(self):
+        self._enabled = None
+        self._checked_at = 0.0
+
+    def init_app(self, app):
+        # Each app may point at another database; look the table up again
+        self._enabled = None
+
+    @property
+    def enabled(self):
+        """Whether the FTS table exists, looked up on first use without creating it.
+
+        With lazy startup create_index() runs in `flask init-db`, not in the
+        worker, so the worker finds the table in sqlite_master instead.
+        """
+        stale = time.monotonic() - self._checked_at > self.RECHECK_INTERVAL
+        if self._enabled is None or (not self._enabled and stale):
+            self._enabled = db.engine.dialect.name == 'sqlite' and self._table_exists(db.session)
+            self._checked_at = time.monotonic()
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, value):
+        self._enabled = value
+        self._checked_at = time.monotonic()
+
+    def _table_exists(self, connection):
+        return connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': self.TABLE}
+        ).first() is not None
+
+    def create_index(self):
+        """Create the FTS5 table if the database supports it.
+
+        A table created on a database that already holds content is filled
+        by a rebuild, since sections written before it existed were skipped.
+        """
+        if db.engine.dialect.name != 'sqlite':
+            print("Warning: full-text search needs SQLite FTS5, using substring search")
+            self.enabled = False
+            return False
+        try:
+            with db.engine.begin() as connection:
+                created = not self._table_exists(connection)
+                connection.execute(text(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.TABLE} USING fts5("
+                    "team, title, body, prefix='2 3', "
+                    "tokenize='porter unicode61 remove_diacritics 2')"
+                ))
+            self.enabled = True
+        except OperationalError as e:
+            print(f"Warning: FTS5 is not available ({str(e)}), using substring search")
+            self.enabled = False
+            return False
+        if created and db.session.query(NodeContent.node_id).first() is not None:
+            print(f"Indexed {self.rebuild()} content records written before the search index existed")
+        return True
+
+    def index_content(self, content_id):
+        """(Re)index every section of one content record in the current transaction"""
+        if not self.enabled:
+            return
+        rows = db.session.query(ContentNode.id, ContentNode.title, NodeContent.body, Content.team_id)\
+            .join(NodeContent, NodeContent.node_id == ContentNode.id)\
+            .join(Content, Content.id == ContentNode.content_id)\
+            .filter(ContentNode.content_id == content_id)\
+            .all()
+        documents = {
+            document.node_id: document
+            for document in SearchDocument.query.filter_by(content_id=content_id)
+        }
+        entries = []
+        for node_id, title, body, team_id in rows:
+            document = documents.get(node_id)
+            if document is None:
+                document = SearchDocument(node_id=node_id, content_id=content_id, team_id=team_id)
+                db.session.add(document)
+            entries.append((document, title, body))
+        self._write(entries)
+
+    def index_node(self, node, body):
+        """(Re)index a single section in the current transaction"""
+        if not self.enabled:
+            return
+        document = SearchDocument.query.filter_by(node_id=node.id).first()
+        if document is None:
+            document = SearchDocument(node_id=node.id, content_id=node.content_id, team_id=node.content.team_id)
+            db.session.add(document)
+        self._write([(document, node.title, body)])
+
+    def _write(self, entries):
+        """Replace the indexed text of each (document, title, body) entry"""
+        if not entries:
+            return
+        # One batched insert assigns the rowids of new documents
+        db.session.flush()
+        db.session.execute(
+            text(f"DELETE FROM {self.TABLE} WHERE rowid = :rowid"),
+            [{'rowid': document.id} for document, _, _ in entries]
+        )
+        db.session.execute(
+            text(f"INSERT INTO {self.TABLE} (rowid, team, title, body) VALUES (:rowid, :team, :title, :body)"),
+            [{
+                'rowid': document.id,
+                'team': self._team_token(document.team_id),
+                'title': title,
+                'body': html_to_text(body)
+            } for document, title, body in entries]
+        )
+
+    def rebuild(self, batch_size=200):
+        """Rebuild the whole index from NodeContent rows"""
+        if not self.enabled:
+            return 0
+        try:
+            db.session.execute(text(f"DELETE FROM {self.TABLE}"))
+            SearchDocument.query.delete()
+            content_ids = [content_id for (content_id,) in db.session.query(NodeContent.content_id).distinct()]
+            for count, content_id in enumerate(content_ids, 1):
+                self.index_content(content_id)
+                if count % batch_size == 0:
+                    db.session.commit()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error rebuilding search index: {str(e)}")
+            raise
+        return len(content_ids)
+
+    def search(self, team_id, query, page=1, per_page=20):
+        """Return one page of BM25-ranked section hits and whether more pages exist"""
+        terms = WORD.findall(query.lower())
+        if not terms:
+            return [], False
+
+        offset = (page - 1) * per_page
+        if self.enabled:
+            hits = self._search_fts(team_id, terms, per_page + 1, offset)
+        else:
+            hits = self._search_substring(team_id, query, per_page + 1, offset)
+        has_more = len(hits) > per_page
+        hits = hits[:per_page]
+
+        contents = {
+            content.id: content
+            for content in Content.query.filter(Content.id.in_({hit['content_id'] for hit in hits}))
+        }
+        titles = dict(
+            db.session.query(ContentNode.id, ContentNode.title)
+            .filter(ContentNode.id.in_([hit['node_id'] for hit in hits]))
+        )
+
+        results = []
+        for hit in hits:
+            content = contents.get(hit['content_id'])
+            if content is None:
+                continue
+            results.append({
+                'id': content.id,
+                'title': content.title,
+                'url': content.url,
+                'updated_at': content.updated_at.isoformat(),
+                'node_id': hit['node_id'],
+                'section': titles.get(hit['node_id']),
+                'snippet': hit['snippet'],
+                'score': hit['score']
+            })
+        return results, has_more
+
+    def _search_fts(self, team_id, terms, limit, offset):
+        # All terms must match; a last term of 3+ characters may be a prefix of a longer word
+        phrases = ['"%s"' % term for term in terms]
+        if len(terms[-1]) >= 3:
+            phrases[-1] += '*'
+        match = 'team : "%s" AND (%s)' % (self._team_token(team_id), ' '.join(phrases))
+
+        # Column weights are (team, title, body): title hits rank above body hits
+        rows = db.session.execute(text(
+            f"SELECT d.node_id, d.content_id, "
+            f"snippet({self.TABLE}, 2, :mark_start, :mark_end, '...', 16) AS snippet, "
+            f"bm25({self.TABLE}, 0.0, 5.0, 1.0) AS score "
+            f"FROM {self.TABLE} JOIN search_document d ON d.id = {self.TABLE}.rowid "
+            f"WHERE {self.TABLE} MATCH :match "
+            f"ORDER BY score LIMIT :limit OFFSET :offset"
+        ), {'match': match, 'mark_start': MARK_START, 'mark_end': MARK_END, 'limit': limit, 'offset': offset})
+
+        return [{
+            'node_id': row.node_id,
+            'content_id': row.content_id,
+            'snippet': escape(row.snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'),
+            'score': round(-row.score, 4)
+        } for row in rows]
+
+    def _search_substring(self, team_id, query, limit, offset):
+        rows = db.session.query(NodeContent.node_id, NodeContent.content_id, NodeContent.body)\
+            .join(Content, Content.id == NodeContent.content_id)\
+            .join(ContentNode, ContentNode.id == NodeContent.node_id)\
+            .filter(
+                Content.team_id == team_id,
+                NodeContent.body.ilike(f'%{query}%') | ContentNode.title.ilike(f'%{query}%')
+            )\
+            .order_by(Content.updated_at.desc(), NodeContent.node_id)\
+            .limit(limit).offset(offset)\
+            .all()
+
+        hits = []
+        for node_id, content_id, body in rows:
+            body = html_to_text(body)
+            position = body.lower().find(query.lower())
+            start = max(position - 60, 0)
+            hits.append({
+                'node_id': node_id,
+                'content_id': content_id,
+                'snippet': escape(body[start:start + 160]),
+                'score': None
+            })
+        return hits
+
+    def _team_token(self, team_id):
+        # A dash-free team id is indexed as a single token
+        return team_id.replace('-', '')
+
+
+search_index = SearchIndex()
@@ -0,0 +1,85 @@
+import socketserver
+import threading
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Minimal SMTP server that accepts every message and keeps it in memory.
+
+    A local stand-in for the real mail server in tests and development, in
+    the spirit of aiosmtpd's debugging handler: point MAIL_SERVER/MAIL_PORT
+    at it with MAIL_USE_TLS=false (`flask mail-sink` runs one). `delay`
+    seconds are added to each connection, to imitate a slow remote server;
+    with `echo` every message is also printed.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 8025), delay=0.0, echo=False):
+        self.delay = delay
+        self.echo = echo
+        self.messages = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        super().__init__(address, _SMTPHandler)
+
+    def deliver(self, mail_from, recipients, data):
+        with self._lock:
+            self.messages.append({'from': mail_from, 'to': recipients, 'data': data})
+        if self.echo:
+            print(f"Mail from {mail_from} to {', '.join(recipients)}\n{data}")
+
+    def count_connection(self):
+        with self._lock:
+            self.connections += 1
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.server.count_connection()
+        if self.server.delay:
+            threading.Event().wait(self.server.delay)
+        self.reply('220 localhost sink ready')
+        mail_from, recipients = None, []
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip()
+            verb = command[:4].upper()
+
+            if verb == 'EHLO':
+                self.wfile.write(b'250-localhost\r\n250 8BITMIME\r\n')
+            elif verb == 'HELO':
+                self.reply('250 localhost')
+            elif verb == 'MAIL':
+                mail_from, recipients = command.partition(':')[2].strip(), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command.partition(':')[2].strip())
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line in (b'.\r\n', b'.\n'):
+                        break
+                    # Undo dot-stuffing
+                    lines.append(data_line[1:] if data_line.startswith(b'..') else data_line)
+                self.server.deliver(mail_from, recipients, b''.join(lines).decode(errors='replace'))
+                mail_from, recipients = None, []
+                self.reply('250 OK')
+            elif verb == 'RSET':
+                mail_from, recipients = None, []
+                self.reply('250 OK')
+            elif verb == 'NOOP':
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
@@ -0,0 +1,117 @@
+import threading
+import time
+from .. import db
+from ..models import Content, TeamMember
+from .auth_service import token_cache
+from .permission_service import permission_cache
+
+
+class SocketSessions:
+    """Identity and permitted rooms of each authenticated Socket.IO connection.
+
+    The JWT is verified and the user's team memberships loaded once, when the
+    connection is made. Events then check the sid's session with set lookups
+    only: no token decoding and no queries. A team the user joined later is
+    looked up through permission_cache on first use, and a membership change
+    drops the cached grants (see forget_team), so the next event re-checks.
+    """
+    def __init__(self):
+        # sid -> {'user_id', 'expires', 'teams': set, 'rooms': {room: team_id}}
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def connect(self, sid, token):
+        """Verify a token and open the sid's session; raises on an invalid or expired token"""
+        claims = token_cache.verify(token)
+        user_id = claims['sub']
+        teams = {
+            team_id for (team_id,) in
+            db.session.query(TeamMember.team_id).filter_by(user_id=user_id)
+        }
+        session = {'user_id': user_id, 'expires': claims.get('exp'), 'teams': teams, 'rooms': {}}
+        with self._lock:
+            self._sessions[sid] = session
+        return session
+
+    def get(self, sid):
+        """The sid's session, or None when it is unauthenticated or its token expired"""
+        session = self._sessions.get(sid)
+        if session is None or (session['expires'] and session['expires'] <= time.time()):
+            return None
+        return session
+
+    def disconnect(self, sid):
+        with self._lock:
+            return self._sessions.pop(sid, None)
+
+    def user_id(self, sid):
+        session = self.get(sid)
+        return session['user_id'] if session else None
+
+    def allow_team(self, sid, team_id):
+        """Whether the sid's user is a member of the team"""
+        session = self.get(sid)
+        if session is None:
+            return False
+        if team_id in session['teams']:
+            return True
+        if permission_cache.get_role(session['user_id'], team_id):
+            session['teams'].add(team_id)
+            return True
+        return False
+
+    def content_room(self, sid, content_id):
+        """The content's room when the sid's user may use it, otherwise None.
+
+        The first check per room costs one query; later ones are a dict lookup.
+        """
+        room = f"content_{content_id}"
+        session = self.get(sid)
+        if session is None:
+            return None
+        if room in session['rooms']:
+            return room
+        team_id = db.session.query(Content.team_id).filter_by(id=content_id).scalar()
+        if team_id is None or not self.allow_team(sid, team_id):
+            return None
+        session['rooms'][room] = team_id
+        return room
+
+    def revoke_room(self, sid, room):
+        session = self._sessions.get(sid)
+        if session is not None:
+            session['rooms'].pop(room, None)
+
+    def forget_team(self, user_id, team_id, removed=False):
+        """Drop a user's cached grants for a team after their membership changed.
+
+        When the membership was removed, the user's sids also leave the
+        team's room and the rooms of its content, so they stop receiving its
+        broadcasts. Only sids connected to this process are affected.
+        """
+        with self._lock:
+            sessions = [(sid, session) for sid, session in self._sessions.items() if session['user_id'] == user_id]
+        for sid, session in sessions:
+            session['teams'].discard(team_id)
+            rooms = [room for room, room_team in session['rooms'].items() if room_team == team_id]
+            for room in rooms:
+                session['rooms'].pop(room, None)
+            if removed:
+                self._leave_team_rooms(sid, user_id, team_id, rooms)
+
+    def _leave_team_rooms(self, sid, user_id, team_id, content_rooms):
+        from .. import socketio
+        from .document_cache import active_documents
+        from .presence_service import presence
+
+        try:
+            socketio.server.leave_room(sid, f"team_{team_id}", namespace='/')
+            for room in content_rooms:
+                socketio.server.leave_room(sid, room, namespace='/')
+                active_documents.close(room[len('content_'):], sid)
+                presence.leave(room, user_id, sid)
+        except Exception as e:
+            print(f"Error removing socket {sid} from team {team_id} rooms: {str(e)}")
+
+
+socket_sessions = SocketSessions()
@@ -0,0 +1,192 @@
+import json
+import socket
+import socketserver
+import struct
+import threading
+from urllib.parse import urlparse
+
+import socketio
+
+DEFAULT_LOCAL_URL = 'local://127.0.0.1:6390'
+_HEADER = struct.Struct('!I')
+# Larger frames are treated as garbage and drop the connection
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+
+def _send_frame(sock, payload):
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exact(reader, size):
+    data = reader.read(size)
+    if len(data) < size:
+        raise ConnectionError('Connection closed')
+    return data
+
+
+def _recv_frame(reader):
+    (size,) = _HEADER.unpack(_recv_exact(reader, _HEADER.size))
+    if size > MAX_FRAME_SIZE:
+        raise ConnectionError(f"Frame of {size} bytes exceeds the {MAX_FRAME_SIZE} byte limit")
+    return _recv_exact(reader, size)
+
+
+def encode_message(channel, data):
+    """Serialize a queue message as JSON; frames never carry pickles, so a peer cannot run code"""
+    return json.dumps({'channel': channel, 'data': data}, separators=(',', ':')).encode()
+
+
+def decode_message(frame):
+    """Return (channel, data) of a frame, or None when it is not a well-formed message"""
+    try:
+        message = json.loads(frame)
+    except ValueError:
+        return None
+    if not isinstance(message, dict) or not isinstance(message.get('channel'), str):
+        return None
+    return message['channel'], message.get('data')
+
+
+def parse_address(url):
+    parsed = urlparse(url or DEFAULT_LOCAL_URL)
+    return parsed.hostname or '127.0.0.1', parsed.port or 6390
+
+
+class LocalRelay(socketserver.ThreadingTCPServer):
+    """Fan-out relay for LocalQueueManager: every frame a client sends goes to every client.
+
+    A stand-in for Redis pub/sub in tests and single-host setups without
+    Redis. Start one per host (`flask socket-relay`) and point each worker at
+    it with SOCKETIO_QUEUE_BACKEND=local. The relay has no authentication,
+    so it listens on the loopback interface unless told otherwise; frames
+    that are not JSON queue messages are dropped.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 6390)):
+        self._clients = set()
+        self._clients_lock = threading.Lock()
+        super().__init__(address, _RelayHandler)
+
+    def broadcast(self, frame):
+        with self._clients_lock:
+            clients = list(self._clients)
+        for client in clients:
+            try:
+                with client.lock:
+                    _send_frame(client.connection, frame)
+            except OSError:
+                self.remove(client)
+
+    def add(self, client):
+        with self._clients_lock:
+            self._clients.add(client)
+
+    def remove(self, client):
+        with self._clients_lock:
+            self._clients.discard(client)
+
+
+class _RelayHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.lock = threading.Lock()
+        self.server.add(self)
+
+    def handle(self):
+        try:
+            while True:
+                frame = _recv_frame(self.rfile)
+                if decode_message(frame) is None:
+                    print(f"Warning: dropped a malformed frame from {self.client_address[0]}")
+                    continue
+                self.server.broadcast(frame)
+        except (ConnectionError, OSError):
+            pass
+
+    def finish(self):
+        self.server.remove(self)
+        super().finish()
+
+
+class LocalQueueManager(socketio.PubSubManager):
+    """Socket.IO client manager that shares emits between processes through a LocalRelay"""
+    name = 'local'
+
+    def __init__(self, url=DEFAULT_LOCAL_URL, channel='flask-socketio', write_only=False, logger=None):
+        self.address = parse_address(url)
+        self._publisher = None
+        self._publish_lock = threading.Lock()
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+
+    def initialize(self):
+        super().initialize()
+        if self.server.async_mode == 'eventlet':
+            from eventlet.patcher import is_monkey_patched
+            if not is_monkey_patched('socket'):
+                raise RuntimeError('The local message queue requires a monkey patched '
+                                   'socket library to work with eventlet')
+
+    def _connect(self):
+        connection = socket.create_connection(self.address)
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return connection
+
+    def _publish(self, data):
+        frame = encode_message(self.channel, data)
+        with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publisher is None:
+                        self._publisher = self._connect()
+                    _send_frame(self._publisher, frame)
+                    return
+                except OSError:
+                    self._publisher = None
+                    if attempt:
+                        raise
+
+    def _listen(self):
+        while True:
+            try:
+                connection = self._connect()
+            except OSError as e:
+                print(f"Error connecting to socket relay at {self.address}: {str(e)}")
+                self.server.sleep(1)
+                continue
+            reader = connection.makefile('rb')
+            try:
+                while True:
+                    message = decode_message(_recv_frame(reader))
+                    if message is None:
+                        print("Warning: ignored a malformed frame from the socket relay")
+                        continue
+                    channel, data = message
+                    if channel == self.channel:
+                        yield data
+            except (ConnectionError, OSError) as e:
+                print(f"Error reading from socket relay: {str(e)}")
+            finally:
+                reader.close()
+                connection.close()
+
+
+def queue_options(app):
+    """Socket.IO server options for the configured message queue.
+
+    Without a queue an emit only reaches clients connected to this process.
+    With one, every emit (including those from REST handlers) is published
+    and each worker delivers it to the members of the room it holds, so a
+    room spans all workers. Polling clients need sticky sessions.
+    """
+    backend = app.config.get('SOCKETIO_QUEUE_BACKEND', 'none')
+    url = app.config.get('SOCKETIO_QUEUE_URL')
+    channel = app.config.get('SOCKETIO_CHANNEL', 'flask-socketio')
+
+    if backend == 'redis':
+        return {'message_queue': url or app.config['REDIS_URL'], 'channel': channel}
+    if backend == 'local':
+        return {'client_manager': LocalQueueManager(url or DEFAULT_LOCAL_URL, channel=channel)}
+    return {}
@@ -0,0 +1,183 @@
+from collections import OrderedDict
+import threading
+import uuid
+from sqlalchemy import insert
+from .. import db
+from ..models import ContentNode, NodeContent
+
+
+class ContentTreeCache:
+    """Loads a content's file tree in one query and caches its serialized form.
+
+    Entries are keyed by the content's updated_at, which every structure
+    change (and every section edit) bumps, so a stale tree is never served
+    even when the change was made by another process.
+    """
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_entries = app.config.get('TREE_CACHE_SIZE', self.max_entries)
+
+    def get_tree(self, content, include_content=False):
+        """Return the serialized tree rooted at the content's root node"""
+        key = (content.id, include_content)
+        stamp = content.updated_at
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        tree = self.load_tree(content.id, include_content)
+
+        with self._lock:
+            self._entries[key] = (stamp, tree)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return tree
+
+    def invalidate(self, content_id):
+        with self._lock:
+            self._entries.pop((content_id, False), None)
+            self._entries.pop((content_id, True), None)
+
+    def load_tree(self, content_id, include_content=False):
+        """Fetch every node of a content with a single query and assemble the tree"""
+        columns = [
+            ContentNode.id, ContentNode.parent_id, ContentNode.title,
+            ContentNode.node_type, ContentNode.level
+        ]
+        query = db.session.query(*columns)
+        if include_content:
+            query = db.session.query(*columns, NodeContent.body)\
+                .outerjoin(NodeContent, NodeContent.node_id == ContentNode.id)
+        rows = query.filter(ContentNode.content_id == content_id)\
+            .order_by(ContentNode.order)\
+            .all()
+
+        nodes = {}
+        for row in rows:
+            node = {
+                'id': row.id,
+                'title': row.title,
+                'type': row.node_type,
+                'level': row.level,
+                'children': []
+            }
+            if include_content:
+                node['content'] = row.body or ''
+            nodes[row.id] = node
+
+        root = None
+        for row in rows:
+            if row.parent_id is None:
+                root = root or nodes[row.id]
+            elif row.parent_id in nodes:
+                nodes[row.parent_id]['children'].append(nodes[row.id])
+        return root
+
+
+def section_bodies(sections):
+    """Section bodies per title in document order.
+
+    Takes the scraper's ordered `sections` list, or a {title: section} map
+    from content stored before it existed (one body per title).
+    """
+    if isinstance(sections, dict):
+        sections = [dict(section, title=title) for title, section in sections.items()]
+    bodies = {}
+    for section in sections:
+        bodies.setdefault(section['title'], []).append(section.get('content', ''))
+    return bodies
+
+
+def section_body(bodies, title, occurrence):
+    """Body of the occurrence-th heading with this title; headings beyond the sections reuse the last one"""
+    matches = bodies.get(title)
+    if not matches:
+        return ''
+    return matches[min(occurrence, len(matches) - 1)]
+
+
+def insert_tree(content_id, root_title, structure, sections=None, depth_levels=False):
+    """Insert a root node, its structure nodes and their section bodies in bulk.
+
+    Node ids are generated up front, so the whole tree is written with one
+    executemany per table instead of a flush per node. Section rows are only
+    written when sections are given; the n-th heading with a title gets the
+    n-th section with that title (see section_bodies). Returns the root id.
+    """
+    nodes = []
+    bodies = []
+    by_title = section_bodies(sections) if sections is not None else None
+    occurrences = {}
+
+    def add_node(parent_id, title, node_type, level, order):
+        node_id = str(uuid.uuid4())
+        nodes.append({
+            'id': node_id,
+            'content_id': content_id,
+            'parent_id': parent_id,
+            'title': title,
+            'node_type': node_type,
+            'level': level,
+            'order': order
+        })
+        if by_title is not None:
+            # The root shares the body of the first section with its title without taking its turn
+            occurrence = occurrences.get(title, 0)
+            if node_type != 'root':
+                occurrences[title] = occurrence + 1
+            bodies.append({
+                'node_id': node_id,
+                'content_id': content_id,
+                'body': section_body(by_title, title, occurrence)
+            })
+        return node_id
+
+    root_id = add_node(None, root_title, 'root', 0, 0)
+
+    # Iterative pre-order walk, so headings are numbered in document order and
+    # very deep heading structures cannot hit the recursion limit
+    pending = [(item, root_id, 1, order) for order, item in reversed(list(enumerate(structure)))]
+    while pending:
+        item, parent_id, depth, order = pending.pop()
+        level = depth if depth_levels else item['level']
+        node_id = add_node(parent_id, item['title'], 'section', level, order)
+        children = item.get('children') or []
+        pending.extend((child, node_id, depth + 1, child_order)
+                       for child_order, child in reversed(list(enumerate(children))))
+
+    db.session.execute(insert(ContentNode), nodes)
+    if bodies:
+        db.session.execute(insert(NodeContent), bodies)
+    return root_id
+
+
+def tree_order(nodes):
+    """Non-root nodes of one content in document (pre-)order, and the root.
+
+    nodes need id, parent_id, order and node_type; this is the order in which
+    insert_tree numbers headings that share a title.
+    """
+    children = {}
+    root = None
+    for node in nodes:
+        if node.node_type == 'root' and root is None:
+            root = node
+        else:
+            children.setdefault(node.parent_id, []).append(node)
+    ordered = []
+    pending = list(reversed(sorted(children.get(root.id, []), key=lambda node: node.order))) if root else []
+    while pending:
+        node = pending.pop()
+        ordered.append(node)
+        pending.extend(reversed(sorted(children.get(node.id, []), key=lambda child: child.order)))
+    return ordered, root
+
+
+content_tree = ContentTreeCache()
@@ -0,0 +1,60 @@
+"""Micro-benchmark per-request token verification.
+
+Times authenticating one request and reading its identity with the plain
+flask_jwt_extended path (verify_jwt_in_request + get_jwt_identity) and with
+auth_required backed by the token cache, inside a request context so
+routing and the test client are left out.
+
+    python benchmarks/auth_benchmark.py [--requests 20000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask_jwt_extended import create_access_token, get_jwt_identity, verify_jwt_in_request  # noqa: E402
+from app import create_app  # noqa: E402
+from app.services.auth_service import auth_required, get_identity, token_cache  # noqa: E402
+
+
+def plain():
+    verify_jwt_in_request()
+    return get_jwt_identity()
+
+
+@auth_required
+def cached():
+    return get_identity()
+
+
+def per_request_us(app, headers, view, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        with app.test_request_context('/', headers=headers):
+            view()
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SCRAPE_WORKERS': 0})
+    with app.app_context():
+        headers = {'Authorization': f"Bearer {create_access_token(identity='bench-user')}"}
+
+    def empty():
+        pass
+
+    baseline = per_request_us(app, headers, empty, args.requests)
+    print(f"{'Path':<24} {'us/request':>10}")
+    print(f"{'flask_jwt_extended':<24} {per_request_us(app, headers, plain, args.requests) - baseline:>10.2f}")
+    token_cache.clear()
+    print(f"{'auth_required (cached)':<24} {per_request_us(app, headers, cached, args.requests) - baseline:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Compare node and content read latency with and without the document open in a room.
+
+Seeds one content with --sections sections, then times get_node_content for
+every node and GET /content/<id>?include_content=true while nobody has the
+document open (SQLite) and while a client is joined to its room (memory).
+
+    python benchmarks/document_cache_benchmark.py [--sections 200] [--rounds 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app, db, socketio  # noqa: E402
+from app.models import ContentNode  # noqa: E402
+from app.services.content_service import ContentManager  # noqa: E402
+from write_benchmark import seed  # noqa: E402
+
+
+def time_reads(app, token, content_id, node_ids, rounds):
+    manager = ContentManager()
+    with app.app_context():
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for node_id in node_ids:
+                manager.get_node_content(node_id)
+        node_us = (time.perf_counter() - start) / (rounds * len(node_ids)) * 1e6
+        db.session.remove()
+
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    start = time.perf_counter()
+    for _ in range(rounds):
+        client.get(f'/content/{content_id}?include_content=true', headers=headers)
+    content_us = (time.perf_counter() - start) / rounds * 1e6
+    return node_us, content_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sections', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'SCRAPE_WORKERS': 0,
+        'EDIT_COALESCE_WINDOW': 0
+    })
+    token, node_ids = seed(app, args.sections)
+    with app.app_context():
+        content_id = db.session.get(ContentNode, node_ids[0]).content_id
+
+    print(f"{'Document':<10} {'node read us':>13} {'GET content us':>15}")
+    node_us, content_us = time_reads(app, token, content_id, node_ids, args.rounds)
+    print(f"{'closed':<10} {node_us:>13.1f} {content_us:>15.1f}")
+
+    room_client = socketio.test_client(app, auth={'token': token})
+    room_client.emit('join', {'content_id': content_id})
+    node_us, content_us = time_reads(app, token, content_id, node_ids, args.rounds)
+    print(f"{'open':<10} {node_us:>13.1f} {content_us:>15.1f}")
+    room_client.disconnect()
+
+
+if __name__ == '__main__':
+    main()
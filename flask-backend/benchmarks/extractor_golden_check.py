@@ -0,0 +1,170 @@
+"""Check the single-pass HTML extractor against a golden-output corpus.
+
+Every page in benchmarks/extractor_corpus/ has its expected title, content
+sections, structure, meta and links next to it as NAME.json. The expected
+output was produced by the BeautifulSoup walk WebScraper used before the
+extractor (kept below as `soup_extract`), so a match proves the extractor
+is equivalent. lxml repairs malformed markup differently from html.parser;
+where the soup walk over an lxml-built tree gives another result, that
+result is stored as NAME.lxml.json. extract() is compared for every parser
+select_parser can return that is installed here; exits with status 1 on a
+difference.
+
+    python benchmarks/extractor_golden_check.py [--update]
+
+--update regenerates the expected files from the soup walk (needs bs4, and
+lxml for the lxml variants).
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.html_extractor import _lxml_available, extract  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'extractor_corpus')
+PARSERS = ('html.parser', 'lxml')
+
+
+def soup_extract(html, parser):
+    """The extraction WebScraper did with BeautifulSoup before the single-pass extractor"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, parser)
+    links = [anchor['href'] for anchor in soup.find_all('a', href=True)]
+
+    for tag in ['script', 'style', 'iframe', 'nav', 'footer', 'header', 'noscript']:
+        for element in soup.find_all(tag):
+            element.decompose()
+    for element in soup.find_all(style=re.compile(r'display:\s*none')):
+        element.decompose()
+
+    if h1 := soup.find('h1'):
+        title = h1.get_text(strip=True)
+    elif title_tag := soup.find('title'):
+        title = title_tag.get_text(strip=True)
+    else:
+        title = "Untitled Document"
+
+    main_content = (
+        soup.find('main') or
+        soup.find('article') or
+        soup.find('div', class_=re.compile(r'content|main|docs|documentation', re.I))
+    )
+    content = {}
+    if main_content:
+        current_section = None
+        buffer = []
+        for element in main_content.children:
+            if not element.name:
+                continue
+            if element.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
+                if current_section and buffer:
+                    content[current_section]['content'] = ''.join(str(b) for b in buffer)
+                    buffer = []
+                current_section = element.get_text(strip=True)
+                content[current_section] = {'content': '', 'type': 'section'}
+            elif current_section:
+                buffer.append(element)
+        if current_section and buffer:
+            content[current_section]['content'] = ''.join(str(b) for b in buffer)
+
+    structure = []
+    current_path = [None] * 6
+    for header in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
+        level = int(header.name[1]) - 1
+        node = {'title': header.get_text(strip=True), 'level': level, 'children': []}
+        if level == 0:
+            structure.append(node)
+        else:
+            parent_level = level - 1
+            while parent_level >= 0:
+                if current_path[parent_level]:
+                    current_path[parent_level]['children'].append(node)
+                    break
+                parent_level -= 1
+            if parent_level < 0:
+                structure.append(node)
+        current_path[level] = node
+        for i in range(level + 1, 6):
+            current_path[i] = None
+
+    meta = {}
+    if desc := soup.find('meta', {'name': 'description'}):
+        meta['description'] = desc.get('content', '')
+    if keywords := soup.find('meta', {'name': 'keywords'}):
+        meta['keywords'] = [k.strip() for k in keywords.get('content', '').split(',')]
+    if author := soup.find('meta', {'name': 'author'}):
+        meta['author'] = author.get('content', '')
+
+    return {'title': title, 'content': content, 'structure': structure, 'meta': meta, 'links': links}
+
+
+def expected_path(page, parser):
+    """The expected output of a page for a parser; lxml falls back to the shared file"""
+    base = page[:-len('.html')]
+    if parser == 'lxml' and os.path.exists(f"{base}.lxml.json"):
+        return f"{base}.lxml.json"
+    return f"{base}.json"
+
+
+def write_json(path, data):
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump(data, handle, indent=2, ensure_ascii=False)
+        handle.write('\n')
+
+
+def update(pages):
+    for page in pages:
+        with open(page, encoding='utf-8') as handle:
+            html = handle.read()
+        base = page[:-len('.html')]
+        expected = soup_extract(html, 'html.parser')
+        write_json(f"{base}.json", expected)
+        lxml_expected = soup_extract(html, 'lxml')
+        if lxml_expected != expected:
+            write_json(f"{base}.lxml.json", lxml_expected)
+        elif os.path.exists(f"{base}.lxml.json"):
+            os.remove(f"{base}.lxml.json")
+    print(f"Wrote expected output for {len(pages)} pages")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--update', action='store_true', help='regenerate the expected output')
+    args = parser.parse_args()
+
+    pages = sorted(glob.glob(os.path.join(CORPUS, '*.html')))
+    if args.update:
+        update(pages)
+        return
+
+    parsers = [name for name in PARSERS if name != 'lxml' or _lxml_available()]
+    failures = []
+    for page in pages:
+        with open(page, encoding='utf-8') as handle:
+            html = handle.read()
+        for name in parsers:
+            with open(expected_path(page, name), encoding='utf-8') as handle:
+                expected = json.load(handle)
+            actual = extract(html, parser=name)
+            for key in expected:
+                if actual.get(key) != expected[key]:
+                    failures.append(f"{os.path.basename(page)} [{name}] {key}:\n"
+                                    f"  expected {expected[key]!r}\n  got      {actual.get(key)!r}")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    skipped = [name for name in PARSERS if name not in parsers]
+    note = f" ({', '.join(skipped)} not installed, skipped)" if skipped else ''
+    print(f"Checked {len(pages)} pages with {', '.join(parsers)}{note}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Compare full-text edit history against snapshots plus deltas.
+
+Simulates a ~50 KB section edited a few hundred times and reports the bytes
+each scheme stores and the time to materialize a version.
+
+    python benchmarks/history_benchmark.py [--size 50000] [--edits 400] [--interval 20]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.history_service import apply_delta, compute_delta  # noqa: E402
+
+WORDS = ('install', 'configure', 'the', 'server', 'client', 'request', 'token', 'team',
+         'content', 'section', 'update', 'with', 'and', 'for', 'a', 'node')
+
+
+def make_text(size, rng):
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words)[:size]
+
+
+def mutate(text, rng):
+    """A typical editor save: replace, insert or delete a short span"""
+    position = rng.randrange(len(text))
+    span = rng.randint(0, 40)
+    replacement = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(0, 6)))
+    return text[:position] + replacement + text[position + span:]
+
+
+def build_history(size, edits, seed=1):
+    rng = random.Random(seed)
+    versions = [make_text(size, rng)]
+    for _ in range(edits):
+        versions.append(mutate(versions[-1], rng))
+    return versions
+
+
+def legacy_rows(versions):
+    return [(versions[i - 1], versions[i]) for i in range(1, len(versions))]
+
+
+def delta_rows(versions, interval):
+    rows = []
+    for version in range(1, len(versions)):
+        previous, new = versions[version - 1], versions[version]
+        snapshot = previous if version % interval == 1 else None
+        rows.append((snapshot, json.dumps(compute_delta(previous, new), separators=(',', ':'))))
+    return rows
+
+
+def materialize(rows, version):
+    base = version
+    while rows[base - 1][0] is None:
+        base -= 1
+    text = rows[base - 1][0]
+    for index in range(base, version + 1):
+        text = apply_delta(text, json.loads(rows[index - 1][1]))
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=50000)
+    parser.add_argument('--edits', type=int, default=400)
+    parser.add_argument('--interval', type=int, default=20)
+    args = parser.parse_args()
+
+    versions = build_history(args.size, args.edits)
+
+    legacy = legacy_rows(versions)
+    legacy_bytes = sum(len(p.encode()) + len(n.encode()) for p, n in legacy)
+
+    start = time.perf_counter()
+    deltas = delta_rows(versions, args.interval)
+    encode_seconds = time.perf_counter() - start
+    delta_bytes = sum(len((s or '').encode()) + len(d.encode()) for s, d in deltas)
+
+    for version in range(1, len(versions)):
+        assert materialize(deltas, version) == versions[version], version
+
+    targets = list(range(1, len(versions)))
+    start = time.perf_counter()
+    for version in targets:
+        legacy[version - 1][1]
+    legacy_read = (time.perf_counter() - start) / len(targets)
+
+    start = time.perf_counter()
+    for version in targets:
+        materialize(deltas, version)
+    delta_read = (time.perf_counter() - start) / len(targets)
+
+    print(f"Section size:        {args.size} chars, {args.edits} edits, snapshot every {args.interval}")
+    print(f"Full-text storage:   {legacy_bytes / 1e6:.2f} MB")
+    print(f"Delta storage:       {delta_bytes / 1e6:.2f} MB ({legacy_bytes / delta_bytes:.0f}x smaller)")
+    print(f"Delta encode:        {encode_seconds / args.edits * 1e3:.3f} ms per edit")
+    print(f"Full-text read:      {legacy_read * 1e6:.2f} us per version (row lookup only)")
+    print(f"Delta read:          {delta_read * 1e3:.3f} ms per version (<= {args.interval} deltas)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Profile worker startup with `python -X importtime` and enforce a budget.
+
+Starts fresh interpreters that import the app and call create_app, once with
+the default eager startup and once with LAZY_STARTUP, against a SQLite file
+so eager schema creation does real work. Reports the median startup time of
+each mode, the packages that cost the most to import in lazy mode and what
+pulled them in. Exits non-zero when lazy startup exceeds
+--budget-ms or when the app's own modules import one of the dependencies
+that are meant to load on first use.
+
+    python benchmarks/import_time_benchmark.py [--runs 5] [--budget-ms 2500] [--top 12]
+"""
+import argparse
+from collections import Counter, defaultdict
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Loaded on first use: scraping, the Redis tiers and .env handling
+DEFERRED = ('requests', 'urllib3', 'bs4', 'lxml', 'redis', 'dotenv')
+
+STARTUP = """
+import time
+start = time.perf_counter()
+from app import create_app
+create_app({'SQLALCHEMY_DATABASE_URI': %r, 'SCRAPE_WORKERS': 0})
+print(f"startup_ms={(time.perf_counter() - start) * 1000:.1f}")
+"""
+
+
+def run_startup(lazy, database, importtime=False):
+    """Start an interpreter that creates the app; returns (startup ms, importtime lines)"""
+    environment = dict(os.environ, LAZY_STARTUP='true' if lazy else 'false')
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', STARTUP % database]
+    result = subprocess.run(command, cwd=ROOT, env=environment, capture_output=True, text=True, check=True)
+    startup_ms = float(result.stdout.rsplit('startup_ms=', 1)[1])
+    return startup_ms, [line for line in result.stderr.splitlines() if line.startswith('import time:')]
+
+
+def parse_importtime(lines):
+    """Yield (module, self µs, importer) for every importtime line.
+
+    The importer is the app module that imported the package directly, or
+    else the first third-party package on the way from the app to it. Lines
+    are printed after their children, one indent deeper per level.
+    """
+    levels = defaultdict(list)
+    for line in lines[1:]:
+        _, self_us, _, name = line.replace('|', ':').split(':')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        levels[depth].append((name.strip(), int(self_us), levels.pop(depth + 1, [])))
+
+    def walk(nodes, app_module, via):
+        for module, self_us, children in nodes:
+            if via is None and module.split('.')[0] == 'app':
+                yield module, self_us, app_module or module
+                yield from walk(children, module, None)
+            else:
+                yield module, self_us, via or app_module or module
+                yield from walk(children, app_module, via or module)
+
+    yield from walk(levels[0], None, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=2500.0,
+                        help='maximum median time to import the app and run create_app lazily')
+    parser.add_argument('--top', type=int, default=12)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database = f"sqlite:///{os.path.join(directory, 'startup.db')}"
+        timings = {}
+        for lazy in (False, True):
+            # The first eager run creates the schema; later ones find it and apply nothing
+            timings[lazy] = statistics.median(
+                run_startup(lazy, database)[0] for _ in range(args.runs)
+            )
+        _, lines = run_startup(True, database, importtime=True)
+
+    by_package = Counter()
+    importers = defaultdict(Counter)
+    deferred_from_app = set()
+    for module, self_us, importer in parse_importtime(lines):
+        package = module.split('.')[0]
+        by_package[package] += self_us
+        importers[package][importer.split('.')[0]] += self_us
+        if package in DEFERRED and importer.split('.')[0] == 'app':
+            deferred_from_app.add((module, importer))
+
+    print(f"{'Startup':<10} {'ms (median)':>12}")
+    print(f"{'eager':<10} {timings[False]:>12.0f}")
+    print(f"{'lazy':<10} {timings[True]:>12.0f}")
+    print(f"\nImport time with -X importtime, lazy startup: {sum(by_package.values()) / 1000:.0f} ms")
+    print(f"{'Package':<20} {'ms':>7}  Imported by")
+    for package, self_us in by_package.most_common(args.top):
+        top = ', '.join(name for name, _ in importers[package].most_common(2))
+        print(f"{package:<20} {self_us / 1000:>7.1f}  {top}")
+
+    failed = False
+    if timings[True] > args.budget_ms:
+        print(f"\nLazy startup takes {timings[True]:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    for module, importer in sorted(deferred_from_app):
+        print(f"\n{module} is imported at startup by {importer}; it should load on first use")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
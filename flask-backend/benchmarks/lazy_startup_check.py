@@ -0,0 +1,77 @@
+"""Check that a worker started with LAZY_STARTUP still indexes new content for search.
+
+Creates the schema with `flask init-db` in its own process, as a deployment
+would, then starts a lazy app in this process, adds a page and verifies that
+its sections land in the full-text index and that search finds them. Exits
+with status 1 on a failure.
+
+    python benchmarks/lazy_startup_check.py
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import text  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+PAGE = {
+    'title': 'Guide',
+    'content': {'Install': {'content': '<p>Install the server with pipx</p>'}},
+    'structure': [{'title': 'Install', 'level': 2, 'children': []}],
+    'meta': {}
+}
+
+
+def main():
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ.update(
+            LAZY_STARTUP='true',
+            DATABASE_URL=f"sqlite:///{os.path.join(directory, 'lazy.db')}",
+            SCRAPE_WORKERS='0'
+        )
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'app:create_app', 'init-db'],
+                       cwd=ROOT, check=True, capture_output=True)
+
+        from app import create_app, db
+        from app.models import Team, TeamMember, User
+        from app.services.auth_service import issue_token
+        from app.services.content_service import ContentManager
+
+        app = create_app()
+        with app.app_context():
+            owner = User(email='owner@example.com')
+            owner.set_password('password')
+            db.session.add(owner)
+            db.session.flush()
+            team = Team(name='Docs', owner_id=owner.id)
+            db.session.add(team)
+            db.session.flush()
+            db.session.add(TeamMember(team_id=team.id, user_id=owner.id, role='owner'))
+            db.session.commit()
+            team_id, token = team.id, issue_token(owner.id)
+
+            ContentManager(scraper=object())._add_content(team_id, 'https://example.com/guide', PAGE)
+            db.session.commit()
+            indexed = db.session.execute(text('SELECT count(*) FROM section_search')).scalar()
+
+        if not indexed:
+            failures.append('new sections were not added to the full-text index')
+        response = app.test_client().get(f'/content/search/{team_id}?q=pipx',
+                                         headers={'Authorization': f'Bearer {token}'})
+        results = response.get_json().get('results') or []
+        if response.status_code != 200 or not results or results[0]['score'] is None:
+            failures.append(f"search did not use the full-text index ({response.status_code}: {results})")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print('Lazy startup OK: content written by a lazy worker is indexed and searchable')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Measure Socket.IO latency on a worker while it handles a storm of logins.
+
+Starts one eventlet worker per hashing pool setting, keeps a client pinging
+it over Socket.IO and fires --logins concurrent POST /login requests. With
+inline hashing each login holds the event loop for the whole hash; with the
+pool the pings keep being answered.
+
+    python benchmarks/login_storm_benchmark.py [--logins 16] [--concurrency 8]
+"""
+import argparse
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from socket_cluster import Cluster
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def storm(cluster, logins, concurrency):
+    pings = []
+    done = threading.Event()
+    client = cluster.client(0)
+
+    def ping():
+        while not done.is_set():
+            start = time.perf_counter()
+            client.call('bench_ping', {'content_id': cluster.content_id}, timeout=60)
+            pings.append(time.perf_counter() - start)
+
+    def login(_):
+        response = requests.post(f"{cluster.url(0)}/login", timeout=120,
+                                 json={'email': 'writer@example.com', 'password': 'password'})
+        return response.status_code == 200
+
+    pinger = threading.Thread(target=ping)
+    pinger.start()
+    time.sleep(0.5)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        succeeded = sum(executor.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    pinger.join()
+    client.disconnect()
+    return succeeded / elapsed, pings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--logins', type=int, default=16)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--pools', nargs='+', default=['inline', 'thread', 'process'])
+    args = parser.parse_args()
+
+    print(f"{'Pool':<8} {'Logins/s':>9} {'ping p50 ms':>12} {'ping p95 ms':>12} {'ping max ms':>12}")
+    for pool in args.pools:
+        with tempfile.TemporaryDirectory() as directory, \
+                Cluster(directory, workers=1, environment={'PASSWORD_HASH_POOL': pool}) as cluster:
+            throughput, pings = storm(cluster, args.logins, args.concurrency)
+        print(f"{pool:<8} {throughput:>9.2f} {percentile(pings, 0.5) * 1000:>12.1f} "
+              f"{percentile(pings, 0.95) * 1000:>12.1f} {max(pings) * 1000:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Measure invite latency and queued mail delivery against a slow local SMTP sink.
+
+The sink adds --smtp-delay seconds to every connection. Invites only queue
+their email, so their latency must not depend on it; the sender then
+delivers the backlog in batches over one connection each, compared with
+opening a connection per message as the old synchronous path did.
+
+    python benchmarks/mail_benchmark.py [--invites 20] [--bulk 500] [--smtp-delay 0.2]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask_mail import Message  # noqa: E402
+from app.services.smtp_sink import SMTPSink  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--invites', type=int, default=20)
+    parser.add_argument('--bulk', type=int, default=500)
+    parser.add_argument('--smtp-delay', type=float, default=0.2)
+    args = parser.parse_args()
+
+    sink = SMTPSink(('127.0.0.1', 0), delay=args.smtp_delay)
+    threading.Thread(target=sink.serve_forever, daemon=True).start()
+    os.environ.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=str(sink.server_address[1]), MAIL_USE_TLS='false')
+
+    from app import create_app, db
+    from app.models import OutboundEmail, Team
+    from app.services.email_service import mail
+    from app.services.mail_queue import mail_queue
+    from write_benchmark import seed
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SCRAPE_WORKERS': 0})
+    token, _ = seed(app, 1)
+    with app.app_context():
+        team_id = db.session.query(Team.id).scalar()
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    start = time.perf_counter()
+    for index in range(args.invites):
+        client.post('/team/invite', headers=headers,
+                    json={'team_id': team_id, 'email': f"single-{index}@example.com", 'role': 'member'})
+    single_ms = (time.perf_counter() - start) / args.invites * 1000
+
+    start = time.perf_counter()
+    client.post('/team/invite/bulk', headers=headers, json={'team_id': team_id, 'invitations': [
+        {'email': f"bulk-{index}@example.com", 'role': 'member'} for index in range(args.bulk)
+    ]})
+    bulk_ms = (time.perf_counter() - start) * 1000
+
+    with app.app_context():
+        queued = OutboundEmail.query.filter_by(status='pending').count()
+    print(f"POST /team/invite: {single_ms:.2f} ms per invite; "
+          f"POST /team/invite/bulk ({args.bulk}): {bulk_ms:.0f} ms, {bulk_ms / args.bulk:.2f} ms per invite")
+    print(f"{queued} emails queued, {len(sink.messages)} sent during requests")
+
+    start = time.perf_counter()
+    sent = mail_queue.deliver_pending()
+    queued_seconds = time.perf_counter() - start
+    print(f"{'Delivery':<24} {'Messages':>8} {'Connections':>11} {'Seconds':>8}")
+    print(f"{'queue, batched':<24} {sent:>8} {sink.connections:>11} {queued_seconds:>8.2f}")
+
+    # The old path: one connection per message
+    connections = sink.connections
+    sample = min(args.invites, 20)
+    start = time.perf_counter()
+    with app.app_context():
+        for index in range(sample):
+            mail.send(Message('Team Invitation', sender=app.config['MAIL_DEFAULT_SENDER'],
+                              recipients=[f"direct-{index}@example.com"], html='<p>invite</p>'))
+    direct_seconds = time.perf_counter() - start
+    print(f"{'connection per message':<24} {sample:>8} {sink.connections - connections:>11} {direct_seconds:>8.2f}")
+
+    # Undelivered mail stays queued while the server is down
+    sink.shutdown()
+    sink.server_close()
+    with app.app_context():
+        mail_queue.enqueue('retry@example.com', 'Team Invitation', '<p>invite</p>')
+        db.session.commit()
+    mail_queue.deliver_pending()
+    with app.app_context():
+        row = OutboundEmail.query.filter_by(recipient='retry@example.com').one()
+        print(f"SMTP down: status={row.status} attempts={row.attempts} "
+              f"retry in {(row.next_attempt_at - row.created_at).total_seconds():.0f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Count outbound presence messages for a busy room.
+
+N users in one content room each send cursor_move events at --rate Hz for
+--seconds seconds while the presence ticker runs at PRESENCE_TICK_RATE.
+Compares the messages the old per-event re-broadcast would have sent
+(events x (users - 1)) with the presence_update frames actually delivered.
+
+    python benchmarks/presence_benchmark.py [--users 30] [--rate 60] [--seconds 2] [--tick-rate 20]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from app import create_app, db, socketio  # noqa: E402
+from app.models import Content, ContentNode, TeamMember, User  # noqa: E402
+from app.services.presence_service import presence  # noqa: E402
+from write_benchmark import seed  # noqa: E402
+
+
+def add_members(app, content_id, count):
+    """Create count users in the content's team and return their tokens"""
+    with app.app_context():
+        team_id = db.session.get(Content, content_id).team_id
+        tokens = []
+        for index in range(count):
+            user = User(email=f"user-{index}@example.com", password_hash='')
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(TeamMember(team_id=team_id, user_id=user.id, role='member'))
+            tokens.append(create_access_token(identity=user.id))
+        db.session.commit()
+        return tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=30)
+    parser.add_argument('--rate', type=int, default=60, help='cursor events per user per second')
+    parser.add_argument('--seconds', type=int, default=2)
+    parser.add_argument('--tick-rate', type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'SCRAPE_WORKERS': 0,
+        'PRESENCE_TICK_RATE': args.tick_rate
+    })
+    _, node_ids = seed(app, 1)
+    with app.app_context():
+        content_id = db.session.get(ContentNode, node_ids[0]).content_id
+    clients = []
+    for token in add_members(app, content_id, args.users):
+        client = socketio.test_client(app, auth={'token': token})
+        client.emit('join', {'content_id': content_id})
+        clients.append(client)
+    for client in clients:
+        client.get_received()
+
+    # Drive the ticker by hand so the run is deterministic
+    events_per_tick = max(args.rate // args.tick_rate, 1)
+    ticks = args.seconds * args.tick_rate
+    events = 0
+    start = time.perf_counter()
+    for tick in range(ticks):
+        for step in range(events_per_tick):
+            for index, client in enumerate(clients):
+                client.emit('cursor_move', {
+                    'content_id': content_id,
+                    'position': {'node': index, 'offset': tick * events_per_tick + step}
+                })
+                events += 1
+        presence.tick()
+    elapsed = time.perf_counter() - start
+
+    received = sum(
+        1 for client in clients for packet in client.get_received() if packet['name'] == 'presence_update'
+    )
+    print(f"{args.users} users, {events} cursor events over {ticks} ticks ({elapsed:.2f}s)")
+    print(f"{'Per-event broadcast':<22} {events * (args.users - 1):>9} messages")
+    print(f"{'Presence frames':<22} {received:>9} messages ({args.users} x {ticks} ticks)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""Fail if any query issued by the HTTP routes does a full table scan.
+
+Drives every route through the Flask test client against a seeded in-memory
+SQLite database, records each SELECT/UPDATE/DELETE the routes send, and runs
+EXPLAIN QUERY PLAN on it. Exits non-zero when a plan contains a SCAN of a
+table; searches of the FTS virtual table and of subqueries are allowed.
+Every call must answer with the status of its working path, so the plans
+checked are those of the queries a successful request runs.
+
+    python benchmarks/query_plan_check.py [--verbose]
+"""
+import argparse
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.models import Invitation, User  # noqa: E402
+from app.services.content_service import ContentManager  # noqa: E402
+
+PAGE = {
+    'title': 'Guide',
+    'content': {
+        'Install': {'content': '<p>Install the server with pip</p>'},
+        'Configure': {'content': '<p>Configure the client token</p>'}
+    },
+    'structure': [
+        {'title': 'Install', 'level': 2, 'children': [
+            {'title': 'Configure', 'level': 3, 'children': []}
+        ]}
+    ],
+    'meta': {}
+}
+SCAN = re.compile(r'^SCAN (\S+)')
+SUBQUERY = re.compile(r'^(?:CO-ROUTINE|MATERIALIZE) (\S+)')
+
+
+class StatementLog:
+    def __init__(self):
+        self.statements = []
+        self.active = False
+
+    def __call__(self, connection, cursor, statement, parameters, context, executemany):
+        if not self.active or not statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+            return
+        if executemany:
+            parameters = parameters[0]
+        self.statements.append((statement, parameters))
+
+
+def seed(app):
+    """Create two users sharing a team with one scraped page, and a pending invitation"""
+    with app.app_context():
+        owner = User(email='owner@example.com')
+        owner.set_password('password')
+        member = User(email='member@example.com')
+        member.set_password('password')
+        db.session.add_all([owner, member])
+        db.session.commit()
+        return owner.id, member.id
+
+
+def call(client, method, url, status, **kwargs):
+    """Send a request and fail unless it answers with the status of the working path"""
+    response = client.open(url, method=method, **kwargs)
+    if response.status_code != status:
+        raise AssertionError(f"{method} {url} returned {response.status_code}, expected {status}: "
+                             f"{response.get_data(as_text=True)[:200]}")
+    return response.get_json()
+
+
+def exercise(client, owner_token, member_token, app):
+    """Call every route; returns nothing, the StatementLog records the queries"""
+    owner = {'Authorization': f'Bearer {owner_token}'}
+    member = {'Authorization': f'Bearer {member_token}'}
+
+    call(client, 'POST', '/register', 201, json={'email': 'new@example.com', 'password': 'password'})
+    call(client, 'POST', '/login', 200, json={'email': 'owner@example.com', 'password': 'password'})
+
+    team_id = call(client, 'POST', '/team/create', 201, json={'name': 'Docs'}, headers=owner)['team_id']
+    call(client, 'POST', '/team/invite', 201,
+         json={'team_id': team_id, 'email': 'member@example.com', 'role': 'member'}, headers=owner)
+    call(client, 'POST', '/team/invite/bulk', 201, json={'team_id': team_id, 'invitations': [
+        {'email': 'member@example.com', 'role': 'member'},
+        {'email': 'owner@example.com', 'role': 'admin'},
+        {'email': 'writer@example.com', 'role': 'member'}
+    ]}, headers=owner)
+    with app.app_context():
+        invite_code = Invitation.query.filter_by(email='member@example.com', status='pending').first().invite_code
+    call(client, 'GET', '/user/info', 200, headers=member)
+    call(client, 'POST', f'/team/accept-invite/{invite_code}', 200, headers=member)
+    call(client, 'GET', f'/team/members/{team_id}', 200, headers=owner)
+
+    with app.app_context():
+        manager = ContentManager(scraper=object())
+        manager._add_content(team_id, 'https://example.com/intro', PAGE)
+        content_id = manager._add_content(team_id, 'https://example.com/guide', PAGE)
+        db.session.commit()
+
+    content = call(client, 'GET', f'/content/{content_id}?include_content=true', 200, headers=owner)['content']
+    call(client, 'GET', f'/content/{content_id}', 200, headers=member)
+    node_id = content['tree']['children'][0]['id']
+
+    call(client, 'PUT', f'/content/node/{node_id}', 200, json={'content': '<p>Install with pipx</p>'},
+         headers=owner)
+    call(client, 'PUT', f'/content/node/{node_id}', 200, json={'content': '<p>Install with uv</p>'},
+         headers=member)
+    call(client, 'GET', f'/content/node/{node_id}?history=true', 200, headers=owner)
+    history = call(client, 'GET', f'/content/history/{node_id}?limit=1', 200, headers=owner)
+    call(client, 'GET', f"/content/history/{node_id}?limit=1&cursor={history['next_cursor']}", 200,
+         headers=owner)
+    call(client, 'GET', f'/content/history/{node_id}/2', 200, headers=owner)
+    listing = call(client, 'GET', f'/content/team/{team_id}?limit=1', 200, headers=owner)
+    call(client, 'GET', f"/content/team/{team_id}?limit=1&cursor={listing['next_cursor']}", 200, headers=owner)
+    call(client, 'GET', f'/content/search/{team_id}?q=install', 200, headers=owner)
+    call(client, 'GET', '/user/info', 200, headers=owner)
+
+    job_id = call(client, 'POST', '/content/scrape', 202, json={'team_id': team_id, 'url': 'https://example.com'},
+                  headers=owner)['job_id']
+    call(client, 'GET', f'/content/scrape/{job_id}', 200, headers=owner)
+    call(client, 'POST', '/content/scrape/bulk', 202, json={'team_id': team_id, 'urls': ['https://example.com']},
+         headers=owner)
+    call(client, 'POST', f'/content/{content_id}/refresh', 202, headers=owner)
+
+
+def full_scans(connection, statement, parameters):
+    plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    subqueries = set()
+    scans = []
+    for row in plan:
+        detail = row[-1]
+        match = SUBQUERY.match(detail)
+        if match:
+            subqueries.add(match.group(1))
+            continue
+        match = SCAN.match(detail)
+        if match and match.group(1) not in subqueries and 'VIRTUAL TABLE' not in detail:
+            scans.append(detail)
+    return plan, scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--verbose', action='store_true', help='print every plan')
+    args = parser.parse_args()
+
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'SCRAPE_WORKERS': 0,
+        'EDIT_COALESCE_WINDOW': 0
+    })
+    owner_id, member_id = seed(app)
+    with app.app_context():
+        owner_token = create_access_token(identity=owner_id)
+        member_token = create_access_token(identity=member_id)
+
+        log = StatementLog()
+        event.listen(db.engine, 'before_cursor_execute', log)
+
+    log.active = True
+    exercise(app.test_client(), owner_token, member_token, app)
+    log.active = False
+
+    failures = []
+    seen = set()
+    with app.app_context(), db.engine.connect() as connection:
+        for statement, parameters in log.statements:
+            if statement in seen:
+                continue
+            seen.add(statement)
+            plan, scans = full_scans(connection, statement, parameters)
+            if args.verbose:
+                print(statement.strip())
+                for row in plan:
+                    print(f"    {row[-1]}")
+            if scans:
+                failures.append((statement, scans))
+
+    print(f"Checked {len(seen)} distinct queries issued by the routes")
+    for statement, scans in failures:
+        print(f"\nFull scan ({'; '.join(scans)}):\n{statement.strip()}")
+    if failures:
+        print(f"\n{len(failures)} queries scan a whole table")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Measure authorized cursor_move events per second on one connection.
+
+Compares the session check done by the handlers (identity and rooms
+verified at connect) with authorizing every event naively: decoding the JWT
+sent in the payload and querying TeamMember.
+
+    python benchmarks/socket_auth_benchmark.py [--events 5000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import request  # noqa: E402
+from flask_jwt_extended import decode_token  # noqa: E402
+from app import create_app, db, socketio  # noqa: E402
+from app.models import Content, ContentNode, TeamMember  # noqa: E402
+from app.services.presence_service import presence  # noqa: E402
+from write_benchmark import seed  # noqa: E402
+
+
+def handle_naive_cursor_move(data):
+    """Per-event authorization, for comparison"""
+    user_id = decode_token(data['token'])['sub']
+    team_id = db.session.query(Content.team_id).filter_by(id=data['content_id']).scalar()
+    if db.session.query(TeamMember.role).filter_by(team_id=team_id, user_id=user_id).scalar():
+        presence.update_cursor(f"content_{data['content_id']}", user_id, request.sid, data.get('position'))
+
+
+def rate(client, event, payload, events):
+    start = time.perf_counter()
+    for index in range(events):
+        client.emit(event, dict(payload, position=index))
+    return events / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=5000)
+    args = parser.parse_args()
+
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SCRAPE_WORKERS': 0})
+    socketio.on_event('naive_cursor_move', handle_naive_cursor_move)
+    token, node_ids = seed(app, 1)
+    with app.app_context():
+        content_id = db.session.get(ContentNode, node_ids[0]).content_id
+
+    client = socketio.test_client(app, auth={'token': token})
+    client.emit('join', {'content_id': content_id})
+
+    print(f"{'Authorization':<26} {'Events/s':>10}")
+    session_rate = rate(client, 'cursor_move', {'content_id': content_id}, args.events)
+    print(f"{'session (at connect)':<26} {session_rate:>10.0f}")
+    naive_rate = rate(client, 'naive_cursor_move', {'content_id': content_id, 'token': token}, args.events)
+    print(f"{'JWT + query per event':<26} {naive_rate:>10.0f}")
+    client.disconnect()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Run several Socket.IO workers as separate processes sharing one message queue.
+
+Used by socket_fanout_check.py and socket_fanout_benchmark.py. Each worker is
+this file run with --serve: it builds the app against a shared SQLite file and
+the local relay, and adds a bench_ping event that re-emits to a room.
+
+    python benchmarks/socket_cluster.py --serve PORT
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Worker on port {port} did not start")
+
+
+class Cluster:
+    """A local relay plus `workers` app processes, seeded with one team, content and node"""
+    def __init__(self, directory, workers=2, environment=None):
+        self.directory = directory
+        self.workers = workers
+        self.environment = environment or {}
+        self.relay = None
+        self.processes = []
+        self.ports = []
+
+    def __enter__(self):
+        from app.services.socket_queue import LocalRelay
+        from write_benchmark import seed
+        from app import create_app, db
+
+        database = f"sqlite:///{os.path.join(self.directory, 'cluster.db')}"
+        app = create_app({'SQLALCHEMY_DATABASE_URI': database, 'SCRAPE_WORKERS': 0})
+        self.token, self.node_ids = seed(app, 1)
+        with app.app_context():
+            from app.models import ContentNode
+            self.content_id = db.session.get(ContentNode, self.node_ids[0]).content_id
+            db.engine.dispose()
+
+        self.relay = LocalRelay(('127.0.0.1', 0))
+        threading.Thread(target=self.relay.serve_forever, daemon=True).start()
+        relay_url = 'local://127.0.0.1:%d' % self.relay.server_address[1]
+
+        environment = dict(
+            os.environ,
+            DATABASE_URL=database,
+            SCRAPE_WORKERS='0',
+            SOCKETIO_QUEUE_BACKEND='local',
+            SOCKETIO_QUEUE_URL=relay_url,
+            **self.environment
+        )
+        for _ in range(self.workers):
+            port = free_port()
+            self.processes.append(subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), '--serve', str(port)],
+                env=environment, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            ))
+            self.ports.append(port)
+        for port in self.ports:
+            wait_for_port(port)
+        return self
+
+    def __exit__(self, *exc):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.wait()
+        if self.relay is not None:
+            self.relay.shutdown()
+            self.relay.server_close()
+
+    def url(self, worker):
+        return f"http://127.0.0.1:{self.ports[worker]}"
+
+    def client(self, worker):
+        """A Socket.IO client connected to one worker and joined to the content room"""
+        import socketio
+
+        client = socketio.Client()
+        client.connect(self.url(worker), transports=['polling'], auth={'token': self.token})
+        client.call('join', {'content_id': self.content_id})
+        return client
+
+
+def serve(port):
+    import eventlet
+    eventlet.monkey_patch()
+
+    from flask import request
+    from flask_socketio import emit
+    from app import create_app, socketio
+
+    app = create_app()
+
+    @socketio.on('bench_ping')
+    def handle_bench_ping(data):
+        emit('bench_pong', data, room=f"content_{data['content_id']}", skip_sid=request.sid)
+        return True
+
+    socketio.run(app, host='127.0.0.1', port=port, log_output=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--serve', type=int, required=True, metavar='PORT')
+    serve(parser.parse_args().serve)
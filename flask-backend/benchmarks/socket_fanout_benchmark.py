@@ -0,0 +1,74 @@
+"""Measure Socket.IO fan-out latency within one worker and across workers.
+
+A sender emits bench_ping carrying its send time; the worker re-emits it to
+the content room through the message queue and every listener records the
+delay until delivery. Listeners are split between the sender's worker and
+the other workers, so the report shows what the queue hop adds.
+
+    python benchmarks/socket_fanout_benchmark.py [--workers 2] [--listeners 4] [--messages 200]
+"""
+import argparse
+import statistics
+import tempfile
+import threading
+import time
+
+from socket_cluster import Cluster
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--listeners', type=int, default=4, help='listeners per worker')
+    parser.add_argument('--messages', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory, Cluster(directory, workers=args.workers) as cluster:
+        delays = {'same worker': [], 'other worker': []}
+        lock = threading.Lock()
+        remaining = threading.Semaphore(0)
+        listeners = []
+
+        for worker in range(args.workers):
+            group = 'same worker' if worker == 0 else 'other worker'
+            for _ in range(args.listeners):
+                client = cluster.client(worker)
+
+                def record(data, group=group):
+                    delay = time.time() - data['sent']
+                    with lock:
+                        delays[group].append(delay)
+                    remaining.release()
+
+                client.on('bench_pong', record)
+                listeners.append(client)
+
+        sender = cluster.client(0)
+        start = time.perf_counter()
+        for _ in range(args.messages):
+            sender.call('bench_ping', {'content_id': cluster.content_id, 'sent': time.time()})
+        for _ in range(args.messages * len(listeners)):
+            if not remaining.acquire(timeout=10):
+                break
+        elapsed = time.perf_counter() - start
+
+        for client in listeners + [sender]:
+            client.disconnect()
+
+    delivered = sum(len(values) for values in delays.values())
+    print(f"{args.workers} workers, {len(listeners)} listeners, {args.messages} messages: "
+          f"{delivered}/{args.messages * len(listeners)} delivered, {delivered / elapsed:.0f} deliveries/s")
+    print(f"{'Listener':<14} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8}")
+    for group, values in delays.items():
+        if values:
+            print(f"{group:<14} {percentile(values, 0.5) * 1000:>8.2f} {percentile(values, 0.95) * 1000:>8.2f} "
+                  f"{statistics.mean(values) * 1000:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Check that Socket.IO emits reach clients connected to another worker process.
+
+Starts two workers sharing the local message relay, connects one client to
+each and verifies that a REST edit on worker 1 and a socket event on worker 1
+are delivered to the client on worker 0, that the edit is stored rather than
+buffered in worker 1, and that live OT editing is refused. Exits with status
+1 on a miss.
+
+    python benchmarks/socket_fanout_check.py
+"""
+import os
+import sys
+import tempfile
+import threading
+
+import requests
+
+from socket_cluster import Cluster
+
+TIMEOUT = 10
+
+
+def expect(client, event):
+    """Return an Event that is set, with the payload stored on it, when client receives event"""
+    received = threading.Event()
+
+    @client.on(event)
+    def handler(data):
+        received.payload = data
+        received.set()
+
+    return received
+
+
+def main():
+    failures = []
+    with tempfile.TemporaryDirectory() as directory, Cluster(directory, workers=2) as cluster:
+        listener = cluster.client(0)
+        joined = expect(listener, 'user_joined')
+        updated = expect(listener, 'content_updated')
+        pong = expect(listener, 'bench_pong')
+
+        sender = cluster.client(1)
+        if not joined.wait(TIMEOUT):
+            failures.append('user_joined from worker 1 did not reach worker 0')
+
+        node_id = cluster.node_ids[0]
+        response = requests.put(f"{cluster.url(1)}/content/node/{node_id}", json={'content': '<p>edited</p>'},
+                                headers={'Authorization': f'Bearer {cluster.token}'}, timeout=TIMEOUT)
+        if response.status_code != 200:
+            failures.append(f"PUT on worker 1 returned {response.status_code}")
+        elif not updated.wait(TIMEOUT) or updated.payload.get('node_id') != node_id:
+            failures.append('content_updated from a REST handler on worker 1 did not reach worker 0')
+
+        # Per-process edit state is off with a queue: the edit is already stored for every worker
+        response = requests.get(f"{cluster.url(0)}/content/node/{node_id}",
+                                headers={'Authorization': f'Bearer {cluster.token}'}, timeout=TIMEOUT)
+        if response.status_code != 200 or response.json()['node']['content'] != '<p>edited</p>':
+            failures.append('an edit saved on worker 1 is not visible on worker 0')
+        opened = sender.call('open_node', {'node_id': node_id}, timeout=TIMEOUT)
+        if not opened or opened.get('code') != 'collab_disabled':
+            failures.append(f"live editing is not disabled with a message queue ({opened})")
+
+        sender.call('bench_ping', {'content_id': cluster.content_id})
+        if not pong.wait(TIMEOUT):
+            failures.append('bench_pong emitted on worker 1 did not reach worker 0')
+
+        listener.disconnect()
+        sender.disconnect()
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print('Cross-worker delivery OK: socket events and REST emits reach clients on other workers')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Compare per-node flushes against the bulk tree writer.
+
+Builds heading structures of 10, 1k and 10k nodes and times writing each
+one to a fresh SQLite database, with and without section bodies.
+
+    python benchmarks/tree_benchmark.py [--sizes 10 1000 10000] [--fanout 8] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import Flask  # noqa: E402
+from app import db  # noqa: E402
+from app.models import Content, ContentNode, NodeContent  # noqa: E402
+from app.services.tree_service import insert_tree  # noqa: E402
+
+
+def make_structure(size, fanout):
+    """A heading tree of `size` nodes, each with up to `fanout` children"""
+    roots = []
+    queue = []
+    for index in range(size):
+        item = {'title': f"Section {index}", 'level': 1, 'children': []}
+        if index < fanout:
+            roots.append(item)
+        else:
+            parent = queue[(index - fanout) // fanout]
+            item['level'] = parent['level'] + 1
+            parent['children'].append(item)
+        queue.append(item)
+    sections = {item['title']: {'content': f"<p>{item['title']} body</p>"} for item in queue}
+    return roots, sections
+
+
+def legacy_insert(content_id, root_title, structure, sections):
+    """The previous writer: one add and flush per node"""
+    root = ContentNode(content_id=content_id, title=root_title, node_type='root', level=0, order=0)
+    db.session.add(root)
+    db.session.flush()
+    db.session.add(NodeContent(node_id=root.id, content_id=content_id, body=''))
+
+    def walk(items, parent_id):
+        for order, item in enumerate(items):
+            node = ContentNode(
+                content_id=content_id,
+                parent_id=parent_id,
+                title=item['title'],
+                node_type='section',
+                level=item['level'],
+                order=order
+            )
+            db.session.add(node)
+            db.session.flush()
+            db.session.add(NodeContent(
+                node_id=node.id,
+                content_id=content_id,
+                body=sections.get(item['title'], {}).get('content', '')
+            ))
+            walk(item['children'], node.id)
+
+    walk(structure, root.id)
+
+
+def bulk_insert(content_id, root_title, structure, sections):
+    insert_tree(content_id, root_title, structure, sections)
+
+
+def run(app, writer, structure, sections):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        content = Content(
+            id=str(uuid.uuid4()), team_id=str(uuid.uuid4()), url='https://example.com',
+            title='Benchmark', original_content='{}', current_content='{}'
+        )
+        db.session.add(content)
+        db.session.flush()
+
+        start = time.perf_counter()
+        writer(content.id, 'Benchmark', structure, sections)
+        db.session.commit()
+        elapsed = time.perf_counter() - start
+
+        count = ContentNode.query.filter_by(content_id=content.id).count()
+        db.session.remove()
+    return elapsed, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 10000])
+    parser.add_argument('--fanout', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    print(f"{'Nodes':>7} {'Per-node flush':>16} {'Bulk insert':>13} {'Speedup':>8}")
+    for size in args.sizes:
+        structure, sections = make_structure(size, args.fanout)
+        timings = {}
+        for name, writer in (('legacy', legacy_insert), ('bulk', bulk_insert)):
+            best = None
+            for _ in range(args.repeat):
+                elapsed, count = run(app, writer, structure, sections)
+                assert count == size + 1, (name, count)
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = best
+        print(f"{size:>7} {timings['legacy'] * 1e3:>13.1f} ms {timings['bulk'] * 1e3:>10.1f} ms "
+              f"{timings['legacy'] / timings['bulk']:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Fail if loading a content tree issues more queries for a larger tree.
+
+Seeds an in-memory SQLite database with a small and a large content tree,
+then counts the statements sent while loading each one, through
+ContentTreeCache.load_tree and through GET /content/<id> with the tree
+cache cold, with and without section bodies. Every count must be the same
+for both trees, and load_tree must use a single query.
+
+    python benchmarks/tree_query_count_check.py [--small 5] [--large 2000]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import event  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.models import Team  # noqa: E402
+from app.services.content_service import ContentManager  # noqa: E402
+from app.services.tree_service import content_tree  # noqa: E402
+from tree_benchmark import make_structure  # noqa: E402
+from write_benchmark import seed  # noqa: E402
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, connection, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def add_tree(team_id, size):
+    structure, sections = make_structure(size, fanout=8)
+    page = {'title': f"Tree of {size}", 'content': sections, 'structure': structure, 'meta': {}}
+    content_id = ContentManager(scraper=object())._add_content(team_id, f"https://example.com/{size}", page)
+    db.session.commit()
+    return content_id
+
+
+def count_tree(tree):
+    return 1 + sum(count_tree(child) for child in tree['children'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--small', type=int, default=5)
+    parser.add_argument('--large', type=int, default=2000)
+    args = parser.parse_args()
+
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SCRAPE_WORKERS': 0})
+    token, _ = seed(app, 1)
+    headers = {'Authorization': f'Bearer {token}'}
+    client = app.test_client()
+    counter = StatementCounter()
+
+    with app.app_context():
+        team_id = db.session.query(Team.id).scalar()
+        trees = {size: add_tree(team_id, size) for size in (args.small, args.large)}
+        event.listen(db.engine, 'before_cursor_execute', counter)
+
+    # Warm the permission cache so only tree loading differs between requests
+    for content_id in trees.values():
+        assert client.get(f'/content/{content_id}', headers=headers).status_code == 200
+
+    counts = {}
+    for include_content in (False, True):
+        for size, content_id in trees.items():
+            with app.app_context():
+                counter.count = 0
+                tree = content_tree.load_tree(content_id, include_content)
+                counts[('load_tree', include_content, size)] = counter.count
+            assert count_tree(tree) == size + 1, (size, count_tree(tree))
+
+            content_tree.invalidate(content_id)
+            counter.count = 0
+            response = client.get(f'/content/{content_id}?include_content={str(include_content).lower()}',
+                                  headers=headers)
+            counts[('GET /content/<id>', include_content, size)] = counter.count
+            assert response.status_code == 200, response.status_code
+            assert count_tree(response.get_json()['content']['tree']) == size + 1
+
+    failures = []
+    print(f"{'Path':<20} {'Bodies':<7} {args.small:>7} {args.large:>7}  (queries per tree size)")
+    for path in ('load_tree', 'GET /content/<id>'):
+        for include_content in (False, True):
+            small = counts[(path, include_content, args.small)]
+            large = counts[(path, include_content, args.large)]
+            print(f"{path:<20} {str(include_content):<7} {small:>7} {large:>7}")
+            if small != large:
+                failures.append(f"{path} (bodies={include_content}) issues {small} queries for "
+                                f"{args.small} nodes but {large} for {args.large}")
+            if path == 'load_tree' and large != 1:
+                failures.append(f"load_tree (bodies={include_content}) issues {large} queries instead of 1")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Measure write throughput of parallel PUT /content/node/<id> callers on SQLite.
+
+Runs the same workload against a file database with the default rollback
+journal and with the tuned settings (WAL, synchronous=NORMAL, busy timeout),
+and reports committed writes per second and failed requests.
+
+    python benchmarks/write_benchmark.py [--callers 1 4 8 16] [--writes 50]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.models import ContentNode, Team, TeamMember, User  # noqa: E402
+from app.services.content_service import ContentManager  # noqa: E402
+
+MODES = {
+    'rollback journal': {'SQLITE_WAL': False},
+    'WAL + NORMAL': {'SQLITE_WAL': True}
+}
+
+
+def seed(app, sections):
+    with app.app_context():
+        user = User(email='writer@example.com')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.flush()
+        team = Team(name='Bench', owner_id=user.id)
+        db.session.add(team)
+        db.session.flush()
+        db.session.add(TeamMember(team_id=team.id, user_id=user.id, role='owner'))
+
+        titles = [f"Section {index}" for index in range(sections)]
+        page = {
+            'title': 'Bench',
+            'content': {title: {'content': f"<p>{title}</p>"} for title in titles},
+            'structure': [{'title': title, 'level': 2, 'children': []} for title in titles],
+            'meta': {}
+        }
+        content_id = ContentManager(scraper=object())._add_content(team.id, 'https://example.com', page)
+        db.session.commit()
+
+        node_ids = [
+            node_id for (node_id,) in
+            db.session.query(ContentNode.id).filter_by(content_id=content_id, node_type='section')
+        ]
+        return create_access_token(identity=user.id), node_ids
+
+
+def run(app, token, node_ids, callers, writes):
+    headers = {'Authorization': f'Bearer {token}'}
+    failures = []
+    barrier = threading.Barrier(callers)
+
+    def caller(node_id):
+        client = app.test_client()
+        barrier.wait()
+        for index in range(writes):
+            response = client.put(f'/content/node/{node_id}', json={'content': f"<p>edit {index}</p>"},
+                                  headers=headers)
+            if response.status_code != 200:
+                failures.append(response.status_code)
+
+    threads = [threading.Thread(target=caller, args=(node_ids[index],)) for index in range(callers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    committed = callers * writes - len(failures)
+    return committed / elapsed, len(failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--callers', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--writes', type=int, default=50, help='writes per caller')
+    args = parser.parse_args()
+
+    print(f"{'Mode':<18} {'Callers':>7} {'Writes/s':>9} {'Failed':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        for mode, settings in MODES.items():
+            for callers in args.callers:
+                path = os.path.join(directory, f"bench-{len(os.listdir(directory))}.db")
+                app = create_app({
+                    'SQLALCHEMY_DATABASE_URI': f"sqlite:///{path}",
+                    'SCRAPE_WORKERS': 0,
+                    'EDIT_COALESCE_WINDOW': 0,
+                    **settings
+                })
+                token, node_ids = seed(app, max(args.callers))
+                throughput, failed = run(app, token, node_ids, callers, args.writes)
+                print(f"{mode:<18} {callers:>7} {throughput:>9.1f} {failed:>7}")
+                with app.app_context():
+                    db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
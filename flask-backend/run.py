@@ -1,7 +1,16 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+if os.getenv('SOCKETIO_QUEUE_BACKEND', 'none') != 'none':
+    # Message queue listeners block on sockets, which eventlet needs to be green
+    import eventlet
+    eventlet.monkey_patch()
+
 from app import create_app, socketio
 
 app = create_app()
 
 if __name__ == '__main__':
     app.debug = True
-    socketio.run(app, debug=True)
\ No newline at end of file
+    socketio.run(app, debug=True)